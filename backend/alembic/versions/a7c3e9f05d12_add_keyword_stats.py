@@ -0,0 +1,45 @@
+"""Add keyword_stats popularity table
+
+Revision ID: a7c3e9f05d12
+Revises: f1b6d2e8a473
+Create Date: 2026-10-19 14:50:00.000000
+
+"""
+from collections import Counter
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e9f05d12'
+down_revision: Union[str, Sequence[str], None] = 'f1b6d2e8a473'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    keyword_stats = op.create_table(
+        'keyword_stats',
+        sa.Column('keyword', sa.String(length=200), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('keyword'),
+    )
+    op.create_index('ix_keyword_stats_count', 'keyword_stats', ['count'], unique=False)
+
+    # Remplissage initial (même normalisation que app/keyword_stats.split_keywords)
+    counts = Counter()
+    rows = op.get_bind().execute(sa.text("SELECT keywords FROM sujets WHERE is_active IS TRUE"))
+    for (keywords,) in rows:
+        counts.update({k.strip().lower()[:200] for k in (keywords or "").split(",") if k.strip()})
+    if counts:
+        op.bulk_insert(keyword_stats, [{"keyword": k, "count": n} for k, n in counts.items()])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_keyword_stats_count', table_name='keyword_stats')
+    op.drop_table('keyword_stats')
@@ -0,0 +1,50 @@
+"""Add normalized keywords and sujet_keywords tables
+
+Revision ID: b2d8f4a61c39
+Revises: a7c3e9f05d12
+Create Date: 2026-10-19 15:30:00.000000
+
+Les liaisons existantes se remplissent ensuite par lots avec
+`python backfill_sujet_keywords.py` (la migration ne crée que le schéma).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d8f4a61c39'
+down_revision: Union[str, Sequence[str], None] = 'a7c3e9f05d12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'keywords',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=200), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    )
+    op.create_index(op.f('ix_keywords_id'), 'keywords', ['id'], unique=False)
+    op.create_table(
+        'sujet_keywords',
+        sa.Column('sujet_id', sa.Integer(), nullable=False),
+        sa.Column('keyword_id', sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['sujet_id'], ['sujets.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['keyword_id'], ['keywords.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('sujet_id', 'keyword_id'),
+    )
+    op.create_index('ix_sujet_keywords_keyword_sujet', 'sujet_keywords', ['keyword_id', 'sujet_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sujet_keywords_keyword_sujet', table_name='sujet_keywords')
+    op.drop_table('sujet_keywords')
+    op.drop_index(op.f('ix_keywords_id'), table_name='keywords')
+    op.drop_table('keywords')
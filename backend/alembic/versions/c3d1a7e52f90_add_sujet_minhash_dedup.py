@@ -0,0 +1,35 @@
+"""Add sujet minhash signature and duplicate link
+
+Revision ID: c3d1a7e52f90
+Revises: 77f7fd25492c
+Create Date: 2026-10-19 10:12:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d1a7e52f90'
+down_revision: Union[str, Sequence[str], None] = '77f7fd25492c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Signatures calculées à la volée puis remplies par: python dedup_report.py --backfill
+    op.add_column('sujets', sa.Column('minhash_signature', sa.JSON(), nullable=True))
+    op.add_column('sujets', sa.Column('duplicate_of_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_sujets_duplicate_of_id', 'sujets', 'sujets', ['duplicate_of_id'], ['id'])
+    op.create_index(op.f('ix_sujets_duplicate_of_id'), 'sujets', ['duplicate_of_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_sujets_duplicate_of_id'), table_name='sujets')
+    op.drop_constraint('fk_sujets_duplicate_of_id', 'sujets', type_='foreignkey')
+    op.drop_column('sujets', 'duplicate_of_id')
+    op.drop_column('sujets', 'minhash_signature')
@@ -0,0 +1,36 @@
+"""Add domain_stats rollup table
+
+Revision ID: c9e1a5b7d248
+Revises: b2d8f4a61c39
+Create Date: 2026-10-19 16:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9e1a5b7d248'
+down_revision: Union[str, Sequence[str], None] = 'b2d8f4a61c39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'domain_stats',
+        sa.Column('domaine', sa.String(length=100), nullable=False),
+        sa.Column('sujet_count', sa.Integer(), nullable=False),
+        sa.Column('total_views', sa.Integer(), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('domaine'),
+    )
+    # Remplie au premier accès par app/domain_stats.py
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('domain_stats')
@@ -0,0 +1,28 @@
+"""Index user_skills.user_id
+
+Revision ID: d4f7b2c8e913
+Revises: c9e1a5b7d248
+Create Date: 2026-10-19 18:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f7b2c8e913'
+down_revision: Union[str, Sequence[str], None] = 'c9e1a5b7d248'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # crud.update_user_skills relit les compétences d'un utilisateur à chaque enregistrement du profil
+    op.create_index(op.f('ix_user_skills_user_id'), 'user_skills', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_user_skills_user_id'), table_name='user_skills')
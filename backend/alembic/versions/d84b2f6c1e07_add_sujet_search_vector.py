@@ -0,0 +1,41 @@
+"""Add sujet full-text search vector
+
+Revision ID: d84b2f6c1e07
+Revises: c3d1a7e52f90
+Create Date: 2026-10-19 11:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd84b2f6c1e07'
+down_revision: Union[str, Sequence[str], None] = 'c3d1a7e52f90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Colonne générée: la base la recalcule à chaque écriture, aucun code applicatif à maintenir
+    op.execute("""
+        ALTER TABLE sujets ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('french', coalesce(titre, '')), 'A') ||
+            setweight(to_tsvector('french', coalesce(keywords, '')), 'B') ||
+            setweight(to_tsvector('french', coalesce(description, '')), 'C')
+        ) STORED
+    """)
+    op.create_index(
+        'ix_sujets_search_vector', 'sujets', ['search_vector'],
+        unique=False, postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sujets_search_vector', table_name='sujets')
+    op.drop_column('sujets', 'search_vector')
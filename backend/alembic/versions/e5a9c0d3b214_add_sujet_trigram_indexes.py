@@ -0,0 +1,32 @@
+"""Add pg_trgm indexes for sujet keyword search
+
+Revision ID: e5a9c0d3b214
+Revises: d84b2f6c1e07
+Create Date: 2026-10-19 11:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a9c0d3b214'
+down_revision: Union[str, Sequence[str], None] = 'd84b2f6c1e07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Index sur lower(...) pour correspondre exactement aux expressions de app/search.py
+    op.execute("CREATE INDEX IF NOT EXISTS ix_sujets_keywords_trgm ON sujets USING gin (lower(keywords) gin_trgm_ops)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_sujets_titre_trgm ON sujets USING gin (lower(titre) gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_sujets_titre_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_sujets_keywords_trgm")
@@ -0,0 +1,33 @@
+"""Index conversation_messages (user_id, timestamp)
+
+Revision ID: e8a2c6f4b157
+Revises: d4f7b2c8e913
+Create Date: 2026-10-19 19:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a2c6f4b157'
+down_revision: Union[str, Sequence[str], None] = 'd4f7b2c8e913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Derniers messages d'un utilisateur (historique du chat) et purge par plafond
+    op.create_index(
+        'ix_conversation_messages_user_timestamp',
+        'conversation_messages',
+        ['user_id', 'timestamp'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_conversation_messages_user_timestamp', table_name='conversation_messages')
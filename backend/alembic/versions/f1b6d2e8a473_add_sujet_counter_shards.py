@@ -0,0 +1,36 @@
+"""Add sujet_counter_shards for write-behind counters
+
+Revision ID: f1b6d2e8a473
+Revises: e5a9c0d3b214
+Create Date: 2026-10-19 14:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b6d2e8a473'
+down_revision: Union[str, Sequence[str], None] = 'e5a9c0d3b214'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'sujet_counter_shards',
+        sa.Column('sujet_id', sa.Integer(), nullable=False),
+        sa.Column('counter', sa.String(length=20), nullable=False),
+        sa.Column('shard', sa.Integer(), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['sujet_id'], ['sujets.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('sujet_id', 'counter', 'shard'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('sujet_counter_shards')
@@ -0,0 +1,48 @@
+"""Add composite indexes for hot queries (feedbacks, user_history, popular sujets)
+
+Revision ID: f3c7a9d1e526
+Revises: e8a2c6f4b157
+Create Date: 2026-10-19 20:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c7a9d1e526'
+down_revision: Union[str, Sequence[str], None] = 'e8a2c6f4b157'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Plans relevés par audit_query_plans.py. conversation_messages (user_id, timestamp)
+    # existe déjà (migration e8a2c6f4b157) et n'est pas recréé ici.
+
+    # get_user_feedbacks, get_saved_sujets, statistiques utilisateur (COUNT / MAX(created_at))
+    op.create_index('ix_feedbacks_user_created', 'feedbacks', ['user_id', 'created_at'], unique=False)
+    # get_sujet_feedbacks et jointures sur le sujet
+    op.create_index('ix_feedbacks_sujet_id', 'feedbacks', ['sujet_id'], unique=False)
+    # Historique d'un utilisateur, plus récent d'abord
+    op.create_index('ix_user_history_user_created', 'user_history', ['user_id', 'created_at'], unique=False)
+    # get_popular_sujets: ORDER BY vue_count DESC, like_count DESC LIMIT n sur les sujets actifs
+    op.create_index(
+        'ix_sujets_popular_active',
+        'sujets',
+        [sa.text('vue_count DESC'), sa.text('like_count DESC')],
+        unique=False,
+        postgresql_where=sa.text('is_active'),
+        sqlite_where=sa.text('is_active'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sujets_popular_active', table_name='sujets')
+    op.drop_index('ix_user_history_user_created', table_name='user_history')
+    op.drop_index('ix_feedbacks_sujet_id', table_name='feedbacks')
+    op.drop_index('ix_feedbacks_user_created', table_name='feedbacks')
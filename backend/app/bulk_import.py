@@ -0,0 +1,305 @@
+# app/bulk_import.py
+"""
+Import en masse de sujets et d'utilisateurs (CSV ou JSONL), en flux.
+
+Le fichier est lu ligne à ligne et traité par lots de IMPORT_CHUNK_SIZE
+lignes: validation par les schémas pydantic existants (SujetCreate,
+UserCreate), puis un INSERT multi-lignes par table (executemany /
+insertmanyvalues de SQLAlchemy 2) et un commit par lot. Un lot en échec est
+annulé et signalé sans interrompre les suivants.
+
+Pour les sujets, chaque lot met aussi à jour les tables dérivées comme le
+fait crud.create_sujet: keyword_stats (un seul upsert), sujet_keywords,
+index de quasi-doublons et synthèse domain_stats. Les quasi-doublons (contre
+la base et à l'intérieur du fichier) sont acceptés ("allow") ou écartés et
+signalés ("reject"). Pour les utilisateurs, les emails déjà présents sont
+écartés et les préférences / profil / paramètres par défaut créés en lot.
+
+Le rapport retourné (ImportReport.to_dict) donne les compteurs et les
+erreurs par numéro de ligne.
+"""
+import codecs
+import csv
+import io
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+from dotenv import load_dotenv
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app import schemas
+from app.auth import get_password_hash
+from app.dedup import DEDUP_ENABLED, LSHIndex, dedup_index, ensure_index_loaded, signature_for
+from app.domain_stats import domain_stats
+from app.keyword_stats import apply_keyword_delta, split_keywords
+from app.keywords import ensure_keyword_ids
+from app.metrics import metrics
+from app.models import Sujet, SujetKeyword, User, UserPreference, UserProfile, UserSettings
+
+load_dotenv()
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+# Au-delà, les erreurs sont comptées mais plus détaillées dans le rapport
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+IMPORT_FORMATS = ("csv", "jsonl")
+IMPORT_ON_DUPLICATE = ("allow", "reject")
+
+_sujets = Sujet.__table__
+_users = User.__table__
+_links = SujetKeyword.__table__
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.rows = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.chunks = 0
+        self.error_count = 0
+        self.errors: List[Dict[str, Any]] = []
+        self._start = time.perf_counter()
+
+    def error(self, line: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "skipped": self.skipped,
+            "chunks": self.chunks,
+            "error_count": self.error_count,
+            "errors": sorted(self.errors, key=lambda e: e["line"]),
+            "truncated": self.error_count > len(self.errors),
+            "seconds": round(time.perf_counter() - self._start, 3),
+        }
+
+
+# ---------- lecture en flux ----------
+
+def detect_format(filename: Optional[str], fmt: Optional[str] = None) -> str:
+    """Format explicite, sinon déduit de l'extension (.csv, .jsonl / .ndjson)"""
+    if fmt:
+        fmt = fmt.lower()
+    elif filename:
+        extension = filename.rsplit(".", 1)[-1].lower()
+        fmt = "jsonl" if extension in ("jsonl", "ndjson") else extension
+    if fmt not in IMPORT_FORMATS:
+        raise ImportFormatError(f"Format non supporté: {fmt} (attendu: {', '.join(IMPORT_FORMATS)})")
+    return fmt
+
+
+def as_text(stream) -> Iterable[str]:
+    """Flux texte UTF-8 (BOM toléré) à partir d'un fichier binaire ou texte"""
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    return codecs.getreader("utf-8-sig")(stream)
+
+
+def iter_records(stream, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """(numéro de ligne, dict) par enregistrement; une chaîne d'erreur à la place du dict si illisible"""
+    lines = as_text(stream)
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            # Cellules vides: valeur par défaut du schéma plutôt que chaîne vide
+            yield reader.line_num, {k.strip(): v for k, v in record.items() if k and v not in (None, "")}
+        return
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield number, f"JSON invalide: {e.msg}"
+            continue
+        yield number, record if isinstance(record, dict) else "Objet JSON attendu"
+
+
+def iter_chunks(records: Iterator[Tuple[int, Any]], size: int) -> Iterator[List[Tuple[int, Any]]]:
+    chunk: List[Tuple[int, Any]] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def validate_chunk(chunk, schema: Type[BaseModel], report: ImportReport) -> List[Tuple[int, BaseModel]]:
+    valid = []
+    for line, record in chunk:
+        report.rows += 1
+        if isinstance(record, str):
+            report.error(line, record)
+            continue
+        try:
+            valid.append((line, schema(**record)))
+        except ValidationError as e:
+            report.error(line, "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            ))
+    return valid
+
+
+def _run_chunks(db: Session, stream, fmt: str, schema, report: ImportReport, write, chunk_size: int, dry_run: bool):
+    for chunk in iter_chunks(iter_records(stream, fmt), chunk_size):
+        report.chunks += 1
+        valid = validate_chunk(chunk, schema, report)
+        if not valid or dry_run:
+            continue
+        try:
+            after_commit = write(valid)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            for line, _ in valid:
+                report.error(line, f"Lot annulé: {e.__class__.__name__}: {e}")
+            print(f"❌ Import {report.kind}: lot {report.chunks} annulé ({e})")
+            continue
+        if after_commit:
+            after_commit()
+        print(f"  … {report.kind}: {report.rows} lignes lues, {report.inserted} insérées")
+    metrics.inc("bulk_import_rows_total", report.inserted, kind=report.kind)
+    metrics.observe("bulk_import_seconds", time.perf_counter() - report._start)
+    return report
+
+
+# ---------- sujets ----------
+
+def import_sujets(
+    db: Session,
+    stream,
+    fmt: str,
+    on_duplicate: str = "reject",
+    user_id: Optional[int] = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    dry_run: bool = False,
+) -> ImportReport:
+    """Importe des sujets (colonnes de SujetCreate) par lots"""
+    if on_duplicate not in IMPORT_ON_DUPLICATE:
+        raise ValueError(f"on_duplicate invalide: {on_duplicate}")
+    report = ImportReport("sujets")
+    check = DEDUP_ENABLED and on_duplicate == "reject"
+    existing = ensure_index_loaded(db) if check else None
+    # Sujets du fichier déjà importés: un doublon interne est détecté même hors de leur lot.
+    # Les lignes d'un lot n'y entrent qu'après son commit (un lot annulé n'écarte rien)
+    seen = LSHIndex()
+
+    def write(valid):
+        rows, signatures = [], []
+        pending, accepted = LSHIndex(), []
+        for line, sujet in valid:
+            row = sujet.dict()
+            row["difficulté"] = getattr(row["difficulté"], "value", row["difficulté"])
+            signature = signature_for(row)
+            if check:
+                match = existing.query(signature)
+                if match:
+                    report.skipped += 1
+                    report.error(line, f"Quasi-doublon du sujet {match[0][0]} (similarité {match[0][1]:.2f})")
+                    continue
+                match = seen.query(signature) or pending.query(signature)
+                if match:
+                    report.skipped += 1
+                    report.error(line, f"Quasi-doublon de la ligne {match[0][0]} (similarité {match[0][1]:.2f})")
+                    continue
+                pending.add(line, signature)
+                accepted.append((line, signature))
+            row.update(minhash_signature=signature, user_id=user_id)
+            rows.append(row)
+            signatures.append(signature)
+        if not rows:
+            return None
+
+        ids = db.execute(
+            insert(_sujets).returning(_sujets.c.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+
+        keywords = [split_keywords(row["keywords"]) for row in rows]
+        apply_keyword_delta(db, [], [name for names in keywords for name in names])
+        keyword_ids = ensure_keyword_ids(db, {name for names in keywords for name in names})
+        links = [
+            {"sujet_id": sujet_id, "keyword_id": keyword_ids[name], "position": position}
+            for sujet_id, names in zip(ids, keywords)
+            for position, name in enumerate(names)
+        ]
+        if links:
+            db.execute(insert(_links), links)
+
+        def after_commit():
+            report.inserted += len(ids)
+            domain_stats.mark_dirty()
+            for sujet_id, signature in zip(ids, signatures):
+                dedup_index.add(sujet_id, signature)
+            for line, signature in accepted:
+                seen.add(line, signature)
+        return after_commit
+
+    return _run_chunks(db, stream, fmt, schemas.SujetCreate, report, write, chunk_size, dry_run)
+
+
+# ---------- utilisateurs ----------
+
+def import_users(
+    db: Session,
+    stream,
+    fmt: str,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    dry_run: bool = False,
+) -> ImportReport:
+    """Importe des utilisateurs (colonnes de UserCreate) par lots; les emails existants sont écartés"""
+    report = ImportReport("users")
+    # Emails des lots déjà validés: ceux d'un lot n'y entrent qu'après son commit
+    seen = set()
+
+    def write(valid):
+        emails = [user.email for _, user in valid]
+        taken = set(db.execute(select(_users.c.email).where(_users.c.email.in_(emails))).scalars())
+        rows, pending = [], set()
+        for line, user in valid:
+            email = user.email
+            if email in taken or email in seen or email in pending:
+                report.skipped += 1
+                report.error(line, f"Email déjà utilisé: {email}")
+                continue
+            pending.add(email)
+            rows.append({
+                "email": email,
+                "full_name": user.full_name,
+                "hashed_password": get_password_hash(user.password),
+                "role": user.role.value,
+            })
+        if not rows:
+            return None
+
+        ids = db.execute(
+            insert(_users).returning(_users.c.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+        defaults = [{"user_id": user_id} for user_id in ids]
+        for model in (UserPreference, UserProfile, UserSettings):
+            db.execute(insert(model.__table__), defaults)
+
+        def after_commit():
+            report.inserted += len(ids)
+            seen.update(pending)
+        return after_commit
+
+    return _run_chunks(db, stream, fmt, schemas.UserCreate, report, write, chunk_size, dry_run)
+
+
+IMPORTERS = {"sujets": import_sujets, "users": import_users}
@@ -0,0 +1,215 @@
+# app/circuit_breaker.py
+"""
+Disjoncteur (circuit breaker) pour les appels au fournisseur LLM.
+
+- closed:    les appels passent; les issues sont suivies sur une fenêtre glissante.
+             Le circuit s'ouvre si le taux d'échec ou le taux d'appels lents
+             dépasse son seuil (à partir de min_calls appels observés).
+- open:      les appels sont refusés immédiatement (repli local) jusqu'à la
+             prochaine sonde. Chaque réouverture double l'attente (plafonnée).
+- half_open: un nombre limité d'appels sondes passent; s'ils réussissent le
+             circuit se referme, sinon il se rouvre.
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+from app.metrics import metrics
+
+load_dotenv()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_threshold: float = 10.0,
+        slow_call_rate_threshold: float = 0.8,
+        window_size: int = 20,
+        min_calls: int = 5,
+        open_duration: float = 30.0,
+        max_open_duration: float = 300.0,
+        half_open_max_calls: int = 1
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = min_calls
+        self.base_open_duration = open_duration
+        self.max_open_duration = max_open_duration
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window_size)  # (succès, lent)
+        self._state = CLOSED
+        self._open_duration = open_duration
+        self._opened_at = 0.0
+        self._next_probe_at = 0.0
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+        # Numéro de la période half_open en cours: une sonde réservée n'est libérée que dans sa période
+        self._half_open_epoch = 0
+        self._last_failure = None
+        self._set_state_metric()
+
+    @classmethod
+    def from_env(cls, name: str, prefix: str) -> "CircuitBreaker":
+        def env(key: str, default: str) -> str:
+            return os.getenv(f"{prefix}_{key}", default)
+
+        return cls(
+            name=name,
+            failure_rate_threshold=float(env("FAILURE_RATE", "0.5")),
+            slow_call_threshold=float(env("SLOW_CALL_SECONDS", "10")),
+            slow_call_rate_threshold=float(env("SLOW_CALL_RATE", "0.8")),
+            window_size=int(env("WINDOW", "20")),
+            min_calls=int(env("MIN_CALLS", "5")),
+            open_duration=float(env("OPEN_SECONDS", "30")),
+            max_open_duration=float(env("MAX_OPEN_SECONDS", "300")),
+            half_open_max_calls=int(env("HALF_OPEN_CALLS", "1")),
+        )
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Indique si un appel peut partir (et réserve une sonde en half_open)"""
+        return self.try_acquire() is not None
+
+    def try_acquire(self) -> Optional[int]:
+        """
+        None si l'appel est refusé, sinon un jeton: 0 pour un appel ordinaire,
+        le numéro de période pour une sonde half_open. Une sonde dont l'appel
+        n'enregistre aucune issue (erreur avant le fournisseur) doit être
+        rendue par release(jeton), sinon le circuit resterait half_open.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._state == OPEN:
+                if now < self._next_probe_at:
+                    metrics.inc("circuit_rejected_total", circuit=self.name)
+                    return None
+                self._transition(HALF_OPEN)
+
+            if self._state == HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_max_calls:
+                    metrics.inc("circuit_rejected_total", circuit=self.name)
+                    return None
+                self._half_open_in_flight += 1
+                return self._half_open_epoch
+            return 0
+
+    def release(self, permit: Optional[int]):
+        """Rend une sonde réservée sans enregistrer d'issue (sans effet pour un appel ordinaire)"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._is_probe(permit):
+                self._half_open_in_flight = max(self._half_open_in_flight - 1, 0)
+
+    def _is_probe(self, permit: Optional[int]) -> bool:
+        # Seule la sonde de la période half_open en cours décide de l'état: un appel
+        # ordinaire (jeton 0) ou une sonde d'une période précédente, terminés en retard
+        # après un délai dépassé, ne ferment ni ne rouvrent le circuit
+        return bool(permit) and permit == self._half_open_epoch
+
+    def record_success(self, latency: float, permit: Optional[int] = None):
+        slow = latency >= self.slow_call_threshold
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if not self._is_probe(permit):
+                    return
+                self._half_open_in_flight = max(self._half_open_in_flight - 1, 0)
+                if slow:
+                    self._trip("sonde lente")
+                    return
+                self._half_open_successes += 1
+                if self._half_open_successes >= self.half_open_max_calls:
+                    self._outcomes.clear()
+                    self._open_duration = self.base_open_duration
+                    self._transition(CLOSED)
+                return
+            self._outcomes.append((True, slow))
+            self._evaluate()
+
+    def record_failure(self, latency: float = 0.0, error: Exception = None, permit: Optional[int] = None):
+        with self._lock:
+            self._last_failure = str(error)[:200] if error else None
+            if self._state == HALF_OPEN:
+                if not self._is_probe(permit):
+                    return
+                self._half_open_in_flight = max(self._half_open_in_flight - 1, 0)
+                self._trip("échec de la sonde")
+                return
+            self._outcomes.append((False, latency >= self.slow_call_threshold))
+            self._evaluate()
+
+    def _evaluate(self):
+        if self._state != CLOSED or len(self._outcomes) < self.min_calls:
+            return
+        total = len(self._outcomes)
+        failure_rate = sum(1 for ok, _ in self._outcomes if not ok) / total
+        slow_rate = sum(1 for _, slow in self._outcomes if slow) / total
+        if failure_rate >= self.failure_rate_threshold:
+            self._trip(f"taux d'échec {failure_rate:.0%}")
+        elif slow_rate >= self.slow_call_rate_threshold:
+            self._trip(f"taux d'appels lents {slow_rate:.0%}")
+
+    def _trip(self, reason: str):
+        # Réouverture depuis half_open: attente doublée jusqu'au plafond
+        if self._state == HALF_OPEN:
+            self._open_duration = min(self._open_duration * 2, self.max_open_duration)
+        now = time.monotonic()
+        self._opened_at = now
+        self._next_probe_at = now + self._open_duration
+        self._half_open_successes = 0
+        self._half_open_in_flight = 0
+        self._transition(OPEN)
+        print(f"⚡ Circuit {self.name} ouvert ({reason}), prochaine sonde dans {self._open_duration:.0f}s")
+
+    def _transition(self, state: str):
+        if state == self._state:
+            return
+        self._state = state
+        if state == HALF_OPEN:
+            self._half_open_in_flight = 0
+            self._half_open_successes = 0
+            self._half_open_epoch += 1
+        metrics.inc("circuit_transitions_total", circuit=self.name, to=state)
+        self._set_state_metric()
+
+    def _set_state_metric(self):
+        metrics.set_gauge("circuit_state", _STATE_VALUES[self._state], circuit=self.name)
+
+    def reset(self):
+        with self._lock:
+            self._outcomes.clear()
+            self._open_duration = self.base_open_duration
+            self._transition(CLOSED)
+
+    def state_info(self) -> Dict[str, Any]:
+        with self._lock:
+            total = len(self._outcomes)
+            info = {
+                "name": self.name,
+                "state": self._state,
+                "window_calls": total,
+                "failure_rate": round(sum(1 for ok, _ in self._outcomes if not ok) / total, 3) if total else 0.0,
+                "slow_call_rate": round(sum(1 for _, slow in self._outcomes if slow) / total, 3) if total else 0.0,
+                "last_failure": self._last_failure,
+            }
+            if self._state == OPEN:
+                info["next_probe_in"] = round(max(self._next_probe_at - time.monotonic(), 0), 1)
+            return info
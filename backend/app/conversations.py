@@ -0,0 +1,139 @@
+# app/conversations.py
+"""
+Stockage de l'historique de chat: écriture groupée et rétention.
+
+- Écriture: la question et la réponse d'un échange sont insérées ensemble
+  (un INSERT de deux lignes, dans la transaction de la requête), avec des
+  horodatages explicites (question à la réception, réponse à l'envoi) pour
+  que l'ordre de l'historique ne dépende pas de now() de la transaction.
+- Lecture: index (user_id, timestamp) pour "les N derniers messages".
+- Rétention: une tâche de fond supprime, par lots, les messages plus vieux
+  que CONVERSATION_RETENTION_DAYS et, par utilisateur, ceux au-delà des
+  CONVERSATION_MAX_PER_USER plus récents. Sous PostgreSQL, un verrou
+  consultatif évite que plusieurs workers purgent en même temps.
+  purge_conversations.py lance la même purge à la demande (cron).
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, insert, select, text
+
+from app.database import engine
+from app.metrics import metrics
+from app.models import ConversationMessage
+
+load_dotenv()
+
+CONVERSATION_RETENTION_DAYS = int(os.getenv("CONVERSATION_RETENTION_DAYS", "180"))
+CONVERSATION_MAX_PER_USER = int(os.getenv("CONVERSATION_MAX_PER_USER", "500"))
+CONVERSATION_PURGE_INTERVAL = float(os.getenv("CONVERSATION_PURGE_INTERVAL", "3600"))
+CONVERSATION_PURGE_BATCH = int(os.getenv("CONVERSATION_PURGE_BATCH", "5000"))
+CONVERSATION_PURGE_ENABLED = os.getenv("CONVERSATION_PURGE_ENABLED", "true").lower() == "true"
+
+_messages = ConversationMessage.__table__
+
+
+def exchange_statement(user_id: int, question: str, answer: str, asked_at: Optional[datetime] = None):
+    """INSERT des deux messages d'un échange (une instruction, deux lignes)"""
+    answered_at = datetime.now(timezone.utc)
+    asked_at = asked_at or answered_at
+    return insert(_messages).values([
+        {"user_id": user_id, "role": "user", "content": question, "timestamp": asked_at},
+        {"user_id": user_id, "role": "assistant", "content": answer, "timestamp": max(answered_at, asked_at)},
+    ])
+
+
+def _expired_ids(cutoff: datetime, limit: int):
+    return select(_messages.c.id).where(_messages.c.timestamp < cutoff).limit(limit)
+
+
+def _over_cap_ids(max_per_user: int, limit: int):
+    ranked = select(
+        _messages.c.id,
+        func.row_number().over(
+            partition_by=_messages.c.user_id,
+            order_by=(_messages.c.timestamp.desc(), _messages.c.id.desc()),
+        ).label("rank"),
+    ).subquery()
+    return select(ranked.c.id).where(ranked.c.rank > max_per_user).limit(limit)
+
+
+def purge_conversations(
+    retention_days: int = CONVERSATION_RETENTION_DAYS,
+    max_per_user: int = CONVERSATION_MAX_PER_USER,
+    batch_size: int = CONVERSATION_PURGE_BATCH,
+) -> Dict[str, int]:
+    """Supprime par lots (une transaction courte par lot) les messages expirés puis ceux au-delà du plafond"""
+    start = time.perf_counter()
+    removed = {"expired": 0, "over_cap": 0}
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    passes = []
+    if retention_days > 0:
+        passes.append(("expired", lambda: _expired_ids(cutoff, batch_size)))
+    if max_per_user > 0:
+        passes.append(("over_cap", lambda: _over_cap_ids(max_per_user, batch_size)))
+
+    for name, ids in passes:
+        while True:
+            with engine.begin() as conn:
+                if conn.dialect.name == "postgresql":
+                    locked = conn.execute(text("SELECT pg_try_advisory_xact_lock(hashtext('conversation_purge'))")).scalar()
+                    if not locked:
+                        return removed
+                count = conn.execute(delete(_messages).where(_messages.c.id.in_(ids()))).rowcount
+            removed[name] += count
+            if count < batch_size:
+                break
+
+    metrics.inc("conversation_messages_purged_total", removed["expired"], reason="expired")
+    metrics.inc("conversation_messages_purged_total", removed["over_cap"], reason="over_cap")
+    metrics.observe("conversation_purge_seconds", time.perf_counter() - start)
+    return removed
+
+
+class ConversationRetention:
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    def run_once(self) -> Dict[str, int]:
+        removed = purge_conversations()
+        self.last_run = {"at": datetime.now(timezone.utc).isoformat(), **removed}
+        if removed["expired"] or removed["over_cap"]:
+            print(f"🧹 Historique de chat purgé: {removed['expired']} expirés, {removed['over_cap']} au-delà du plafond")
+        return removed
+
+    def _run(self):
+        while not self._stop.wait(CONVERSATION_PURGE_INTERVAL):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"⚠️ Erreur purge de l'historique de chat: {e}")
+
+    def start(self):
+        if not CONVERSATION_PURGE_ENABLED or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="conversation-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": CONVERSATION_PURGE_ENABLED,
+            "retention_days": CONVERSATION_RETENTION_DAYS,
+            "max_per_user": CONVERSATION_MAX_PER_USER,
+            "last_run": self.last_run,
+        }
+
+
+# Instance globale
+conversation_retention = ConversationRetention()
+metrics.register_collector("conversation_retention", conversation_retention.stats)
@@ -0,0 +1,226 @@
+# app/counters.py
+"""
+Compteurs de vues et de likes en écriture différée (write-behind).
+
+Au lieu d'un SELECT + incrément Python + commit à chaque consultation, les
+incréments sont agrégés en mémoire par (sujet, compteur) puis écrits
+périodiquement en un seul lot d'UPDATE atomiques:
+    UPDATE sujets SET vue_count = vue_count + :n WHERE id = :id
+Aucun incrément n'est perdu entre requêtes concurrentes et chaque ligne n'est
+verrouillée qu'une fois par vidage. Le tampon est vidé à l'arrêt.
+
+Option compteurs répartis (COUNTER_SHARDS > 1): les sujets très consultés
+(au moins COUNTER_HOT_THRESHOLD incréments dans un vidage) sont écrits dans
+sujet_counter_shards sur une ligne choisie au hasard parmi N, pour que
+plusieurs workers ne se disputent pas la même ligne de sujets. Les shards sont
+replis dans sujets toutes les COUNTER_COMPACT_INTERVAL secondes.
+"""
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, delete, func, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.database import engine
+from app.domain_stats import domain_stats
+from app.metrics import metrics
+from app.models import Sujet, SujetCounterShard
+
+load_dotenv()
+
+COUNTER_BUFFER_ENABLED = os.getenv("COUNTER_BUFFER_ENABLED", "true").lower() == "true"
+COUNTER_FLUSH_INTERVAL = float(os.getenv("COUNTER_FLUSH_INTERVAL", "5"))
+# Vidage anticipé quand trop de sujets distincts sont en attente
+COUNTER_MAX_PENDING = int(os.getenv("COUNTER_MAX_PENDING", "1000"))
+COUNTER_SHARDS = int(os.getenv("COUNTER_SHARDS", "1"))
+COUNTER_HOT_THRESHOLD = int(os.getenv("COUNTER_HOT_THRESHOLD", "50"))
+COUNTER_COMPACT_INTERVAL = float(os.getenv("COUNTER_COMPACT_INTERVAL", "60"))
+
+COUNTERS = ("vue_count", "like_count")
+
+_sujets = Sujet.__table__
+_shards = SujetCounterShard.__table__
+
+
+def _upsert_shards(conn, rows):
+    """INSERT ... ON CONFLICT DO UPDATE value = value + excluded.value"""
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(_shards)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[_shards.c.sujet_id, _shards.c.counter, _shards.c.shard],
+        set_={"value": _shards.c.value + stmt.excluded.value},
+    )
+    conn.execute(stmt, rows)
+
+
+def _apply_increments(conn, increments: Dict[Tuple[int, str], int]):
+    """Un UPDATE atomique par compteur, exécuté en lot (executemany), dans l'ordre des id"""
+    by_counter = defaultdict(list)
+    for (sujet_id, counter), n in sorted(increments.items()):
+        by_counter[counter].append({"b_id": sujet_id, "b_n": n})
+    for counter, rows in by_counter.items():
+        stmt = (
+            update(_sujets)
+            .where(_sujets.c.id == bindparam("b_id"))
+            .values({counter: func.coalesce(_sujets.c[counter], 0) + bindparam("b_n")})
+        )
+        conn.execute(stmt, rows)
+
+
+class CounterBuffer:
+    def __init__(self):
+        self._pending: Dict[Tuple[int, str], int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_compact = time.monotonic()
+        self.enabled = COUNTER_BUFFER_ENABLED
+
+    # ---------- côté requête ----------
+
+    def add(self, sujet_id: int, counter: str = "vue_count", n: int = 1) -> bool:
+        """
+        Met l'incrément en attente. Retourne False si le tampon est désactivé:
+        l'appelant fait alors lui-même l'UPDATE atomique dans sa session.
+        """
+        if counter not in COUNTERS:
+            raise ValueError(f"Compteur inconnu: {counter}")
+        if not self.enabled:
+            return False
+        with self._lock:
+            self._pending[(sujet_id, counter)] += n
+            size = len(self._pending)
+        metrics.inc("counter_increments_total", n, counter=counter)
+        if size >= COUNTER_MAX_PENDING:
+            self._wake.set()
+        return True
+
+    def pending(self, sujet_id: int, counter: str = "vue_count") -> int:
+        with self._lock:
+            return self._pending.get((sujet_id, counter), 0)
+
+    def apply_pending(self, sujet: Sujet) -> Sujet:
+        """Ajoute les incréments en attente aux valeurs chargées, sans marquer l'objet modifié"""
+        with self._lock:
+            for counter in COUNTERS:
+                n = self._pending.get((sujet.id, counter), 0)
+                if n:
+                    set_committed_value(sujet, counter, (getattr(sujet, counter) or 0) + n)
+        return sujet
+
+    # ---------- écriture ----------
+
+    def flush(self) -> int:
+        """Écrit les incréments en attente; retourne le nombre d'incréments écrits"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(int)
+            if not pending:
+                return 0
+
+            direct, hot = {}, {}
+            for key, n in pending.items():
+                if COUNTER_SHARDS > 1 and n >= COUNTER_HOT_THRESHOLD:
+                    hot[key] = n
+                else:
+                    direct[key] = n
+
+            start = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    if direct:
+                        _apply_increments(conn, direct)
+                    if hot:
+                        _upsert_shards(conn, [
+                            {"sujet_id": sujet_id, "counter": counter,
+                             "shard": random.randrange(COUNTER_SHARDS), "value": n}
+                            for (sujet_id, counter), n in sorted(hot.items())
+                        ])
+            except Exception as e:
+                # Remettre les incréments en attente pour le prochain vidage
+                with self._lock:
+                    for key, n in pending.items():
+                        self._pending[key] += n
+                metrics.inc("counter_flush_errors_total")
+                print(f"⚠️ Erreur vidage des compteurs: {e}")
+                return 0
+
+            total = sum(pending.values())
+            # Les vues alimentent avg_views de la synthèse par domaine
+            domain_stats.mark_dirty()
+            metrics.inc("counter_flushed_total", total)
+            metrics.inc("counter_flush_rows_total", len(pending))
+            metrics.observe("counter_flush_seconds", time.perf_counter() - start)
+            return total
+
+    def compact(self) -> int:
+        """Replie les shards dans sujets (DELETE ... RETURNING puis UPDATE, même transaction)"""
+        self._last_compact = time.monotonic()
+        with engine.begin() as conn:
+            rows = conn.execute(
+                delete(_shards).returning(_shards.c.sujet_id, _shards.c.counter, _shards.c.value)
+            ).all()
+            increments = defaultdict(int)
+            for sujet_id, counter, value in rows:
+                increments[(sujet_id, counter)] += value
+            if increments:
+                _apply_increments(conn, increments)
+        if increments:
+            domain_stats.mark_dirty()
+        return len(increments)
+
+    # ---------- tâche de fond ----------
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(COUNTER_FLUSH_INTERVAL)
+            self._wake.clear()
+            try:
+                self.flush()
+                if COUNTER_SHARDS > 1 and time.monotonic() - self._last_compact >= COUNTER_COMPACT_INTERVAL:
+                    self.compact()
+                domain_stats.refresh_if_due()
+            except Exception as e:
+                print(f"⚠️ Erreur compteurs différés: {e}")
+
+    def start(self):
+        # Démarrée même tampon désactivé: elle porte aussi le recalcul de domain_stats
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="counter-buffer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrête la tâche de fond et vide le tampon (appelé à l'arrêt de l'application)"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=COUNTER_FLUSH_INTERVAL + 5)
+        self.flush()
+        if COUNTER_SHARDS > 1:
+            self.compact()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "pending_keys": len(self._pending),
+                "pending_increments": sum(self._pending.values()),
+                "shards": COUNTER_SHARDS,
+            }
+
+
+# Instance globale
+counter_buffer = CounterBuffer()
+metrics.register_collector("counter_buffer", counter_buffer.stats)
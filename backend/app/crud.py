@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from typing import Optional, List, Dict, Any
+from sqlalchemy import delete, func, desc, select, update
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, timedelta
 import json
 from app.models import (
@@ -10,14 +10,74 @@ from app.models import (
 )
 from app import schemas
 from app.auth import get_password_hash
+from app.dedup import (
+    ON_DUPLICATE_MODES, DuplicateSujetError, dedup_index, find_duplicate, signature_for
+)
+from app.metrics import metrics
+from app.counters import counter_buffer
+from app.database import after_commit
+from app.keyword_stats import apply_keyword_delta, counted_keywords, split_keywords
+from app import keyword_stats, user_stats
+from app.domain_stats import domain_stats
+from app.keywords import has_keywords_clause, remove_sujet_keywords, sync_sujet_keywords
+from app.search import apply_text_search, keyword_search
+from app.pagination import Page, keyset_paginate, offset_paginate
+from app.projection import sujet_columns
+from app.loading import FEEDBACK_COLUMNS, FEEDBACK_WITH_SUJET, SUJET_COLUMNS, USER_COLUMNS
+
+# Ordres de pagination par clé (la dernière colonne, unique, départage les ex aequo).
+# Les id croissent avec created_at: trier par id donne « plus récents d'abord »
+# en profitant directement de l'index de clé primaire.
+USER_SORT = [(User.id, "asc")]
+SUJET_SORT = [(Sujet.id, "desc")]
+FEEDBACK_SORT = [(Feedback.id, "desc")]
+
+
+# Unité de travail: les fonctions d'écriture ne font que flush(); la session de
+# requête (database.get_db) valide tout en un commit. Les effets hors base
+# (caches, index en mémoire) passent par after_commit.
+
+def _dialect_insert(dialect_name: str, model):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(model)
+
+def user_row_upsert(dialect_name: str, model, user_id: int, values: Dict[str, Any]):
+    """
+    Ligne 1-1 d'un utilisateur (préférences, profil, paramètres) créée ou mise à jour
+    en une instruction: INSERT ... ON CONFLICT (user_id) DO UPDATE ... RETURNING.
+    """
+    values = {k: v for k, v in values.items() if v is not None and k in model.__table__.c and k not in ("id", "user_id")}
+    stmt = _dialect_insert(dialect_name, model).values(user_id=user_id, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[model.user_id],
+        set_={**{k: stmt.excluded[k] for k in values}, "updated_at": func.now()},
+    )
+    return stmt.returning(model)
+
+def _upsert_for_user(db: Session, model, user_id: int, values: Dict[str, Any]):
+    stmt = user_row_upsert(db.get_bind().dialect.name, model, user_id, values)
+    return db.scalars(stmt, execution_options={"populate_existing": True}).one()
+
+def _get_or_create_for_user(db: Session, model, user_id: int):
+    """Lecture d'abord (cas courant); création sans course via INSERT ... ON CONFLICT DO NOTHING"""
+    row = db.query(model).filter(model.user_id == user_id).first()
+    if row is None:
+        db.execute(_dialect_insert(db.get_bind().dialect.name, model).values(user_id=user_id).on_conflict_do_nothing(
+            index_elements=[model.user_id]
+        ))
+        row = db.query(model).filter(model.user_id == user_id).one()
+    return row
 
 
 # ========== USER FUNCTIONS ==========
 def get_user(db: Session, user_id: int) -> Optional[User]:
-    return db.query(User).filter(User.id == user_id).first()
+    return db.query(User).options(*USER_COLUMNS).filter(User.id == user_id).first()
 
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
-    return db.query(User).filter(User.email == email).first()
+    return db.query(User).options(*USER_COLUMNS).filter(User.email == email).first()
 
 def create_user(db: Session, user: schemas.UserCreate) -> User:
     hashed_password = get_password_hash(user.password)
@@ -25,17 +85,14 @@ def create_user(db: Session, user: schemas.UserCreate) -> User:
         email=user.email,
         full_name=user.full_name,
         hashed_password=hashed_password,
-        role=user.role.value if hasattr(user.role, 'value') else user.role
+        role=user.role.value if hasattr(user.role, 'value') else user.role,
+        # Entrées par défaut, insérées dans le même flush
+        preferences=UserPreference(),
+        profile=UserProfile(),
+        settings=UserSettings()
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    
-    # Créer les entrées par défaut
-    create_user_preference(db, db_user.id)
-    create_user_profile(db, db_user.id)
-    create_user_settings(db, db_user.id)
-    
+    db.flush()
     return db_user
 
 def update_user(db: Session, user_id: int, user_data: Dict[str, Any]) -> Optional[User]:
@@ -47,17 +104,16 @@ def update_user(db: Session, user_id: int, user_data: Dict[str, Any]) -> Optiona
         if hasattr(user, key) and value is not None:
             setattr(user, key, value)
     
-    db.commit()
-    db.refresh(user)
+    db.flush()
     return user
 
-def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
-    return db.query(User).offset(skip).limit(limit).all()
+def get_users(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Page:
+    return keyset_paginate(db.query(User).options(*USER_COLUMNS), USER_SORT, limit, cursor=cursor, skip=skip)
 
 
 # ========== SUJET FUNCTIONS ==========
 def get_sujet(db: Session, sujet_id: int) -> Optional[Sujet]:
-    return db.query(Sujet).filter(Sujet.id == sujet_id).first()
+    return db.query(Sujet).options(*SUJET_COLUMNS).filter(Sujet.id == sujet_id).first()
 
 def get_sujets(
     db: Session,
@@ -68,19 +124,44 @@ def get_sujets(
     faculté: Optional[str] = None,
     niveau: Optional[str] = None,
     difficulté: Optional[str] = None,
-    is_active: bool = True
-) -> List[Sujet]:
-    query = db.query(Sujet)
+    is_active: bool = True,
+    cursor: Optional[str] = None,
+    keywords: Optional[List[str]] = None,
+    fields: Optional[Tuple[str, ...]] = None
+) -> Page:
+    """
+    Sujets filtrés; page suivante via Page.next_cursor (skip accepté pour compatibilité).
+    fields: projection (app/projection.py) -> lignes de ces colonnes au lieu d'objets Sujet.
+    """
+    query = db.query(*sujet_columns(fields)) if fields else db.query(Sujet).options(*SUJET_COLUMNS)
+    query = filter_sujets(
+        db, query, search=search, domaine=domaine, faculté=faculté, niveau=niveau,
+        difficulté=difficulté, is_active=is_active, keywords=keywords
+    )
     
+    if search:
+        # Ordre de pertinence: pas de clé stable, curseur positionnel
+        return offset_paginate(query, limit, cursor=cursor, skip=skip)
+    return keyset_paginate(query, SUJET_SORT, limit, cursor=cursor, skip=skip)
+
+def filter_sujets(
+    db: Session,
+    query,
+    search: Optional[str] = None,
+    domaine: Optional[str] = None,
+    faculté: Optional[str] = None,
+    niveau: Optional[str] = None,
+    difficulté: Optional[str] = None,
+    is_active: bool = True,
+    keywords: Optional[List[str]] = None
+):
+    """Filtres communs à la liste paginée et à l'export"""
     if is_active:
         query = query.filter(Sujet.is_active == True)
     
     if search:
-        query = query.filter(
-            Sujet.titre.contains(search) |
-            Sujet.keywords.contains(search) |
-            Sujet.description.contains(search)
-        )
+        # Plein texte (tsvector/FTS5) trié par pertinence, LIKE en dernier recours
+        query = apply_text_search(db, query, search)
     
     if domaine:
         query = query.filter(Sujet.domaine == domaine)
@@ -94,9 +175,41 @@ def get_sujets(
     if difficulté:
         query = query.filter(Sujet.difficulté == difficulté)
     
-    return query.offset(skip).limit(limit).all()
+    if keywords:
+        # Tous les mots-clés demandés, via l'index de sujet_keywords
+        query = query.filter(has_keywords_clause(keywords))
+    
+    return query
+
+def export_sujets(db: Session, fields: Tuple[str, ...], batch_size: int = 1000, **filters: Any):
+    """
+    Lignes du catalogue filtré (mêmes filtres que get_sujets), lues par lots de
+    batch_size via un curseur côté serveur: la mémoire ne dépend pas de la taille de la table.
+    """
+    query = filter_sujets(db, db.query(*sujet_columns(fields)), **filters)
+    if not filters.get("search"):
+        query = query.order_by(Sujet.id)
+    return query.yield_per(batch_size)
+
+def create_sujet(
+    db: Session,
+    sujet: schemas.SujetCreate,
+    user_id: Optional[int] = None,
+    on_duplicate: str = "allow"
+) -> Sujet:
+    """
+    Crée un sujet après recherche de quasi-doublon (index MinHash/LSH).
+
+    on_duplicate:
+    - "allow":  insère toujours (comportement historique)
+    - "reject": lève DuplicateSujetError
+    - "merge":  n'insère rien, complète le sujet existant et le retourne
+                (réservé au catalogue / aux admins: le sujet existant est modifié)
+    - "link":   insère le sujet en le rattachant au sujet existant (duplicate_of_id)
+    """
+    if on_duplicate not in ON_DUPLICATE_MODES:
+        raise ValueError(f"on_duplicate invalide: {on_duplicate}")
 
-def create_sujet(db: Session, sujet: schemas.SujetCreate, user_id: Optional[int] = None) -> Sujet:
     # Convertir en dict
     sujet_dict = sujet.dict()
     
@@ -104,24 +217,98 @@ def create_sujet(db: Session, sujet: schemas.SujetCreate, user_id: Optional[int]
     if user_id:
         sujet_dict["user_id"] = user_id
     
+    signature = signature_for(sujet_dict)
+    sujet_dict["minhash_signature"] = signature
+    duplicate = find_duplicate(db, signature)
+    if duplicate:
+        existing_id, similarity = duplicate
+        metrics.inc("dedup_duplicates_total", action=on_duplicate)
+        print(f"🧬 Quasi-doublon du sujet {existing_id} ({similarity:.2f}), action: {on_duplicate}")
+        if on_duplicate == "reject":
+            raise DuplicateSujetError(existing_id, similarity)
+        if on_duplicate == "merge":
+            existing = get_sujet(db, existing_id)
+            if existing:
+                return merge_into_sujet(db, existing, sujet_dict)
+        if on_duplicate == "link":
+            sujet_dict["duplicate_of_id"] = existing_id
+    
     # Créer l'instance Sujet
     db_sujet = Sujet(**sujet_dict)
     db.add(db_sujet)
-    db.commit()
-    db.refresh(db_sujet)
+    apply_keyword_delta(db, [], counted_keywords(db_sujet))
+    db.flush()
+    sync_sujet_keywords(db, db_sujet.id, db_sujet.keywords)
+    after_commit(db, domain_stats.mark_dirty)
+    if db_sujet.user_id:
+        after_commit(db, lambda: user_stats.invalidate_user(db_sujet.user_id))
+    # Les sujets rattachés ne servent pas de référence: seul l'original reste dans l'index
+    if db_sujet.duplicate_of_id is None:
+        sujet_id = db_sujet.id
+        after_commit(db, lambda: dedup_index.add(sujet_id, signature))
     return db_sujet
 
+def merge_into_sujet(db: Session, existing: Sujet, sujet_dict: Dict[str, Any]) -> Sujet:
+    """Fusionne un quasi-doublon dans le sujet existant: union des mots-clés, champs vides complétés"""
+    before = counted_keywords(existing)
+    keywords = [k.strip() for k in (existing.keywords or "").split(",") if k.strip()]
+    known = {k.lower() for k in keywords}
+    for keyword in (sujet_dict.get("keywords") or "").split(","):
+        keyword = keyword.strip()
+        if keyword and keyword.lower() not in known:
+            keywords.append(keyword)
+            known.add(keyword.lower())
+    existing.keywords = ", ".join(keywords)
+    
+    for key in ("méthodologie", "technologies", "durée_estimée", "ressources"):
+        if not getattr(existing, key) and sujet_dict.get(key):
+            setattr(existing, key, sujet_dict[key])
+    
+    existing.minhash_signature = signature_for(existing)
+    apply_keyword_delta(db, before, counted_keywords(existing))
+    sync_sujet_keywords(db, existing.id, existing.keywords)
+    db.flush()
+    sujet_id, signature = existing.id, existing.minhash_signature
+    after_commit(db, lambda: dedup_index.add(sujet_id, signature))
+    return existing
+
 def update_sujet(db: Session, sujet_id: int, sujet_data: Dict[str, Any]) -> Optional[Sujet]:
-    sujet = get_sujet(db, sujet_id)
-    if not sujet:
+    """
+    UPDATE ... RETURNING: une instruction renvoie la ligne modifiée. Les anciens
+    mots-clés (delta keyword_stats) ne sont lus, verrouillés, que s'ils peuvent changer.
+    """
+    values = {k: v for k, v in sujet_data.items() if v is not None and k in Sujet.__table__.c and k != "id"}
+    if not values:
+        return get_sujet(db, sujet_id)
+    
+    before = None
+    if {"keywords", "is_active"} & set(values):
+        old = db.execute(
+            select(Sujet.keywords, Sujet.is_active).where(Sujet.id == sujet_id).with_for_update()
+        ).first()
+        if old is None:
+            return None
+        before = split_keywords(old.keywords) if old.is_active is not False else []
+    
+    sujet = db.scalars(
+        update(Sujet).where(Sujet.id == sujet_id).values(**values).returning(Sujet),
+        execution_options={"populate_existing": True, "synchronize_session": False}
+    ).first()
+    if sujet is None:
         return None
     
-    for key, value in sujet_data.items():
-        if hasattr(sujet, key) and value is not None:
-            setattr(sujet, key, value)
-    
-    db.commit()
-    db.refresh(sujet)
+    if {"titre", "problématique", "keywords"} & set(values):
+        sujet.minhash_signature = signature_for(sujet)
+    
+    if before is not None:
+        apply_keyword_delta(db, before, counted_keywords(sujet))
+    if "keywords" in values:
+        sync_sujet_keywords(db, sujet.id, sujet.keywords)
+    db.flush()
+    after_commit(db, domain_stats.mark_dirty)
+    if sujet.duplicate_of_id is None and sujet.minhash_signature:
+        signature = sujet.minhash_signature
+        after_commit(db, lambda: dedup_index.add(sujet_id, signature))
     return sujet
 
 def delete_sujet(db: Session, sujet_id: int) -> bool:
@@ -129,48 +316,58 @@ def delete_sujet(db: Session, sujet_id: int) -> bool:
     if not sujet:
         return False
     
+    apply_keyword_delta(db, counted_keywords(sujet), [])
+    remove_sujet_keywords(db, sujet_id)
     db.delete(sujet)
-    db.commit()
+    db.flush()
+    after_commit(db, domain_stats.mark_dirty)
+    after_commit(db, lambda: dedup_index.remove(sujet_id))
     return True
 
+def _increment_counter(db: Session, sujet_id: int, counter: str):
+    # Tampon d'écriture différée (app/counters.py); sinon UPDATE atomique immédiat
+    if not counter_buffer.add(sujet_id, counter):
+        db.query(Sujet).filter(Sujet.id == sujet_id).update(
+            {counter: getattr(Sujet, counter) + 1}, synchronize_session=False
+        )
+
 def update_sujet_vue_count(db: Session, sujet_id: int):
-    sujet = get_sujet(db, sujet_id)
-    if sujet:
-        sujet.vue_count += 1
-        db.commit()
+    _increment_counter(db, sujet_id, "vue_count")
 
 def like_sujet(db: Session, sujet_id: int) -> Optional[Sujet]:
     sujet = get_sujet(db, sujet_id)
     if sujet:
-        sujet.like_count += 1
-        db.commit()
-        db.refresh(sujet)
+        _increment_counter(db, sujet_id, "like_count")
+        if counter_buffer.enabled:
+            counter_buffer.apply_pending(sujet)
+        else:
+            db.refresh(sujet, ["like_count"])
     return sujet
 
 
 # ========== PREFERENCE FUNCTIONS ==========
 def get_or_create_preference(db: Session, user_id: int) -> UserPreference:
-    preference = db.query(UserPreference).filter(UserPreference.user_id == user_id).first()
-    if not preference:
-        preference = create_user_preference(db, user_id)
-    return preference
+    return _get_or_create_for_user(db, UserPreference, user_id)
 
 def create_user_preference(db: Session, user_id: int) -> UserPreference:
     preference = UserPreference(user_id=user_id)
     db.add(preference)
-    db.commit()
-    db.refresh(preference)
+    db.flush()
     return preference
 
 def update_preference(db: Session, user_id: int, preference_data: Dict[str, Any]) -> UserPreference:
-    preference = get_or_create_preference(db, user_id)
-    
-    for key, value in preference_data.items():
-        if hasattr(preference, key) and value is not None:
-            setattr(preference, key, value)
-    
-    db.commit()
-    db.refresh(preference)
+    return _upsert_for_user(db, UserPreference, user_id, preference_data)
+
+
+def merge_preference_interests(db: Session, user_id: int, interests: List[str]) -> UserPreference:
+    """Ajoute des intérêts aux préférences: une seule lecture, sans commit (à la charge de l'appelant)"""
+    preference = db.query(UserPreference).filter(UserPreference.user_id == user_id).first()
+    if not preference:
+        preference = UserPreference(user_id=user_id)
+        db.add(preference)
+    current = [i.strip() for i in (preference.interests or "").split(",") if i.strip()]
+    merged = list(dict.fromkeys(current + [i.strip() for i in interests if i and i.strip()]))
+    preference.interests = ", ".join(merged)
     return preference
 
 
@@ -178,36 +375,42 @@ def update_preference(db: Session, user_id: int, preference_data: Dict[str, Any]
 def create_feedback(db: Session, feedback: schemas.FeedbackCreate, user_id: int) -> Feedback:
     db_feedback = Feedback(**feedback.dict(), user_id=user_id)
     db.add(db_feedback)
-    db.commit()
-    db.refresh(db_feedback)
+    db.flush()
+    after_commit(db, lambda: user_stats.invalidate_user(user_id))
     return db_feedback
 
-def get_user_feedbacks(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Feedback]:
-    return db.query(Feedback).filter(Feedback.user_id == user_id).offset(skip).limit(limit).all()
-
-def get_sujet_feedbacks(db: Session, sujet_id: int, skip: int = 0, limit: int = 100) -> List[Feedback]:
-    return db.query(Feedback).filter(Feedback.sujet_id == sujet_id).offset(skip).limit(limit).all()
+def get_user_feedbacks(
+    db: Session, user_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+) -> Page:
+    query = db.query(Feedback).options(*FEEDBACK_COLUMNS).filter(Feedback.user_id == user_id)
+    return keyset_paginate(query, FEEDBACK_SORT, limit, cursor=cursor, skip=skip)
+
+def get_sujet_feedbacks(
+    db: Session, sujet_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+) -> Page:
+    query = db.query(Feedback).options(*FEEDBACK_COLUMNS).filter(Feedback.sujet_id == sujet_id)
+    return keyset_paginate(query, FEEDBACK_SORT, limit, cursor=cursor, skip=skip)
+
+def get_saved_sujets(db: Session, user_id: int) -> List[Feedback]:
+    """Sujets sauvegardés (feedbacks intéressé), chacun avec son sujet chargé dans la même requête"""
+    return (
+        db.query(Feedback)
+        .options(*FEEDBACK_WITH_SUJET)
+        .join(Feedback.sujet)
+        .filter(Feedback.user_id == user_id, Feedback.intéressé == True, Sujet.is_active == True)
+        .order_by(Feedback.id.desc())
+        .all()
+    )
 
 
 # ========== SEARCH FUNCTIONS ==========
 def search_sujets_by_keywords(db: Session, keywords: List[str], limit: int = 10) -> List[Sujet]:
-    if not keywords:
-        return []
-    
-    query = db.query(Sujet).filter(Sujet.is_active == True)
-    
-    import sqlalchemy as sa
-    conditions = []
-    for keyword in keywords:
-        keyword_pattern = f"%{keyword.lower()}%"
-        conditions.append(sa.func.lower(Sujet.keywords).like(keyword_pattern))
-        conditions.append(sa.func.lower(Sujet.titre).like(keyword_pattern))
-        conditions.append(sa.func.lower(Sujet.description).like(keyword_pattern))
-    
-    if conditions:
-        query = query.filter(sa.or_(*conditions))
-    
-    return query.order_by(Sujet.vue_count.desc()).limit(limit).all()
+    """Sujets triés par score de similarité (trigrammes sous PostgreSQL)"""
+    return [sujet for sujet, _ in keyword_search(db, keywords, limit)]
+
+def search_sujets_by_keywords_scored(db: Session, keywords: List[str], limit: int = 10) -> List[tuple]:
+    """Comme search_sujets_by_keywords, avec le score: [(sujet, score), ...]"""
+    return keyword_search(db, keywords, limit)
 
 
 # ========== USER PROFILE FUNCTIONS ==========
@@ -217,25 +420,15 @@ def get_user_profile(db: Session, user_id: int) -> Optional[UserProfile]:
 def create_user_profile(db: Session, user_id: int) -> UserProfile:
     db_profile = UserProfile(user_id=user_id)
     db.add(db_profile)
-    db.commit()
-    db.refresh(db_profile)
+    db.flush()
     return db_profile
 
 def get_or_create_profile(db: Session, user_id: int) -> UserProfile:
-    profile = get_user_profile(db, user_id)
-    if not profile:
-        profile = create_user_profile(db, user_id)
-    return profile
+    return _get_or_create_for_user(db, UserProfile, user_id)
 
 def update_user_profile(db: Session, user_id: int, profile_data: dict) -> UserProfile:
-    profile = get_or_create_profile(db, user_id)
-    
-    for key, value in profile_data.items():
-        if hasattr(profile, key) and value is not None:
-            setattr(profile, key, value)
-    
-    db.commit()
-    db.refresh(profile)
+    profile = _upsert_for_user(db, UserProfile, user_id, profile_data)
+    after_commit(db, lambda: user_stats.invalidate_user(user_id))
     return profile
 
 
@@ -246,170 +439,109 @@ def get_user_skills(db: Session, user_id: int) -> List[UserSkill]:
 def create_user_skill(db: Session, user_id: int, skill_data: dict) -> UserSkill:
     db_skill = UserSkill(user_id=user_id, **skill_data)
     db.add(db_skill)
-    db.commit()
-    db.refresh(db_skill)
+    db.flush()
     return db_skill
 
+def _skill_key(name: Optional[str]) -> str:
+    return " ".join((name or "").split()).lower()
+
 def update_user_skills(db: Session, user_id: int, skills: List[dict]) -> List[UserSkill]:
-    # Supprimer les anciennes compétences
-    db.query(UserSkill).filter(UserSkill.user_id == user_id).delete()
-    
-    # Ajouter les nouvelles
-    created_skills = []
+    """
+    Remplace les compétences par la liste donnée, par différence avec l'existant
+    (clé: nom sans casse): une lecture, puis un DELETE ... IN, un UPDATE groupé
+    (executemany) des niveaux/catégories modifiés et un INSERT multi-lignes,
+    dans la transaction de la requête. Les objets retournés sont ceux déjà
+    chargés ou insérés: aucun refresh.
+    """
+    wanted: Dict[str, dict] = {}
     for skill_data in skills:
-        skill = create_user_skill(db, user_id, skill_data)
-        created_skills.append(skill)
-    
-    db.commit()
-    return created_skills
+        # Doublon dans la liste: la dernière occurrence l'emporte
+        wanted[_skill_key(skill_data.get("name"))] = skill_data
+    
+    existing: Dict[str, UserSkill] = {}
+    duplicates = []
+    for skill in db.query(UserSkill).filter(UserSkill.user_id == user_id).order_by(UserSkill.id):
+        key = _skill_key(skill.name)
+        if key in existing:
+            duplicates.append(skill)
+        else:
+            existing[key] = skill
+    
+    removed = [skill for key, skill in existing.items() if key not in wanted] + duplicates
+    if removed:
+        db.execute(delete(UserSkill).where(UserSkill.id.in_([skill.id for skill in removed])))
+        for skill in removed:
+            db.expunge(skill)
+    
+    result = []
+    for key, skill_data in wanted.items():
+        skill = existing.get(key)
+        if skill is None:
+            skill = UserSkill(user_id=user_id, **skill_data)
+            db.add(skill)
+        else:
+            for field in ("name", "level", "category"):
+                if field in skill_data and getattr(skill, field) != skill_data[field]:
+                    setattr(skill, field, skill_data[field])
+        result.append(skill)
+    
+    # Le flush groupe les UPDATE par colonnes modifiées et les INSERT en une instruction
+    db.flush()
+    return result
 
 
 # ========== USER STATS FUNCTIONS ==========
 def get_user_stats(db: Session, user_id: int) -> Dict[str, Any]:
-    """Calcule les statistiques de l'utilisateur"""
-    # Compter les sujets explorés
-    explored_subjects = db.query(Feedback).filter(
-        Feedback.user_id == user_id,
-        Feedback.pertinence.isnot(None)
-    ).count()
-    
-    # Compter les recommandations
-    recommendations_count = db.query(Feedback).filter(
-        Feedback.user_id == user_id,
-        Feedback.intéressé == True
-    ).count()
-    
-    # Calculer la complétion du profil
-    profile = get_user_profile(db, user_id)
-    profile_completion = 0
-    if profile:
-        fields = [
-            profile.bio, profile.location, profile.university, 
-            profile.field, profile.level, profile.interests,
-            profile.phone, profile.website, profile.linkedin, profile.github
-        ]
-        filled_fields = sum(1 for field in fields if field and str(field).strip())
-        profile_completion = int((filled_fields / len(fields)) * 100)
-    
-    # Jours actifs
-    active_days = db.query(func.count(func.distinct(func.date(Feedback.created_at)))).filter(
-        Feedback.user_id == user_id
-    ).scalar() or 0
-    
-    # Dernière activité
-    last_feedback = db.query(Feedback).filter(
-        Feedback.user_id == user_id
-    ).order_by(Feedback.created_at.desc()).first()
-    
-    last_active = last_feedback.created_at if last_feedback else datetime.utcnow()
-    
-    return {
-        "profile_completion": profile_completion,
-        "explored_subjects": explored_subjects,
-        "recommendations_count": recommendations_count,
-        "active_days": active_days,
-        "last_active": last_active
-    }
+    """Calcule les statistiques de l'utilisateur (instantané en cache, une requête sinon)"""
+    return user_stats.user_stats_from(user_stats.load_snapshot(db, user_id))
 
 
 # ========== STATISTICS FUNCTIONS ==========
 def get_popular_keywords(db: Session, limit: int = 20) -> List[Dict[str, Any]]:
-    """Récupère les mots-clés les plus populaires"""
-    from collections import Counter
-    
-    sujets = get_sujets(db, limit=1000)
-    all_keywords = []
-    
-    for sujet in sujets:
-        if sujet.keywords:
-            keywords = [k.strip().lower() for k in sujet.keywords.split(',')]
-            all_keywords.extend(keywords)
-    
-    keyword_counts = Counter(all_keywords)
-    popular = keyword_counts.most_common(limit)
-    
-    return [{"keyword": k, "count": c} for k, c in popular]
+    """Récupère les mots-clés les plus populaires (table keyword_stats)"""
+    return keyword_stats.get_popular_keywords(db, limit)
 
 def get_domain_stats(db: Session) -> List[Dict[str, Any]]:
-    """Statistiques par domaine"""
-    stats = db.query(
-        Sujet.domaine,
-        func.count(Sujet.id).label('count'),
-        func.avg(Sujet.vue_count).label('avg_views')
-    ).filter(Sujet.is_active == True).group_by(Sujet.domaine).all()
-    
-    return [
-        {"domaine": stat.domaine, "count": stat.count, "avg_views": float(stat.avg_views or 0)}
-        for stat in stats
-    ]
+    """Statistiques par domaine (synthèse domain_stats, servie depuis le cache)"""
+    return domain_stats.get(db)
 
 def get_popular_sujets(db: Session, limit: int = 10):
     """Récupère les sujets les plus populaires par nombre de vues"""
-    return db.query(models.Sujet)\
-        .filter(models.Sujet.is_active == True)\
-        .order_by(models.Sujet.vue_count.desc(), models.Sujet.like_count.desc())\
+    return db.query(Sujet)\
+        .filter(Sujet.is_active == True)\
+        .order_by(Sujet.vue_count.desc(), Sujet.like_count.desc())\
         .limit(limit)\
         .all()
 
 def get_dashboard_stats(db: Session, user_id: int) -> Dict[str, Any]:
-    """Statistiques pour le tableau de bord"""
-    # Total des sujets
-    total_sujets = db.query(Sujet).filter(Sujet.is_active == True).count()
-    
-    # Sujets de l'utilisateur
-    user_sujets = db.query(Sujet).filter(Sujet.user_id == user_id).count()
-    
-    # Sujets sauvegardés (intéressé ou sélectionné)
-    saved_sujets = db.query(Feedback).filter(
-        Feedback.user_id == user_id,
-        Feedback.intéressé == True
-    ).count()
-    
-    # Recommandations générées
-    recommendations_count = db.query(Feedback).filter(Feedback.user_id == user_id).count()
-    
-    # Dernière activité
-    last_feedback = db.query(Feedback).filter(
-        Feedback.user_id == user_id
-    ).order_by(Feedback.created_at.desc()).first()
-    
-    last_activity = last_feedback.created_at if last_feedback else None
-    
-    # Mots-clés populaires
-    popular_keywords = get_popular_keywords(db, limit=10)
+    """Statistiques pour le tableau de bord (au plus une requête par ouverture)"""
+    snapshot = user_stats.load_snapshot(db, user_id)
     
-    # Statistiques par domaine
-    domain_stats = get_domain_stats(db)
+    popular_keywords = user_stats.popular_keywords_cache.get(10)
+    if popular_keywords is None:
+        popular_keywords = get_popular_keywords(db, limit=10)
+        user_stats.popular_keywords_cache.set(10, popular_keywords)
     
-    return {
-        "total_sujets": total_sujets,
-        "user_sujets": user_sujets,
-        "saved_sujets": saved_sujets,
-        "recommendations_count": recommendations_count,
-        "last_activity": last_activity,
-        "popular_keywords": popular_keywords,
-        "domain_stats": domain_stats
-    }
+    return user_stats.dashboard_from(snapshot, popular_keywords, get_domain_stats(db))
+
 
 
 # ========== HISTORY & CONVERSATION FUNCTIONS ==========
 def create_user_history(db: Session, history_data: schemas.UserHistoryCreate) -> UserHistory:
     db_history = UserHistory(**history_data.dict())
     db.add(db_history)
-    db.commit()
-    db.refresh(db_history)
+    db.flush()
     return db_history
 
 def get_conversation_history(db: Session, user_id: int, limit: int = 10) -> List[ConversationMessage]:
     return db.query(ConversationMessage).filter(
         ConversationMessage.user_id == user_id
-    ).order_by(ConversationMessage.timestamp.desc()).limit(limit).all()
+    ).order_by(ConversationMessage.timestamp.desc(), ConversationMessage.id.desc()).limit(limit).all()
 
 def save_conversation_message(db: Session, user_id: int, role: str, content: str) -> ConversationMessage:
     db_message = ConversationMessage(user_id=user_id, role=role, content=content)
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+    db.flush()
     return db_message
 
 
@@ -417,60 +549,59 @@ def save_conversation_message(db: Session, user_id: int, role: str, content: str
 def create_user_settings(db: Session, user_id: int) -> UserSettings:
     settings = UserSettings(user_id=user_id)
     db.add(settings)
-    db.commit()
-    db.refresh(settings)
+    db.flush()
     return settings
 
 def get_user_settings(db: Session, user_id: int) -> Optional[UserSettings]:
     return db.query(UserSettings).filter(UserSettings.user_id == user_id).first()
 
 def update_user_settings(db: Session, user_id: int, settings_data: dict) -> UserSettings:
-    settings = get_user_settings(db, user_id)
-    if not settings:
-        settings = create_user_settings(db, user_id)
-    
-    for key, value in settings_data.items():
-        if hasattr(settings, key) and value is not None:
-            setattr(settings, key, value)
-    
-    db.commit()
-    db.refresh(settings)
-    return settings
+    return _upsert_for_user(db, UserSettings, user_id, settings_data)
 
 
 # ========== AI SPECIFIC FUNCTIONS ==========
-def save_chosen_subject(db: Session, user_id: int, subject_data: schemas.SaveChosenSubjectRequest) -> Sujet:
-    """Sauvegarde un sujet choisi par l'utilisateur"""
+def record_subject_choice(
+    db: Session,
+    user_id: int,
+    sujet: Sujet,
+    interests: Optional[List[str]] = None,
+    with_feedback: bool = True
+):
+    """Feedback, historique et intérêts d'un sujet choisi: ajoutés ensemble, un seul flush"""
+    if with_feedback:
+        db.add(Feedback(
+            sujet_id=sujet.id,
+            user_id=user_id,
+            intéressé=True,
+            sélectionné=True,
+            commentaire="Sujet choisi parmi les recommandations IA"
+        ))
+    if interests:
+        merge_preference_interests(db, user_id, interests)
+    db.add(UserHistory(
+        user_id=user_id,
+        action="chose_ai_subject",
+        details=f"A choisi le sujet généré par IA: {sujet.titre}",
+        sujet_id=sujet.id
+    ))
+    db.flush()
+    after_commit(db, lambda: user_stats.invalidate_user(user_id))
+
+def save_chosen_subject(
+    db: Session,
+    user_id: int,
+    subject_data: schemas.SaveChosenSubjectRequest,
+    on_duplicate: str = "link"
+) -> Sujet:
+    """Sauvegarde un sujet choisi par l'utilisateur (un quasi-doublon est rattaché au sujet existant)"""
     sujet_data = subject_data.dict(exclude={'interests'})
     sujet_data['user_id'] = user_id
     sujet_data['is_active'] = True
     
     # Créer le sujet
-    sujet = create_sujet(db, schemas.SujetCreate(**sujet_data), user_id)
-    
-    # Créer un feedback pour ce sujet
-    feedback_data = {
-        "sujet_id": sujet.id,
-        "intéressé": True,
-        "sélectionné": True,
-        "commentaire": "Sujet choisi parmi les recommandations IA"
-    }
-    create_feedback(db, schemas.FeedbackCreate(**feedback_data), user_id)
+    sujet = create_sujet(db, schemas.SujetCreate(**sujet_data), user_id, on_duplicate=on_duplicate)
     
-    # Mettre à jour les préférences avec les intérêts
-    if subject_data.interests:
-        preference = get_or_create_preference(db, user_id)
-        current_interests = preference.interests.split(',') if preference.interests else []
-        new_interests = list(set(current_interests + subject_data.interests))
-        update_preference(db, user_id, {"interests": ', '.join(new_interests)})
+    # Feedback, préférences et historique en une transaction
+    record_subject_choice(db, user_id, sujet, subject_data.interests)
     
-    # Créer un historique
-    history_data = {
-        "user_id": user_id,
-        "action": "chose_ai_subject",
-        "details": f"A choisi le sujet généré par IA: {sujet.titre}",
-        "sujet_id": sujet.id
-    }
-    create_user_history(db, schemas.UserHistoryCreate(**history_data))
-    
-    return sujet
\ No newline at end of file
+    return sujet
@@ -0,0 +1,158 @@
+# app/crud_async.py
+"""
+Versions asynchrones (AsyncSession) des fonctions CRUD les plus sollicitées.
+
+Mêmes noms et mêmes résultats que app/crud.py, pour les routes async def:
+les requêtes n'immobilisent plus la boucle d'événements. Les fonctions
+restées synchrones doivent être appelées depuis des routes def (exécutées
+par FastAPI dans le pool de threads).
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.conversations import exchange_statement
+from app.counters import counter_buffer
+from app import user_stats
+from app.crud import SUJET_SORT, user_row_upsert
+from app.database import AsyncSessionLocal, engine
+from app.domain_stats import domain_stats
+from app.keywords import has_keywords_clause
+from app.loading import SUJET_COLUMNS, USER_COLUMNS
+from app.models import ConversationMessage, KeywordStat, Sujet, User, UserPreference
+from app.projection import sujet_columns
+from app.pagination import Page, keyset_paginate_async, offset_paginate_async
+from app.search import apply_text_search, search_backend_for
+
+
+# ========== USER FUNCTIONS ==========
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    result = await db.execute(select(User).options(*USER_COLUMNS).where(User.email == email))
+    return result.scalars().first()
+
+
+# ========== SUJET FUNCTIONS ==========
+async def get_sujet(db: AsyncSession, sujet_id: int) -> Optional[Sujet]:
+    return await db.get(Sujet, sujet_id, options=SUJET_COLUMNS)
+
+async def get_sujets(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    search: Optional[str] = None,
+    domaine: Optional[str] = None,
+    faculté: Optional[str] = None,
+    niveau: Optional[str] = None,
+    difficulté: Optional[str] = None,
+    is_active: bool = True,
+    cursor: Optional[str] = None,
+    keywords: Optional[List[str]] = None,
+    fields: Optional[Tuple[str, ...]] = None
+) -> Page:
+    """fields: projection (app/projection.py) -> lignes de ces colonnes au lieu d'objets Sujet"""
+    stmt = select(*sujet_columns(fields)) if fields else select(Sujet).options(*SUJET_COLUMNS)
+
+    if is_active:
+        stmt = stmt.where(Sujet.is_active == True)
+
+    if search:
+        # Détection des capacités plein texte par le moteur synchrone (mise en cache)
+        stmt = apply_text_search(None, stmt, search, backend=search_backend_for(engine))
+
+    if domaine:
+        stmt = stmt.where(Sujet.domaine == domaine)
+
+    if faculté:
+        stmt = stmt.where(Sujet.faculté == faculté)
+
+    if niveau:
+        stmt = stmt.where(Sujet.niveau == niveau)
+
+    if difficulté:
+        stmt = stmt.where(Sujet.difficulté == difficulté)
+
+    if keywords:
+        stmt = stmt.where(has_keywords_clause(keywords))
+
+    if search:
+        return await offset_paginate_async(db, stmt, limit, cursor=cursor, skip=skip)
+    return await keyset_paginate_async(db, stmt, SUJET_SORT, limit, cursor=cursor, skip=skip)
+
+async def update_sujet_vue_count(db: AsyncSession, sujet_id: int):
+    # Tampon d'écriture différée (app/counters.py); sinon incrément atomique immédiat
+    if counter_buffer.add(sujet_id, "vue_count"):
+        return
+    await db.execute(
+        update(Sujet).where(Sujet.id == sujet_id).values(vue_count=Sujet.vue_count + 1)
+    )
+
+
+# ========== PREFERENCE FUNCTIONS ==========
+async def get_or_create_preference(db: AsyncSession, user_id: int) -> UserPreference:
+    result = await db.execute(select(UserPreference).where(UserPreference.user_id == user_id))
+    preference = result.scalars().first()
+    if not preference:
+        # Création concurrente possible: l'upsert sans valeurs n'échoue jamais
+        preference = await update_preference(db, user_id, {})
+    return preference
+
+async def update_preference(db: AsyncSession, user_id: int, preference_data: Dict[str, Any]) -> UserPreference:
+    stmt = user_row_upsert(db.bind.dialect.name, UserPreference, user_id, preference_data)
+    return (await db.scalars(stmt, execution_options={"populate_existing": True})).one()
+
+
+# ========== CONVERSATION FUNCTIONS ==========
+async def get_conversation_history(db: AsyncSession, user_id: int, limit: int = 10) -> List[ConversationMessage]:
+    result = await db.execute(
+        select(ConversationMessage)
+        .where(ConversationMessage.user_id == user_id)
+        .order_by(ConversationMessage.timestamp.desc(), ConversationMessage.id.desc())
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+async def save_conversation_message(db: AsyncSession, user_id: int, role: str, content: str) -> ConversationMessage:
+    db_message = ConversationMessage(user_id=user_id, role=role, content=content)
+    db.add(db_message)
+    return db_message
+
+async def save_conversation_exchange(
+    db: AsyncSession, user_id: int, question: str, answer: str, asked_at: Optional[datetime] = None
+):
+    """Question et réponse d'un échange en un seul INSERT de deux lignes"""
+    await db.execute(exchange_statement(user_id, question, answer, asked_at))
+
+
+# ========== STATS FUNCTIONS ==========
+async def _fetch(stmt, scalar: bool = True):
+    # Une session par requête: une AsyncSession n'exécute pas deux requêtes à la fois
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(stmt)
+        return result.scalar() if scalar else result.all()
+
+async def get_popular_keywords(limit: int = 20) -> List[Dict[str, Any]]:
+    rows = await _fetch(
+        select(KeywordStat.keyword, KeywordStat.count)
+        .order_by(KeywordStat.count.desc(), KeywordStat.keyword)
+        .limit(limit),
+        scalar=False
+    )
+    return [{"keyword": k, "count": c} for k, c in rows]
+
+async def get_domain_stats() -> List[Dict[str, Any]]:
+    async with AsyncSessionLocal() as db:
+        return await domain_stats.get_async(db)
+
+async def get_dashboard_stats(user_id: int) -> Dict[str, Any]:
+    """Statistiques du tableau de bord: instantané par utilisateur, au plus une requête"""
+    async with AsyncSessionLocal() as db:
+        snapshot = await user_stats.load_snapshot_async(db, user_id)
+
+    popular_keywords = user_stats.popular_keywords_cache.get(10)
+    if popular_keywords is None:
+        popular_keywords = await get_popular_keywords(limit=10)
+        user_stats.popular_keywords_cache.set(10, popular_keywords)
+
+    return user_stats.dashboard_from(snapshot, popular_keywords, await get_domain_stats())
@@ -1,22 +1,130 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from dotenv import load_dotenv
 import os
 
+from app.db_pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument_engine, pool_options, pool_status
+from app.metrics import metrics
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 SQLALCHEMY_DATABASE_URL = DATABASE_URL
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_pre_ping=True)
+
+def _pool_kwargs(url, name: str, poolclass):
+    # SQLite en mémoire: une connexion = une base, on garde le pool par défaut
+    if ":memory:" in str(url) or make_url(str(url)).database in (None, ""):
+        return {}
+    return pool_options(name, poolclass)
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_pool_kwargs(SQLALCHEMY_DATABASE_URL, "sync", InstrumentedQueuePool))
+instrument_engine(engine, "sync")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 def get_db():
+    """
+    Session de requête (unité de travail): les fonctions crud se contentent de
+    flush(), la transaction est validée une seule fois ici, annulée si la route
+    lève une exception. À déclarer avec Depends(get_db, scope="function") pour
+    que le commit ait lieu avant l'envoi de la réponse.
+    """
     db = SessionLocal()
     try:
         yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def after_commit(db, callback):
+    """
+    Exécute callback (effet hors base: caches, index en mémoire) une fois la
+    transaction courante validée; abandonné si elle est annulée.
+    """
+    session = getattr(db, "sync_session", db)
+    session.info.setdefault("after_commit", []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session):
+    for callback in session.info.pop("after_commit", []):
+        try:
+            callback()
+        except Exception as e:
+            print(f"⚠️ Erreur après commit: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_commit(session):
+    session.info.pop("after_commit", None)
+
+
+# ======================
+# MOTEUR ASYNCHRONE
+# ======================
+
+# Pilote asynchrone correspondant au pilote synchrone de DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str):
+    """
+    Convertit l'URL synchrone en URL asyncpg/aiosqlite.
+
+    asyncpg ne connaît pas les paramètres libpq (sslmode, channel_binding):
+    ils sont retirés de l'URL et sslmode devient l'argument de connexion ssl.
+    """
+    sync_url = make_url(url)
+    backend = sync_url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Pas de pilote asynchrone connu pour {backend}")
+
+    connect_args = {}
+    query = dict(sync_url.query)
+    if backend == "postgresql":
+        sslmode = query.pop("sslmode", None)
+        query.pop("channel_binding", None)
+        if sslmode and sslmode != "disable":
+            connect_args["ssl"] = sslmode
+    return sync_url.set(drivername=ASYNC_DRIVERS[backend], query=query), connect_args
+
+
+ASYNC_DATABASE_URL, ASYNC_CONNECT_ARGS = to_async_url(os.getenv("ASYNC_DATABASE_URL") or DATABASE_URL)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args=ASYNC_CONNECT_ARGS,
+    **_pool_kwargs(ASYNC_DATABASE_URL, "async", InstrumentedAsyncQueuePool)
+)
+instrument_engine(async_engine.sync_engine, "async")
+# expire_on_commit=False: les objets restent lisibles après commit sans nouvel aller-retour
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+async def get_async_db():
+    """Équivalent asynchrone de get_db: un seul commit en fin de requête"""
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+
+metrics.register_collector("db_pool", lambda: {
+    "sync": pool_status(engine),
+    "async": pool_status(async_engine.sync_engine),
+})
@@ -0,0 +1,127 @@
+# app/db_pool.py
+"""
+Configuration et instrumentation des pools de connexions SQLAlchemy.
+
+- Taille, débordement, recyclage, délai d'attente et pre-ping viennent de
+  l'environnement (DB_POOL_*).
+- Les pools instrumentés mesurent l'attente d'une connexion libre (_do_get)
+  et l'acquisition complète (attente + pre-ping), dans les métriques
+  db_pool_checkout_wait_seconds et db_pool_acquire_seconds.
+- Les événements du pool alimentent les jauges in_use / overflow et les
+  compteurs de connexions ouvertes, d'invalidations et de délais dépassés.
+"""
+import os
+import time
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.metrics import metrics
+
+load_dotenv()
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Neon et la plupart des proxys ferment les connexions inactives: recycler avant
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_POOL_USE_LIFO = os.getenv("DB_POOL_USE_LIFO", "false").lower() == "true"
+
+
+def pool_options(name: str, poolclass) -> Dict[str, Any]:
+    """Arguments de create_engine / create_async_engine pour un pool instrumenté"""
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_use_lifo": DB_POOL_USE_LIFO,
+        "pool_logging_name": name,
+    }
+
+
+class _InstrumentedMixin:
+    def _pool_name(self) -> str:
+        return getattr(self, "_orig_logging_name", None) or "default"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            metrics.inc("db_pool_timeouts_total", pool=self._pool_name())
+            raise
+        finally:
+            metrics.observe("db_pool_checkout_wait_seconds", time.perf_counter() - start, pool=self._pool_name())
+
+    def connect(self):
+        # Attente + pre-ping + événements de checkout
+        start = time.perf_counter()
+        connection = super().connect()
+        metrics.observe("db_pool_acquire_seconds", time.perf_counter() - start, pool=self._pool_name())
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_engine(engine: Engine, name: str):
+    """Branche les événements du pool sur les métriques (moteur synchrone ou async_engine.sync_engine)"""
+    def update_gauges(returning: int = 0):
+        # L'événement checkin précède le retour effectif de la connexion dans la file
+        pool = engine.pool
+        metrics.set_gauge("db_pool_in_use", max(pool.checkedout() - returning, 0), pool=name)
+        metrics.set_gauge("db_pool_overflow", max(pool.overflow(), 0), pool=name)
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.inc("db_pool_connections_opened_total", pool=name)
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        update_gauges()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        update_gauges(returning=1)
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.inc("db_pool_invalidations_total", pool=name, soft="false")
+
+    @event.listens_for(engine, "soft_invalidate")
+    def on_soft_invalidate(dbapi_connection, connection_record, exception):
+        metrics.inc("db_pool_invalidations_total", pool=name, soft="true")
+
+    @event.listens_for(engine, "close")
+    def on_close(dbapi_connection, connection_record):
+        metrics.inc("db_pool_connections_closed_total", pool=name)
+
+
+def pool_status(engine: Engine) -> Dict[str, Any]:
+    pool = engine.pool
+    status = {"class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": DB_MAX_OVERFLOW,
+            "timeout": pool.timeout(),
+            "recycle": DB_POOL_RECYCLE,
+            "pre_ping": DB_POOL_PRE_PING,
+        })
+    return status
@@ -0,0 +1,242 @@
+# app/dedup.py
+"""
+Détection des quasi-doublons de sujets par MinHash + LSH.
+
+Chaque sujet reçoit une signature MinHash calculée sur titre + problématique +
+mots-clés (stockée dans sujets.minhash_signature). L'index LSH découpe la
+signature en bandes: deux sujets qui partagent au moins une bande sont
+candidats, et seule leur similarité estimée est ensuite comparée au seuil.
+Une recherche ne touche donc que quelques seaux au lieu de tout le catalogue.
+
+L'index vit en mémoire, un par processus: la détection est au mieux
+(best-effort). Les sujets insérés par les autres workers sont rattrapés depuis
+la colonne minhash_signature au plus tard DEDUP_REFRESH_INTERVAL secondes
+après (lecture des id supérieurs au dernier vu); une fusion, une modification
+ou une suppression faite dans un autre worker n'est vue qu'au rechargement
+complet, au redémarrage du processus.
+"""
+import os
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.metrics import metrics
+from app.semantic_cache import STOPWORDS, normalize_text
+
+load_dotenv()
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.7"))
+MINHASH_BANDS = int(os.getenv("MINHASH_BANDS", "16"))
+MINHASH_ROWS = int(os.getenv("MINHASH_ROWS", "4"))
+MINHASH_PERMUTATIONS = MINHASH_BANDS * MINHASH_ROWS
+# Rattrapage des sujets créés par les autres workers (0: à chaque recherche, < 0: jamais)
+DEDUP_REFRESH_INTERVAL = float(os.getenv("DEDUP_REFRESH_INTERVAL", "30"))
+
+# Permutations universelles h(x) = (a*x + b) mod p, p premier de Mersenne 2^31 - 1
+# (a*x tient dans un uint64 tant que a et x restent sous 2^31)
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(1234)
+_A = _rng.randint(1, _PRIME, size=MINHASH_PERMUTATIONS).astype(np.uint64)
+_B = _rng.randint(0, _PRIME, size=MINHASH_PERMUTATIONS).astype(np.uint64)
+
+ON_DUPLICATE_MODES = ("allow", "reject", "merge", "link")
+
+
+class DuplicateSujetError(Exception):
+    """Levée par create_sujet(on_duplicate="reject") quand un quasi-doublon existe"""
+
+    def __init__(self, existing_id: int, similarity: float):
+        self.existing_id = existing_id
+        self.similarity = similarity
+        super().__init__(f"Sujet quasi identique au sujet {existing_id} (similarité {similarity:.2f})")
+
+
+def shingles(titre: str, problématique: str = "", keywords: str = "") -> Set[str]:
+    """Bigrammes de mots pleins du texte + mots-clés entiers"""
+    features: Set[str] = set()
+    for text in (titre, problématique):
+        words = [w for w in normalize_text(text or "").split() if w not in STOPWORDS]
+        features.update(words if len(words) < 2 else (f"{a} {b}" for a, b in zip(words, words[1:])))
+    for keyword in (keywords or "").split(","):
+        keyword = normalize_text(keyword)
+        if keyword:
+            features.add("k:" + keyword)
+    return features
+
+
+def compute_signature(titre: str, problématique: str = "", keywords: str = "") -> List[int]:
+    features = shingles(titre, problématique, keywords)
+    if not features:
+        return [_PRIME] * MINHASH_PERMUTATIONS
+    hashes = np.array([zlib.crc32(f.encode("utf-8")) & _PRIME for f in features], dtype=np.uint64)
+    values = (np.outer(hashes, _A) + _B) % _PRIME
+    return values.min(axis=0).astype(int).tolist()
+
+
+def signature_for(sujet: Any) -> List[int]:
+    """Signature d'un objet ou d'un dict exposant titre/problématique/keywords"""
+    get = sujet.get if isinstance(sujet, dict) else lambda key: getattr(sujet, key, None)
+    return compute_signature(get("titre") or "", get("problématique") or "", get("keywords") or "")
+
+
+def estimate_similarity(a: List[int], b: List[int]) -> float:
+    """Jaccard estimé = proportion de composantes égales"""
+    return float(np.mean(np.asarray(a) == np.asarray(b)))
+
+
+class LSHIndex:
+    def __init__(self, bands: int = MINHASH_BANDS, rows: int = MINHASH_ROWS):
+        self.bands = bands
+        self.rows = rows
+        self._buckets: List[Dict[Tuple[int, ...], Set[int]]] = [defaultdict(set) for _ in range(bands)]
+        self._signatures: Dict[int, List[int]] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+        # Plus grand id lu en base (pas ceux ajoutés localement): point de reprise du rattrapage
+        self.max_id = 0
+        self.refreshed_at = 0.0
+
+    def _band_keys(self, signature: List[int]):
+        for band in range(self.bands):
+            yield band, tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def add(self, sujet_id: int, signature: List[int]):
+        with self._lock:
+            self._remove_unlocked(sujet_id)
+            self._signatures[sujet_id] = signature
+            for band, key in self._band_keys(signature):
+                self._buckets[band][key].add(sujet_id)
+
+    def remove(self, sujet_id: int):
+        with self._lock:
+            self._remove_unlocked(sujet_id)
+
+    def _remove_unlocked(self, sujet_id: int):
+        signature = self._signatures.pop(sujet_id, None)
+        if signature is None:
+            return
+        for band, key in self._band_keys(signature):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(sujet_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def query(self, signature: List[int], threshold: float = DEDUP_THRESHOLD,
+              exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Sujets dont la similarité estimée atteint le seuil, du plus proche au moins proche"""
+        with self._lock:
+            candidates: Set[int] = set()
+            for band, key in self._band_keys(signature):
+                candidates |= self._buckets[band].get(key, set())
+            candidates.discard(exclude)
+            scored = [(cid, estimate_similarity(signature, self._signatures[cid])) for cid in candidates]
+        metrics.observe("dedup_candidates", len(candidates))
+        return sorted((c for c in scored if c[1] >= threshold), key=lambda c: -c[1])
+
+    def clusters(self, threshold: float = DEDUP_THRESHOLD) -> List[List[Tuple[int, int, float]]]:
+        """Groupes de quasi-doublons (union-find sur les paires candidates)"""
+        parent: Dict[int, int] = {}
+
+        def find(x: int) -> int:
+            while parent.setdefault(x, x) != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        pairs: Dict[Tuple[int, int], float] = {}
+        with self._lock:
+            for buckets in self._buckets:
+                for members in buckets.values():
+                    if len(members) < 2:
+                        continue
+                    ordered = sorted(members)
+                    for i, a in enumerate(ordered):
+                        for b in ordered[i + 1:]:
+                            if (a, b) in pairs:
+                                continue
+                            pairs[(a, b)] = estimate_similarity(self._signatures[a], self._signatures[b])
+
+        groups: Dict[int, List[Tuple[int, int, float]]] = defaultdict(list)
+        matching = [(a, b, s) for (a, b), s in pairs.items() if s >= threshold]
+        for a, b, _ in matching:
+            parent[find(a)] = find(b)
+        for a, b, s in matching:
+            groups[find(a)].append((a, b, s))
+        return sorted(groups.values(), key=len, reverse=True)
+
+    def load(self, rows: Iterable[Tuple[int, List[int]]]):
+        with self._lock:
+            self._buckets = [defaultdict(set) for _ in range(self.bands)]
+            self._signatures = {}
+            self.max_id = 0
+        self.extend(rows)
+        self.loaded = True
+
+    def extend(self, rows: Iterable[Tuple[int, List[int]]]) -> int:
+        """Ajoute des sujets lus en base et avance le point de reprise; retourne leur nombre"""
+        count = 0
+        for sujet_id, signature in rows:
+            self.add(sujet_id, signature)
+            self.max_id = max(self.max_id, sujet_id)
+            count += 1
+        self.refreshed_at = time.monotonic()
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": DEDUP_ENABLED,
+                "loaded": self.loaded,
+                "sujets": len(self._signatures),
+                "bands": self.bands,
+                "rows": self.rows,
+                "threshold": DEDUP_THRESHOLD,
+                "max_id": self.max_id,
+                "refresh_interval": DEDUP_REFRESH_INTERVAL,
+            }
+
+
+def _signature_rows(db, after_id: int = 0) -> List[Tuple[int, List[int]]]:
+    """(id, signature) des sujets de référence (non rattachés) d'id supérieur à after_id"""
+    from app.models import Sujet
+
+    rows = db.query(
+        Sujet.id, Sujet.minhash_signature, Sujet.titre, Sujet.problématique, Sujet.keywords
+    ).filter(Sujet.duplicate_of_id.is_(None), Sujet.id > after_id).all()
+    return [
+        (row.id, row.minhash_signature or compute_signature(row.titre, row.problématique, row.keywords))
+        for row in rows
+    ]
+
+
+def ensure_index_loaded(db) -> LSHIndex:
+    """Charge l'index au premier usage du processus, puis rattrape les sujets des autres workers"""
+    if not dedup_index.loaded:
+        rows = _signature_rows(db)
+        dedup_index.load(rows)
+        print(f"🧬 Index LSH chargé: {len(rows)} sujets")
+    elif 0 <= DEDUP_REFRESH_INTERVAL <= time.monotonic() - dedup_index.refreshed_at:
+        added = dedup_index.extend(_signature_rows(db, dedup_index.max_id))
+        metrics.inc("dedup_index_refreshed_total", added)
+    return dedup_index
+
+
+def find_duplicate(db, signature: List[int], exclude: Optional[int] = None) -> Optional[Tuple[int, float]]:
+    """(id, similarité) du sujet existant le plus proche au-dessus du seuil, sinon None"""
+    if not DEDUP_ENABLED:
+        return None
+    matches = ensure_index_loaded(db).query(signature, exclude=exclude)
+    metrics.inc("dedup_checks_total")
+    return matches[0] if matches else None
+
+
+# Instance globale
+dedup_index = LSHIndex()
+metrics.register_collector("dedup_index", dedup_index.stats)
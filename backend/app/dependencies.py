@@ -1,39 +1,53 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app import crud, crud_async
+from app.database import get_db, get_async_db
 from app.auth import decode_access_token
-from app.crud import get_user_by_email
 from app.schemas import TokenData, UserRole
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+def _token_data(token: str) -> TokenData:
     payload = decode_access_token(token)
     if payload is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
     email: str = payload.get("sub")
     if email is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
-    token_data = TokenData(email=email, role=payload.get("role"))
-    
-    user = get_user_by_email(db, email=token_data.email)
+    return TokenData(email=email, role=payload.get("role"))
+
+# Routes synchrones: même dépendance que Depends(get_db, scope="function") de la route,
+# donc la même session (FastAPI la met en cache par requête) et une seule connexion du pool
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db, scope="function")
+):
+    user = crud.get_user_by_email(db, email=_token_data(token).email)
     if user is None:
-        raise credentials_exception
-    
+        raise _credentials_exception()
+    return user
+
+# Routes async (AsyncSession): l'utilisateur est lu sur la session asynchrone de la route
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db, scope="function")
+):
+    user = await crud_async.get_user_by_email(db, email=_token_data(token).email)
+    if user is None:
+        raise _credentials_exception()
     return user
 
 async def get_current_active_user(current_user = Depends(get_current_user)):
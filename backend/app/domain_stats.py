@@ -0,0 +1,153 @@
+# app/domain_stats.py
+"""
+Statistiques par domaine: table de synthèse domain_stats + cache en mémoire.
+
+- Synthèse: domain_stats (domaine, nombre de sujets actifs, total des vues)
+  est recalculée en une requête GROUP BY, jamais à chaque lecture.
+- Rafraîchissement: les écritures du catalogue (crud) et les vidages des
+  compteurs de vues (app/counters.py) marquent la synthèse comme périmée; la
+  tâche de fond des compteurs la recalcule au plus une fois toutes les
+  DOMAIN_STATS_REFRESH_INTERVAL secondes, et dans tous les cas après
+  DOMAIN_STATS_MAX_AGE secondes (écritures faites hors de l'application).
+  Les lectures ne déclenchent jamais de recalcul.
+- Cache: chaque worker garde les lignes lues avec leur version (max de
+  refreshed_at). Pendant DOMAIN_STATS_CHECK_INTERVAL secondes elles sont
+  servies sans accès base; ensuite seule la version est relue, et les lignes
+  ne sont rechargées que si elle a changé.
+
+Borne de fraîcheur: une écriture est visible au plus après
+DOMAIN_STATS_REFRESH_INTERVAL + DOMAIN_STATS_CHECK_INTERVAL secondes
+(DOMAIN_STATS_MAX_AGE + DOMAIN_STATS_CHECK_INTERVAL hors application).
+"""
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, insert, literal, select, text
+
+from app.cache import TTLCache
+from app.database import engine
+from app.metrics import metrics
+from app.models import DomainStat, Sujet
+
+load_dotenv()
+
+DOMAIN_STATS_REFRESH_INTERVAL = float(os.getenv("DOMAIN_STATS_REFRESH_INTERVAL", "10"))
+DOMAIN_STATS_MAX_AGE = float(os.getenv("DOMAIN_STATS_MAX_AGE", "300"))
+DOMAIN_STATS_CHECK_INTERVAL = float(os.getenv("DOMAIN_STATS_CHECK_INTERVAL", "5"))
+
+_stats = DomainStat.__table__
+
+VERSION_STATEMENT = select(func.max(_stats.c.refreshed_at))
+ROWS_STATEMENT = select(_stats.c.domaine, _stats.c.sujet_count, _stats.c.total_views).order_by(_stats.c.domaine)
+
+
+def _to_rows(result) -> List[Dict[str, Any]]:
+    return [
+        {
+            "domaine": domaine,
+            "count": sujet_count,
+            "avg_views": float(total_views or 0) / sujet_count if sujet_count else 0.0,
+        }
+        for domaine, sujet_count, total_views in result
+    ]
+
+
+class DomainStatsCache:
+    def __init__(self):
+        self._fresh = TTLCache(ttl=DOMAIN_STATS_CHECK_INTERVAL, max_entries=1)
+        self._last: Optional[tuple] = None  # (version, lignes)
+        self._lock = threading.Lock()
+        self._dirty = True
+        self._refreshed_at = 0.0  # time.monotonic() du dernier recalcul par ce worker
+
+    # ---------- rafraîchissement de la synthèse ----------
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    def refresh_due(self) -> bool:
+        age = time.monotonic() - self._refreshed_at
+        return (self._dirty and age >= DOMAIN_STATS_REFRESH_INTERVAL) or age >= DOMAIN_STATS_MAX_AGE
+
+    def refresh(self):
+        """Recalcule domain_stats en une transaction (verrou consultatif sous PostgreSQL)"""
+        start = time.perf_counter()
+        with self._lock:
+            # Recalcul fait par un autre thread pendant l'attente du verrou
+            if not self.refresh_due():
+                return
+            self._dirty = False
+            self._refreshed_at = time.monotonic()
+            try:
+                with engine.begin() as conn:
+                    if conn.dialect.name == "postgresql":
+                        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('domain_stats'))"))
+                    conn.execute(delete(_stats))
+                    conn.execute(insert(_stats).from_select(
+                        ["domaine", "sujet_count", "total_views", "refreshed_at"],
+                        select(
+                            Sujet.domaine,
+                            func.count(Sujet.id),
+                            func.coalesce(func.sum(Sujet.vue_count), 0),
+                            literal(datetime.now(timezone.utc), _stats.c.refreshed_at.type),
+                        ).where(Sujet.is_active == True).group_by(Sujet.domaine)
+                    ))
+            except Exception:
+                self._dirty = True
+                raise
+        self._fresh.clear()
+        metrics.inc("domain_stats_refreshes_total")
+        metrics.observe("domain_stats_refresh_seconds", time.perf_counter() - start)
+
+    def refresh_if_due(self):
+        if self.refresh_due():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ Erreur rafraîchissement domain_stats: {e}")
+
+    # ---------- lecture ----------
+
+    def _accept(self, version, load) -> List[Dict[str, Any]]:
+        if self._last and self._last[0] == version:
+            rows = self._last[1]
+        else:
+            rows = load()
+            self._last = (version, rows)
+            metrics.inc("domain_stats_cache_reloads_total")
+        self._fresh.set("rows", rows)
+        return rows
+
+    def get(self, db) -> List[Dict[str, Any]]:
+        rows = self._fresh.get("rows")
+        if rows is not None:
+            return rows
+        version = db.execute(VERSION_STATEMENT).scalar()
+        return self._accept(version, lambda: _to_rows(db.execute(ROWS_STATEMENT).all()))
+
+    async def get_async(self, db) -> List[Dict[str, Any]]:
+        rows = self._fresh.get("rows")
+        if rows is not None:
+            return rows
+        version = (await db.execute(VERSION_STATEMENT)).scalar()
+        if self._last and self._last[0] == version:
+            return self._accept(version, None)
+        loaded = _to_rows((await db.execute(ROWS_STATEMENT)).all())
+        return self._accept(version, lambda: loaded)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "dirty": self._dirty,
+            "seconds_since_refresh": round(time.monotonic() - self._refreshed_at, 1) if self._refreshed_at else None,
+            "version": str(self._last[0]) if self._last else None,
+            "cache": self._fresh.stats(),
+        }
+
+
+# Instance globale
+domain_stats = DomainStatsCache()
+metrics.register_collector("domain_stats", domain_stats.stats)
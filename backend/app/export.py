@@ -0,0 +1,172 @@
+# app/export.py
+"""
+Export en flux du catalogue de sujets (JSONL, CSV, Parquet).
+
+Les lignes sont lues par lots de EXPORT_BATCH_SIZE avec un curseur côté
+serveur (crud.export_sujets, yield_per) et sérialisées lot par lot dans une
+StreamingResponse: la mémoire du worker reste constante quelle que soit la
+taille de la table. Le générateur ouvre sa propre session, fermée à la fin
+du flux (ou à la déconnexion du client).
+
+Parquet nécessite pyarrow (dépendance optionnelle); sans lui le format est
+refusé avec ExportFormatUnavailable.
+"""
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Tuple
+
+from dotenv import load_dotenv
+
+from app import crud
+from app.database import SessionLocal
+from app.metrics import metrics
+
+load_dotenv()
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_FORMATS = {
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+class ExportFormatUnavailable(ValueError):
+    pass
+
+
+def check_format(fmt: str):
+    """Vérifie avant de commencer le flux que le format est utilisable"""
+    if fmt not in EXPORT_FORMATS:
+        raise ExportFormatUnavailable(f"Format inconnu: {fmt}")
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ExportFormatUnavailable("Export parquet indisponible: pyarrow n'est pas installé")
+
+
+def _json_default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _batches(rows: Iterator, size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(dict(row._mapping))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _jsonl(batches, fields: Tuple[str, ...]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(
+            json.dumps(row, ensure_ascii=False, default=_json_default) + "\n" for row in batch
+        ).encode("utf-8")
+
+
+def _csv(batches, fields: Tuple[str, ...]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    # BOM: Excel détecte l'UTF-8 (accents des noms de colonnes)
+    buffer.write("\ufeff")
+    writer.writeheader()
+    for batch in batches:
+        writer.writerows(
+            {k: v.isoformat() if isinstance(v, (datetime, date)) else v for k, v in row.items()} for row in batch
+        )
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _arrow_schema(fields: Tuple[str, ...]):
+    import pyarrow as pa
+    from sqlalchemy import Boolean, DateTime, Integer
+
+    from app.models import Sujet
+
+    def arrow_type(column_type):
+        if isinstance(column_type, Integer):
+            return pa.int64()
+        if isinstance(column_type, Boolean):
+            return pa.bool_()
+        if isinstance(column_type, DateTime):
+            return pa.timestamp("us", tz="UTC")
+        return pa.string()
+
+    # Schéma fixé par les colonnes: un lot où une colonne est entièrement nulle garde son type
+    return pa.schema([(name, arrow_type(Sujet.__table__.c[name].type)) for name in fields])
+
+
+class _Drain:
+    """Sortie binaire vidée après chaque groupe de lignes, position absolue conservée (pied Parquet)"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _parquet(batches, fields: Tuple[str, ...]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(fields)
+    sink = _Drain()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    for batch in batches:
+        # Un groupe de lignes par lot, envoyé dès qu'il est écrit
+        writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+_WRITERS = {"jsonl": _jsonl, "csv": _csv, "parquet": _parquet}
+
+
+def stream_sujets(fmt: str, fields: Tuple[str, ...], **filters: Any) -> Iterator[bytes]:
+    """Contenu du fichier d'export, morceau par morceau (un lot de lignes par morceau)"""
+    db = SessionLocal()
+    exported = 0
+    try:
+        rows = crud.export_sujets(db, fields, batch_size=EXPORT_BATCH_SIZE, **filters)
+
+        def counted():
+            nonlocal exported
+            for batch in _batches(rows, EXPORT_BATCH_SIZE):
+                exported += len(batch)
+                yield batch
+
+        yield from _WRITERS[fmt](counted(), fields)
+    finally:
+        db.close()
+        metrics.inc("sujets_exported_total", exported, format=fmt)
@@ -0,0 +1,191 @@
+# app/fake_llm.py
+"""
+Fournisseur LLM local et déterministe pour les tests de charge.
+
+Activé avec LLM_PROVIDER=fake. Simule la latence (distribution configurable
++ débit de génération en tokens/s), les erreurs et les refus 429, et renvoie
+des réponses JSON conformes aux prompts de app/llm_service.py.
+
+Variables d'environnement:
+    FAKE_LLM_LATENCY            distribution du temps avant premier token, ex:
+                                "fixed:0.5", "uniform:0.2:1.5", "normal:0.8:0.2",
+                                "lognormal:-0.5:0.6", "exponential:0.7"
+    FAKE_LLM_TOKENS_PER_SECOND  débit de génération (0 = instantané)
+    FAKE_LLM_ERROR_RATE         proportion d'erreurs génériques (0-1)
+    FAKE_LLM_RATE_LIMIT_RATE    proportion de refus 429 (0-1)
+    FAKE_LLM_SEED               graine du générateur aléatoire
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.llm_context import estimate_tokens
+from app.llm_providers import LLMProvider, LLMProviderError, LLMRateLimitError, LLMResponse
+
+
+def parse_latency_spec(spec: str) -> Dict[str, Any]:
+    """Convertit "lognormal:-0.5:0.6" en {"kind": "lognormal", "params": [-0.5, 0.6]}"""
+    parts = spec.split(":")
+    kind = parts[0].strip().lower()
+    params = [float(p) for p in parts[1:]]
+    expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+    if kind not in expected or len(params) != expected[kind]:
+        raise ValueError(f"Distribution de latence invalide: {spec}")
+    return {"kind": kind, "params": params}
+
+
+class FakeLLMProvider(LLMProvider):
+    name = "fake"
+
+    def __init__(
+        self,
+        latency: str = "fixed:0.3",
+        tokens_per_second: float = 0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: Optional[int] = 42
+    ):
+        self.latency = parse_latency_spec(latency)
+        self.latency_spec = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "FakeLLMProvider":
+        seed = os.getenv("FAKE_LLM_SEED", "42")
+        return cls(
+            latency=os.getenv("FAKE_LLM_LATENCY", "fixed:0.3"),
+            tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            rate_limit_rate=float(os.getenv("FAKE_LLM_RATE_LIMIT_RATE", "0")),
+            seed=int(seed) if seed else None
+        )
+
+    def _sample_latency(self) -> float:
+        kind, params = self.latency["kind"], self.latency["params"]
+        with self._lock:
+            if kind == "fixed":
+                value = params[0]
+            elif kind == "uniform":
+                value = self._random.uniform(params[0], params[1])
+            elif kind == "normal":
+                value = self._random.gauss(params[0], params[1])
+            elif kind == "lognormal":
+                value = self._random.lognormvariate(params[0], params[1])
+            else:
+                value = self._random.expovariate(1 / params[0])
+        return max(value, 0.0)
+
+    def _draw(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    def invoke(self, prompt: str) -> LLMResponse:
+        time.sleep(self._sample_latency())
+
+        draw = self._draw()
+        if draw < self.rate_limit_rate:
+            raise LLMRateLimitError("429 RESOURCE_EXHAUSTED (fake)")
+        if draw < self.rate_limit_rate + self.error_rate:
+            raise LLMProviderError("500 erreur simulée (fake)")
+
+        content = canned_response(prompt)
+        output_tokens = estimate_tokens(content)
+        if self.tokens_per_second > 0:
+            time.sleep(output_tokens / self.tokens_per_second)
+
+        return LLMResponse(
+            content=content,
+            usage_metadata={"input_tokens": estimate_tokens(prompt), "output_tokens": output_tokens}
+        )
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "provider": self.name,
+            "latency": self.latency_spec,
+            "tokens_per_second": self.tokens_per_second,
+            "error_rate": self.error_rate,
+            "rate_limit_rate": self.rate_limit_rate,
+        }
+
+
+# ======================
+# RÉPONSES PRÉDÉFINIES
+# ======================
+
+def _field(prompt: str, label: str, default: str) -> str:
+    match = re.search(rf"{label}\**:?\**:?\s*(.+)", prompt)
+    return match.group(1).strip() if match else default
+
+
+def _analysis(prompt: str) -> Dict[str, Any]:
+    titre = _field(prompt, r"\*\*TITRE", "ce sujet")
+    return {
+        "pertinence": 70 + len(titre) % 25,
+        "points_forts": [
+            f"Sujet clairement formulé: {titre[:60]}",
+            "Problématique ancrée dans le domaine",
+            "Méthodologie envisageable"
+        ],
+        "points_faibles": ["Périmètre à préciser", "Sources à identifier"],
+        "suggestions": [
+            "Réaliser une revue de littérature ciblée",
+            "Définir des indicateurs mesurables",
+            "Planifier les étapes clés"
+        ],
+        "recommandations": ["Valider le périmètre avec l'encadrant", "Constituer un corpus de référence"]
+    }
+
+
+def _recommendations(prompt: str) -> List[Dict[str, Any]]:
+    ids = [int(i) for i in re.findall(r"ID:\s*(\d+)", prompt)]
+    return [
+        {
+            "id": sujet_id,
+            "score": max(95 - rank * 7, 40),
+            "raisons": ["Correspond aux intérêts déclarés", "Niveau adapté"],
+            "critères": ["Faisabilité", "Pertinence"]
+        }
+        for rank, sujet_id in enumerate(ids[:5])
+    ]
+
+
+def _generated_subjects(prompt: str) -> List[Dict[str, Any]]:
+    count_match = re.search(r"Nombre de sujets:\s*(\d+)", prompt)
+    count = int(count_match.group(1)) if count_match else 3
+    domaine = _field(prompt, "- Domaine", "Général")
+    interests = _field(prompt, "- Intérêts", "recherche")
+    return [
+        {
+            "titre": f"Étude {i + 1} sur {interests[:60]} en {domaine}",
+            "problématique": f"Comment {interests[:60]} peut-il améliorer les pratiques en {domaine} ?",
+            "keywords": f"{domaine}, {interests[:40]}, analyse, méthode, étude",
+            "description": f"Sujet simulé {i + 1} pour les tests de charge.",
+            "methodologie": "Revue de littérature, étude de cas, évaluation",
+            "difficulté": "moyenne",
+            "durée_estimée": "6 mois"
+        }
+        for i in range(count)
+    ]
+
+
+def canned_response(prompt: str) -> str:
+    """Choisit une réponse cohérente avec le type de prompt reçu"""
+    if "Analyse ce sujet de mémoire" in prompt:
+        return json.dumps(_analysis(prompt), ensure_ascii=False)
+    if "SUJETS DISPONIBLES" in prompt:
+        return json.dumps(_recommendations(prompt), ensure_ascii=False)
+    if "générateur de sujets" in prompt:
+        return json.dumps(_generated_subjects(prompt), ensure_ascii=False)
+    return (
+        "Voici quelques pistes pour avancer: précisez votre domaine, "
+        "identifiez une problématique concrète et vérifiez l'accès aux données. "
+        "Je peux ensuite vous proposer trois sujets adaptés à votre niveau."
+    )
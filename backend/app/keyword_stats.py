@@ -0,0 +1,104 @@
+# app/keyword_stats.py
+"""
+Popularité des mots-clés matérialisée dans la table keyword_stats.
+
+count = nombre de sujets actifs portant le mot-clé (normalisé en minuscules).
+La table est maintenue par deltas dans la transaction même de chaque écriture
+de sujet (création, fusion, mise à jour, suppression): chaque delta est un
+upsert atomique count = count + delta, les lignes tombées à zéro sont
+supprimées. rebuild_keyword_stats() recalcule tout depuis sujets.keywords
+(voir rebuild_keyword_stats.py).
+"""
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.metrics import metrics
+from app.models import KeywordStat, Sujet
+
+REBUILD_BATCH_SIZE = 1000
+
+_stats = KeywordStat.__table__
+
+
+def split_keywords(keywords: Optional[str]) -> List[str]:
+    """Mots-clés distincts, normalisés, dans l'ordre d'apparition"""
+    seen = {}
+    for keyword in (keywords or "").split(","):
+        keyword = keyword.strip().lower()
+        if keyword:
+            seen.setdefault(keyword[:200], None)
+    return list(seen)
+
+
+def counted_keywords(sujet: Any) -> List[str]:
+    """Mots-clés comptés pour un sujet: aucun s'il est inactif ou absent"""
+    if sujet is None or getattr(sujet, "is_active", True) is False:
+        return []
+    return split_keywords(getattr(sujet, "keywords", None))
+
+
+def _insert_for(bind):
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(_stats)
+
+
+def apply_keyword_delta(db: Session, before: Iterable[str], after: Iterable[str]):
+    """
+    Répercute le passage de before à after (listes de mots-clés d'un sujet).
+    À appeler avant le commit de l'écriture du sujet, dans la même session.
+    """
+    delta = Counter(after)
+    delta.subtract(Counter(before))
+    delta = {k: n for k, n in delta.items() if n}
+    if not delta:
+        return
+
+    stmt = _insert_for(db.get_bind())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[_stats.c.keyword],
+        set_={"count": _stats.c.count + stmt.excluded.count, "updated_at": func.now()},
+    )
+    db.execute(stmt, [{"keyword": k, "count": n} for k, n in sorted(delta.items())])
+    db.execute(delete(_stats).where(_stats.c.keyword.in_(list(delta)), _stats.c.count <= 0))
+    metrics.inc("keyword_stats_updates_total", len(delta))
+
+
+def get_popular_keywords(db: Session, limit: int = 20) -> List[Dict[str, Any]]:
+    """Lecture indexée: ORDER BY count DESC LIMIT n"""
+    rows = db.execute(
+        select(_stats.c.keyword, _stats.c.count)
+        .order_by(_stats.c.count.desc(), _stats.c.keyword)
+        .limit(limit)
+    ).all()
+    return [{"keyword": k, "count": c} for k, c in rows]
+
+
+def rebuild_keyword_stats(db: Session) -> int:
+    """Recalcule toute la table depuis sujets.keywords (lecture par lots); retourne le nombre de mots-clés"""
+    counts = Counter()
+    last_id = 0
+    while True:
+        batch = db.execute(
+            select(Sujet.id, Sujet.keywords)
+            .where(Sujet.is_active == True, Sujet.id > last_id)
+            .order_by(Sujet.id)
+            .limit(REBUILD_BATCH_SIZE)
+        ).all()
+        if not batch:
+            break
+        for _, keywords in batch:
+            counts.update(split_keywords(keywords))
+        last_id = batch[-1].id
+
+    db.execute(delete(_stats))
+    rows = [{"keyword": k, "count": n} for k, n in counts.items()]
+    for start in range(0, len(rows), REBUILD_BATCH_SIZE):
+        db.execute(insert(_stats), rows[start:start + REBUILD_BATCH_SIZE])
+    db.commit()
+    return len(rows)
@@ -0,0 +1,169 @@
+# app/keywords.py
+"""
+Forme normalisée des mots-clés: tables keywords et sujet_keywords.
+
+sujets.keywords (texte séparé par des virgules) reste la forme affichée et
+éditée; la table de liaison en est la copie indexée, synchronisée par crud à
+chaque écriture de sujet. Elle permet de répondre par index à:
+- "sujets portant le(s) mot(s)-clé(s) X"   -> has_keywords_clause
+- facettes (mots-clés des sujets filtrés)   -> keyword_facets
+- co-occurrence (mots-clés liés à X)        -> related_keywords
+backfill_sujet_keywords() reconstruit la liaison par lots depuis la colonne.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, bindparam, delete, func, insert, select, update
+from sqlalchemy.orm import Session, aliased
+
+from app.keyword_stats import split_keywords
+from app.models import Keyword, Sujet, SujetKeyword
+
+BACKFILL_BATCH_SIZE = 500
+
+_keywords = Keyword.__table__
+_links = SujetKeyword.__table__
+
+
+def _insert_ignore(bind, table):
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(table).on_conflict_do_nothing()
+
+
+def ensure_keyword_ids(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    """Identifiants des mots-clés (déjà normalisés), créés au besoin"""
+    names = sorted(set(names))
+    if not names:
+        return {}
+    ids = dict(db.execute(select(_keywords.c.name, _keywords.c.id).where(_keywords.c.name.in_(names))).all())
+    missing = [name for name in names if name not in ids]
+    if missing:
+        # ON CONFLICT DO NOTHING: un autre worker a pu créer le même mot-clé entre-temps
+        db.execute(_insert_ignore(db.get_bind(), _keywords), [{"name": name} for name in missing])
+        ids.update(db.execute(
+            select(_keywords.c.name, _keywords.c.id).where(_keywords.c.name.in_(missing))
+        ).all())
+    return ids
+
+
+def sync_sujet_keywords(db: Session, sujet_id: int, keywords: Optional[str]):
+    """Aligne sujet_keywords sur le texte keywords du sujet (à appeler avant le commit)"""
+    names = split_keywords(keywords)
+    ids = ensure_keyword_ids(db, names)
+    wanted = {ids[name]: position for position, name in enumerate(names)}
+    current = dict(db.execute(
+        select(_links.c.keyword_id, _links.c.position).where(_links.c.sujet_id == sujet_id)
+    ).all())
+
+    removed = set(current) - set(wanted)
+    if removed:
+        db.execute(delete(_links).where(_links.c.sujet_id == sujet_id, _links.c.keyword_id.in_(removed)))
+    # Mots-clés conservés mais déplacés dans le texte
+    moved = [
+        {"b_keyword_id": keyword_id, "b_position": position}
+        for keyword_id, position in wanted.items()
+        if keyword_id in current and current[keyword_id] != position
+    ]
+    if moved:
+        db.execute(
+            update(_links)
+            .where(_links.c.sujet_id == sujet_id, _links.c.keyword_id == bindparam("b_keyword_id"))
+            .values(position=bindparam("b_position")),
+            moved,
+        )
+    added = [
+        {"sujet_id": sujet_id, "keyword_id": keyword_id, "position": position}
+        for keyword_id, position in wanted.items() if keyword_id not in current
+    ]
+    if added:
+        db.execute(insert(_links), added)
+
+
+def remove_sujet_keywords(db: Session, sujet_id: int):
+    db.execute(delete(_links).where(_links.c.sujet_id == sujet_id))
+
+
+def has_keywords_clause(keywords: List[str], match_all: bool = True):
+    """Condition Sujet.id IN (...) pour Query.filter() comme pour select().where()"""
+    names = sorted({name for keyword in keywords for name in split_keywords(keyword)})
+    subquery = (
+        select(_links.c.sujet_id)
+        .join(_keywords, _keywords.c.id == _links.c.keyword_id)
+        .where(_keywords.c.name.in_(names))
+    )
+    if match_all and len(names) > 1:
+        subquery = subquery.group_by(_links.c.sujet_id).having(func.count() == len(names))
+    return Sujet.id.in_(subquery)
+
+
+def keyword_facets(
+    db: Session,
+    limit: int = 20,
+    keywords: Optional[List[str]] = None,
+    **filters: Any
+) -> List[Dict[str, Any]]:
+    """Mots-clés les plus fréquents parmi les sujets actifs filtrés (domaine=..., niveau=..., mots-clés)"""
+    stmt = (
+        select(_keywords.c.name, func.count().label("count"))
+        .select_from(_links)
+        .join(_keywords, _keywords.c.id == _links.c.keyword_id)
+        .join(Sujet, Sujet.id == _links.c.sujet_id)
+        .where(Sujet.is_active == True)
+    )
+    for column, value in filters.items():
+        if value is not None:
+            stmt = stmt.where(getattr(Sujet, column) == value)
+    if keywords:
+        stmt = stmt.where(has_keywords_clause(keywords))
+    stmt = stmt.group_by(_keywords.c.name).order_by(func.count().desc(), _keywords.c.name).limit(limit)
+    return [{"keyword": name, "count": count} for name, count in db.execute(stmt).all()]
+
+
+def related_keywords(db: Session, keyword: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """Co-occurrence: mots-clés qui apparaissent sur les mêmes sujets actifs que keyword"""
+    names = split_keywords(keyword)
+    if not names:
+        return []
+    source, other = aliased(SujetKeyword), aliased(SujetKeyword)
+    other_name = aliased(Keyword)
+    stmt = (
+        select(other_name.name, func.count().label("count"))
+        .select_from(source)
+        .join(Keyword, Keyword.id == source.keyword_id)
+        .join(other, and_(other.sujet_id == source.sujet_id, other.keyword_id != source.keyword_id))
+        .join(other_name, other_name.id == other.keyword_id)
+        .join(Sujet, Sujet.id == source.sujet_id)
+        .where(Keyword.name == names[0], Sujet.is_active == True)
+        .group_by(other_name.name)
+        .order_by(func.count().desc(), other_name.name)
+        .limit(limit)
+    )
+    return [{"keyword": name, "count": count} for name, count in db.execute(stmt).all()]
+
+
+def backfill_sujet_keywords(db: Session, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Reconstruit sujet_keywords depuis sujets.keywords, par lots d'id croissants; retourne le nombre de sujets"""
+    done, last_id = 0, 0
+    while True:
+        batch = db.execute(
+            select(Sujet.id, Sujet.keywords).where(Sujet.id > last_id).order_by(Sujet.id).limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        parsed = {sujet_id: split_keywords(keywords) for sujet_id, keywords in batch}
+        ids = ensure_keyword_ids(db, {name for names in parsed.values() for name in names})
+        db.execute(delete(_links).where(_links.c.sujet_id.in_(list(parsed))))
+        rows = [
+            {"sujet_id": sujet_id, "keyword_id": ids[name], "position": position}
+            for sujet_id, names in parsed.items()
+            for position, name in enumerate(names)
+        ]
+        if rows:
+            db.execute(insert(_links), rows)
+        db.commit()
+        done += len(batch)
+        last_id = batch[-1].id
+        print(f"  … {done} sujets indexés")
+    return done
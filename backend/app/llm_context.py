@@ -0,0 +1,201 @@
+# app/llm_context.py
+"""
+Construction des contextes de prompt sous budget de tokens
+et comptabilité des appels LLM (tokens, latence, coût).
+"""
+import os
+import math
+import string
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from app.metrics import metrics
+
+load_dotenv()
+
+# Approximation grossière: ~4 caractères par token pour le français
+CHARS_PER_TOKEN = float(os.getenv("LLM_CHARS_PER_TOKEN", "4"))
+
+# Budgets de tokens d'entrée par endpoint (surchargeables via LLM_BUDGET_<ENDPOINT>)
+DEFAULT_TOKEN_BUDGETS = {
+    "analyse": 900,
+    "recommandation": 1400,
+    "question": 1500,
+    "generation": 600,
+}
+
+# Coût par 1000 tokens (0 par défaut, à renseigner selon le modèle utilisé)
+COST_INPUT_PER_1K = float(os.getenv("LLM_COST_INPUT_PER_1K", "0"))
+COST_OUTPUT_PER_1K = float(os.getenv("LLM_COST_OUTPUT_PER_1K", "0"))
+
+TRUNCATION_MARK = "…"
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Estime le nombre de tokens d'un texte"""
+    if not text:
+        return 0
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def truncate_to_tokens(text: Optional[str], max_tokens: int) -> str:
+    """Tronque un texte à max_tokens en coupant sur une frontière de mot"""
+    if not text:
+        return ""
+    text = str(text)
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+
+    max_chars = int(max_tokens * CHARS_PER_TOKEN) - len(TRUNCATION_MARK)
+    cut = text[:max(max_chars, 0)]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip(" ,;:.") + TRUNCATION_MARK
+
+
+def get_token_budget(endpoint: str) -> int:
+    env_value = os.getenv(f"LLM_BUDGET_{endpoint.upper()}")
+    if env_value:
+        return int(env_value)
+    return DEFAULT_TOKEN_BUDGETS.get(endpoint, 1000)
+
+
+def _template_fields(template: str) -> List[str]:
+    return [name for _, name, _, _ in string.Formatter().parse(template) if name]
+
+
+class PromptContextBuilder:
+    """
+    Remplit les variables d'un template de prompt en respectant un budget de tokens.
+
+    Les champs sont servis par priorité décroissante: un champ prioritaire
+    garde son contenu, les champs moins importants sont tronqués en premier.
+    Chaque champ peut réserver un minimum (min_tokens) et un plafond (max_tokens).
+    """
+
+    def __init__(self, endpoint: str, template: str, budget: Optional[int] = None):
+        self.endpoint = endpoint
+        self.template = template
+        self.budget = budget if budget is not None else get_token_budget(endpoint)
+        self._fields: List[Dict[str, Any]] = []
+        self._items: Dict[str, Dict[str, Any]] = {}
+
+    def add(
+        self,
+        name: str,
+        value: Any,
+        priority: int = 0,
+        min_tokens: int = 0,
+        max_tokens: Optional[int] = None
+    ) -> "PromptContextBuilder":
+        text = "" if value is None else str(value)
+        self._fields.append({
+            "name": name,
+            "text": text,
+            "priority": priority,
+            "min_tokens": min(min_tokens, estimate_tokens(text)),
+            "max_tokens": max_tokens,
+        })
+        return self
+
+    def add_items(
+        self,
+        name: str,
+        items: List[str],
+        priority: int = 0,
+        max_item_tokens: Optional[int] = None,
+        max_items: Optional[int] = None,
+        separator: str = "\n"
+    ) -> "PromptContextBuilder":
+        """Ajoute une liste d'éléments (déjà triés par importance) incluse tant que le budget le permet"""
+        if max_items is not None:
+            items = items[:max_items]
+        if max_item_tokens is not None:
+            items = [truncate_to_tokens(item, max_item_tokens) for item in items]
+        self._items[name] = {"separator": separator}
+        return self.add(name, separator.join(items), priority=priority)
+
+    def build(self) -> Dict[str, str]:
+        """Retourne les variables tronquées prêtes à être injectées dans le template"""
+        fixed_text = self.template
+        for field in _template_fields(self.template):
+            fixed_text = fixed_text.replace("{" + field + "}", "")
+        remaining = self.budget - estimate_tokens(fixed_text)
+
+        # Réserver les minimums de tous les champs avant de distribuer le reste
+        reserved = sum(f["min_tokens"] for f in self._fields)
+        values: Dict[str, str] = {}
+
+        for field in sorted(self._fields, key=lambda f: -f["priority"]):
+            reserved -= field["min_tokens"]
+            available = max(remaining - reserved, field["min_tokens"], 0)
+            allowed = available if field["max_tokens"] is None else min(available, field["max_tokens"])
+
+            if field["name"] in self._items:
+                text = self._fit_items(field["text"], self._items[field["name"]]["separator"], allowed)
+            else:
+                text = truncate_to_tokens(field["text"], allowed)
+
+            values[field["name"]] = text
+            remaining -= estimate_tokens(text)
+
+        return values
+
+    @staticmethod
+    def _fit_items(text: str, separator: str, max_tokens: int) -> str:
+        kept = []
+        used = 0
+        for item in text.split(separator) if text else []:
+            cost = estimate_tokens(item + separator)
+            if used + cost > max_tokens:
+                break
+            kept.append(item)
+            used += cost
+        return separator.join(kept)
+
+
+# ======================
+# COMPTABILITÉ DES APPELS
+# ======================
+
+# Derniers appels pour inspection (/metrics)
+recent_calls = deque(maxlen=200)
+
+
+def record_llm_call(
+    endpoint: str,
+    input_tokens: int,
+    output_tokens: int,
+    latency: float,
+    success: bool = True
+) -> Dict[str, Any]:
+    """Enregistre la taille, le coût et la latence d'un appel LLM"""
+    cost = input_tokens / 1000 * COST_INPUT_PER_1K + output_tokens / 1000 * COST_OUTPUT_PER_1K
+    status = "ok" if success else "error"
+
+    metrics.inc("llm_calls_total", endpoint=endpoint, status=status)
+    metrics.inc("llm_input_tokens_total", input_tokens, endpoint=endpoint)
+    metrics.inc("llm_output_tokens_total", output_tokens, endpoint=endpoint)
+    metrics.inc("llm_cost_total", cost, endpoint=endpoint)
+    metrics.observe("llm_latency_seconds", latency, endpoint=endpoint)
+    metrics.observe("llm_input_tokens", input_tokens, endpoint=endpoint)
+
+    record = {
+        "endpoint": endpoint,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "latency_ms": round(latency * 1000, 1),
+        "cost": round(cost, 6),
+        "status": status,
+        "at": time.time(),
+    }
+    recent_calls.append(record)
+    return record
+
+
+metrics.register_collector("llm_recent_calls", lambda: list(recent_calls)[-20:])
@@ -0,0 +1,69 @@
+# app/llm_providers.py
+"""
+Interface des fournisseurs LLM utilisés par app/llm_service.py.
+Un fournisseur reçoit un prompt texte et renvoie un LLMResponse.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+
+class LLMResponse:
+    """Réponse normalisée d'un fournisseur (même forme que les messages LangChain)"""
+
+    def __init__(self, content: str, usage_metadata: Optional[Dict[str, int]] = None):
+        self.content = content
+        self.usage_metadata = usage_metadata or {}
+
+
+class LLMProviderError(Exception):
+    """Erreur renvoyée par le fournisseur LLM"""
+
+
+class LLMRateLimitError(LLMProviderError):
+    """Le fournisseur a refusé l'appel (HTTP 429 / quota dépassé)"""
+
+
+class LLMProvider(ABC):
+    """Interface minimale d'un fournisseur LLM"""
+
+    name = "base"
+
+    @abstractmethod
+    def invoke(self, prompt: str) -> LLMResponse:
+        """Exécute le prompt et renvoie la réponse normalisée"""
+
+    def describe(self) -> Dict[str, Any]:
+        return {"provider": self.name}
+
+
+class GeminiProvider(LLMProvider):
+    """Gemini via LangChain (ChatGoogleGenerativeAI)"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str, temperature: float = 0.2, max_output_tokens: int = 2048):
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        self.model = model
+        self.client = ChatGoogleGenerativeAI(
+            model=model,
+            google_api_key=api_key,
+            temperature=temperature,
+            max_output_tokens=max_output_tokens
+        )
+
+    def invoke(self, prompt: str) -> LLMResponse:
+        try:
+            message = self.client.invoke(prompt)
+        except Exception as e:
+            text = str(e)
+            if "429" in text or "RESOURCE_EXHAUSTED" in text or "quota" in text.lower():
+                raise LLMRateLimitError(text) from e
+            raise
+        return LLMResponse(
+            content=message.content if hasattr(message, "content") else str(message),
+            usage_metadata=getattr(message, "usage_metadata", None)
+        )
+
+    def describe(self) -> Dict[str, Any]:
+        return {"provider": self.name, "model": self.model}
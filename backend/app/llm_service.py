@@ -2,57 +2,242 @@
 import os
 import json
 import re
-from typing import List, Dict, Any, Optional
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Dict, Any, Optional, Callable, TypeVar
 from dotenv import load_dotenv
 
 from datetime import datetime
+from app.llm_context import PromptContextBuilder, estimate_tokens, record_llm_call
+from app.llm_providers import LLMProvider, GeminiProvider
+from app.semantic_cache import semantic_cache, SEMANTIC_CACHE_ENABLED
+from app.cache import TTLCache
+from app.circuit_breaker import CircuitBreaker
+from app.metrics import metrics
 load_dotenv()
 
+T = TypeVar("T")
+
 # Configuration
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemma-3-1b-it")
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()  # "gemini" ou "fake"
 
 # ======================
-# CONFIGURATION LANGCHAIN
+# CONFIGURATION DU FOURNISSEUR
 # ======================
-llm = None
-json_parser = None
-
-try:
-    from langchain_google_genai import ChatGoogleGenerativeAI
-    from langchain_core.prompts import ChatPromptTemplate
-    from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
-    from langchain_core.exceptions import OutputParserException
-    
-    # Initialiser LangChain avec Gemini
-    if GOOGLE_API_KEY:
-        llm = ChatGoogleGenerativeAI(
-            model=GEMINI_MODEL,
-            google_api_key=GOOGLE_API_KEY,
-            temperature=0.2,
-            max_output_tokens=2048
-        )
-        
-        # Parser JSON
-        json_parser = JsonOutputParser()
-        
-        print("✅ LangChain avec Gemini configuré")
-    else:
-        print("⚠️ GOOGLE_API_KEY non configurée")
+llm: Optional[LLMProvider] = None
+
+if LLM_PROVIDER == "fake":
+    from app.fake_llm import FakeLLMProvider
+    
+    llm = FakeLLMProvider.from_env()
+    print(f"🧪 Fournisseur LLM factice activé: {llm.describe()}")
+else:
+    try:
+        # Initialiser LangChain avec Gemini
+        if GOOGLE_API_KEY:
+            llm = GeminiProvider(api_key=GOOGLE_API_KEY, model=GEMINI_MODEL)
+            print("✅ LangChain avec Gemini configuré")
+        else:
+            print("⚠️ GOOGLE_API_KEY non configurée")
+            llm = None
+            
+    except ImportError as e:
+        print(f"❌ LangChain non disponible: {e}")
         llm = None
-        json_parser = None
-        
-except ImportError as e:
-    print(f"❌ LangChain non disponible: {e}")
-    llm = None
-    json_parser = None
+
+def set_llm_provider(provider: Optional[LLMProvider]) -> None:
+    """Remplace le fournisseur LLM (tests de charge, bascule à chaud)"""
+    global llm
+    llm = provider
+
+def get_llm_provider() -> Optional[LLMProvider]:
+    return llm
+
+# ======================
+# APPEL LLM INSTRUMENTÉ
+# ======================
+
+# Jeton du disjoncteur et issue enregistrée pour la tâche en cours (voir _run_with_deadline)
+_circuit_outcome = threading.local()
+
+def _call_llm(endpoint: str, prompt_template: str, variables: Dict[str, Any]) -> str:
+    """Exécute un prompt et enregistre tokens, coût et latence de l'appel"""
+    prompt_text = prompt_template.format(**variables)
+    input_tokens = estimate_tokens(prompt_text)
+    start = time.perf_counter()
+    
+    try:
+        response = llm.invoke(prompt_text)
+    except Exception as e:
+        latency = time.perf_counter() - start
+        llm_circuit.record_failure(latency, e, getattr(_circuit_outcome, "permit", 0))
+        _circuit_outcome.recorded = True
+        record_llm_call(endpoint, input_tokens, 0, latency, success=False)
+        raise
+    
+    latency = time.perf_counter() - start
+    llm_circuit.record_success(latency, getattr(_circuit_outcome, "permit", 0))
+    _circuit_outcome.recorded = True
+    text = response.content
+    
+    # Utiliser les comptes réels du fournisseur quand ils sont disponibles
+    usage = response.usage_metadata
+    record_llm_call(
+        endpoint,
+        usage.get("input_tokens", input_tokens),
+        usage.get("output_tokens", estimate_tokens(text)),
+        latency
+    )
+    return text
+
+# ======================
+# BUDGET DE LATENCE ET DÉGRADATION
+# ======================
+
+# Nombre d'appels LLM simultanés et profondeur maximale de la file d'attente
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE_DEPTH = int(os.getenv("LLM_MAX_QUEUE_DEPTH", "32"))
+# Durée de vie des résultats arrivés après l'échéance (servis à la requête suivante)
+LLM_LATE_RESULT_TTL = int(os.getenv("LLM_LATE_RESULT_TTL", "3600"))
+
+_llm_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+_pending_lock = threading.Lock()
+_pending_calls = 0
+_late_results = TTLCache(ttl=LLM_LATE_RESULT_TTL, max_entries=2000)
+
+# Disjoncteur du fournisseur (seuils via LLM_CIRCUIT_*)
+llm_circuit = CircuitBreaker.from_env(LLM_PROVIDER, "LLM_CIRCUIT")
+metrics.register_collector("llm_circuit", llm_circuit.state_info)
+
+# Budgets par défaut en secondes (0 = attendre le fournisseur), surchargeables
+# via LLM_DEADLINE_<ENDPOINT>. L'analyse et la recommandation servent des pages
+# interactives (/sujets/{id}, /sujets/recommend) et ont un repli local immédiat.
+DEFAULT_DEADLINES = {
+    "analyse": 3.0,
+    "recommandation": 3.0,
+    "question": 0,
+    "generation": 0,
+}
+
+def get_default_budget(endpoint: str) -> Optional[float]:
+    """Budget par défaut d'un endpoint en secondes (None = pas d'échéance)"""
+    value = float(os.getenv(f"LLM_DEADLINE_{endpoint.upper()}", DEFAULT_DEADLINES.get(endpoint, 0)))
+    return value if value > 0 else None
+
+def get_queue_depth() -> int:
+    return _pending_calls
+
+def _result_key(endpoint: str, payload: Any) -> str:
+    raw = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return f"{endpoint}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+def _degrade(endpoint: str, reason: str, fallback: Callable[[], T]) -> T:
+    metrics.inc("llm_degraded_total", endpoint=endpoint, reason=reason)
+    return fallback()
+
+def _run_with_deadline(
+    endpoint: str,
+    call: Callable[[], T],
+    fallback: Callable[[], T],
+    budget: Optional[float] = None,
+    cache_key: Optional[str] = None
+) -> T:
+    """
+    Exécute un appel LLM sous budget de latence.
+    
+    Retourne le repli local si le budget expire, si la file d'attente est trop
+    profonde ou si l'appel échoue. Avec cache_key, un résultat réel arrivé après
+    l'échéance est conservé et servi à la prochaine requête identique.
+    """
+    global _pending_calls
+    
+    if cache_key:
+        late = _late_results.get(cache_key)
+        if late is not None:
+            metrics.inc("llm_late_result_hits_total", endpoint=endpoint)
+            return late
+    
+    if budget is None:
+        budget = get_default_budget(endpoint)
+    
+    with _pending_lock:
+        if _pending_calls >= LLM_MAX_QUEUE_DEPTH:
+            queue_full = True
+        else:
+            queue_full = False
+            _pending_calls += 1
+        metrics.set_gauge("llm_queue_depth", _pending_calls)
+    if queue_full:
+        return _degrade(endpoint, "queue", fallback)
+    
+    def release_pending():
+        global _pending_calls
+        with _pending_lock:
+            _pending_calls -= 1
+            metrics.set_gauge("llm_queue_depth", _pending_calls)
+    
+    # Circuit ouvert: repli immédiat sans solliciter le fournisseur
+    permit = llm_circuit.try_acquire()
+    if permit is None:
+        release_pending()
+        return _degrade(endpoint, "circuit_open", fallback)
+    
+    def task():
+        _circuit_outcome.recorded = False
+        _circuit_outcome.permit = permit
+        try:
+            return call()
+        finally:
+            # Échec avant le fournisseur (prompt, format...): la sonde half_open est rendue
+            if not _circuit_outcome.recorded:
+                llm_circuit.release(permit)
+            release_pending()
+    
+    try:
+        future = _llm_executor.submit(task)
+    except RuntimeError as e:
+        # Exécuteur arrêté (fin de processus): la tâche ne s'exécutera pas
+        llm_circuit.release(permit)
+        release_pending()
+        print(f"⚠️ Erreur {endpoint} LLM: {e}")
+        return _degrade(endpoint, "error", fallback)
+    
+    def keep_late_result(done):
+        if cache_key and not done.cancelled() and done.exception() is None:
+            _late_results.set(cache_key, done.result())
+    
+    try:
+        return future.result(timeout=budget)
+    except FutureTimeoutError:
+        # L'appel continue en arrière-plan: son résultat alimentera le cache
+        future.add_done_callback(keep_late_result)
+        return _degrade(endpoint, "deadline", fallback)
+    except Exception as e:
+        print(f"⚠️ Erreur {endpoint} LLM: {e}")
+        return _degrade(endpoint, "error", fallback)
+
+def _extract_json(text: str, opening: str = "[") -> Optional[Any]:
+    """Extrait le premier objet ({) ou tableau ([) JSON d'une réponse"""
+    pattern = r'\{.*\}' if opening == "{" else r'\[.*\]'
+    match = re.search(pattern, text, re.DOTALL)
+    if not match:
+        return None
+    try:
+        return json.loads(match.group())
+    except json.JSONDecodeError as e:
+        print(f"⚠️ Erreur parsing JSON: {e}")
+        return None
 
 # ======================
 # FONCTIONS AVEC LANGCHAIN
 # ======================
 
-def analyser_sujet(sujet_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Analyse un sujet avec LangChain"""
+def analyser_sujet(sujet_data: Dict[str, Any], budget: Optional[float] = None) -> Dict[str, Any]:
+    """Analyse un sujet avec LangChain (repli local si le budget en secondes expire)"""
     
     if not llm:
         return get_fallback_analysis(sujet_data)
@@ -87,44 +272,54 @@ def analyser_sujet(sujet_data: Dict[str, Any]) -> Dict[str, Any]:
     }}
     """
     
-    try:
-        prompt = ChatPromptTemplate.from_template(prompt_template)
-        chain = prompt | llm | json_parser
+    def call() -> Dict[str, Any]:
+        # Les champs longs (description, problématique) sont tronqués en premier
+        builder = PromptContextBuilder("analyse", prompt_template)
+        builder.add("titre", sujet_data.get('titre', ''), priority=10, max_tokens=80)
+        builder.add("domaine", sujet_data.get('domaine', ''), priority=9, max_tokens=20)
+        builder.add("niveau", sujet_data.get('niveau', ''), priority=9, max_tokens=10)
+        builder.add("faculté", sujet_data.get('faculté', ''), priority=9, max_tokens=20)
+        builder.add("keywords", sujet_data.get('keywords', ''), priority=7, max_tokens=50)
+        builder.add("problematique", sujet_data.get('problematique', ''), priority=5, min_tokens=40)
+        builder.add("description", sujet_data.get('description', ''), priority=1, min_tokens=30)
         
-        result = chain.invoke({
-            "titre": sujet_data.get('titre', ''),
-            "domaine": sujet_data.get('domaine', ''),
-            "niveau": sujet_data.get('niveau', ''),
-            "faculté": sujet_data.get('faculté', ''),
-            "problematique": sujet_data.get('problematique', ''),
-            "description": sujet_data.get('description', ''),
-            "keywords": sujet_data.get('keywords', '')
-        })
+        response = _call_llm("analyse", prompt_template, builder.build())
+        result = _extract_json(response, "{")
+        if result is None:
+            raise ValueError("réponse JSON invalide")
         
         return result
-        
-    except Exception as e:
-        print(f"⚠️ Erreur analyse LangChain: {e}")
-        return get_fallback_analysis(sujet_data)
+    
+    return _run_with_deadline(
+        "analyse",
+        call,
+        fallback=lambda: get_fallback_analysis(sujet_data),
+        budget=budget,
+        cache_key=_result_key("analyse", sujet_data)
+    )
 
 def recommander_sujets_llm(
     interests: List[str], 
     sujets: List[Dict], 
-    critères: Dict[str, Any]
+    critères: Dict[str, Any],
+    budget: Optional[float] = None
 ) -> List[Dict[str, Any]]:
-    """Recommande des sujets avec LangChain"""
+    """Recommande des sujets avec LangChain (repli local si le budget en secondes expire)"""
     
     if not llm or not sujets:
         return fallback_recommendation(interests, sujets)
     
-    # Formater les sujets
-    sujets_text = ""
+    # Formater les sujets (une ligne par candidat, problématique résumée)
+    sujets_lines = []
     for sujet in sujets[:10]:  # Limiter à 10 sujets pour le contexte
-        sujets_text += f"\n• ID: {sujet.get('id', 'N/A')}"
-        sujets_text += f" | Titre: {sujet.get('titre', 'Sans titre')}"
-        sujets_text += f" | Mots-clés: {sujet.get('keywords', '')}"
-        sujets_text += f" | Niveau: {sujet.get('niveau', 'N/A')}"
-        sujets_text += f" | Domaine: {sujet.get('domaine', 'Général')}"
+        line = f"• ID: {sujet.get('id', 'N/A')}"
+        line += f" | Titre: {sujet.get('titre', 'Sans titre')}"
+        line += f" | Mots-clés: {sujet.get('keywords', '')}"
+        line += f" | Niveau: {sujet.get('niveau', 'N/A')}"
+        line += f" | Domaine: {sujet.get('domaine', 'Général')}"
+        if sujet.get('problematique'):
+            line += f" | Problématique: {sujet.get('problematique')}"
+        sujets_lines.append(line)
     
     prompt_template = """
     Tu es un assistant spécialisé dans la recommandation de sujets de mémoire.
@@ -158,37 +353,50 @@ def recommander_sujets_llm(
     Retourne seulement les 3-5 sujets les plus pertinents, triés par score décroissant.
     """
     
-    try:
-        prompt = ChatPromptTemplate.from_template(prompt_template)
-        chain = prompt | llm | StrOutputParser()
+    def call() -> List[Dict[str, Any]]:
+        # Les candidats sont ajoutés dans l'ordre tant que le budget le permet
+        builder = PromptContextBuilder("recommandation", prompt_template)
+        builder.add("interests", ", ".join(interests) if interests else "Non spécifié", priority=10, max_tokens=120)
+        builder.add("niveau", critères.get('niveau') or 'Non spécifié', priority=9, max_tokens=10)
+        builder.add("faculté", critères.get('faculté') or 'Non spécifiée', priority=9, max_tokens=20)
+        builder.add("domaine", critères.get('domaine') or 'Non spécifié', priority=9, max_tokens=20)
+        builder.add("difficulté", critères.get('difficulté') or 'Moyenne', priority=9, max_tokens=10)
+        builder.add_items("sujets_text", sujets_lines, priority=5, max_item_tokens=110)
         
-        response = chain.invoke({
-            "interests": ", ".join(interests) if interests else "Non spécifié",
-            "niveau": critères.get('niveau', 'Non spécifié'),
-            "faculté": critères.get('faculté', 'Non spécifiée'),
-            "domaine": critères.get('domaine', 'Non spécifié'),
-            "difficulté": critères.get('difficulté', 'Moyenne'),
-            "sujets_text": sujets_text
-        })
+        response = _call_llm("recommandation", prompt_template, builder.build())
         
         # Parser le JSON de la réponse
-        try:
-            json_match = re.search(r'\[.*\]', response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                result = json.loads(json_str)
-                return result
-        except (json.JSONDecodeError, AttributeError) as e:
-            print(f"⚠️ Erreur parsing JSON: {e}")
-            
-        return fallback_recommendation(interests, sujets)
-            
-    except Exception as e:
-        print(f"⚠️ Erreur recommandation LangChain: {e}")
-        return fallback_recommendation(interests, sujets)
+        result = _extract_json(response, "[")
+        if result is None:
+            raise ValueError("réponse JSON invalide")
+        
+        return result
+    
+    return _run_with_deadline(
+        "recommandation",
+        call,
+        fallback=lambda: fallback_recommendation(interests, sujets),
+        budget=budget,
+        cache_key=_result_key("recommandation", [interests, [s.get('id') for s in sujets[:10]], critères])
+    )
 
-def répondre_question(question: str, contexte: str = None) -> str:
-    """Répond à une question avec LangChain"""
+def répondre_question(
+    question: str,
+    contexte: str = None,
+    cache_namespace: Optional[str] = None,
+    budget: Optional[float] = None
+) -> str:
+    """Répond à une question avec LangChain (message d'attente si le budget en secondes expire)
+    
+    Si cache_namespace est fourni ("public" ou "ctx:<empreinte>"), une question
+    proche déjà répondue dans cet espace est servie depuis le cache sémantique.
+    """
+    
+    use_cache = bool(cache_namespace) and SEMANTIC_CACHE_ENABLED
+    if use_cache:
+        cached = semantic_cache.lookup(question, cache_namespace)
+        if cached:
+            return cached["answer"]
     
     if not llm:
         return "Le service IA est temporairement indisponible. Veuillez consulter votre enseignant pour des conseils personnalisés."
@@ -213,28 +421,46 @@ def répondre_question(question: str, contexte: str = None) -> str:
     **RÉPONSE:**
     """
     
-    try:
-        prompt = ChatPromptTemplate.from_template(prompt_template)
-        chain = prompt | llm | StrOutputParser()
-        
+    def call() -> str:
         contexte_text = f"**CONTEXTE SUPPLÉMENTAIRE:**\n{contexte}" if contexte else ""
         
-        réponse = chain.invoke({
-            "question": question,
-            "contexte": contexte_text
-        })
+        # La question prime toujours sur le contexte (historique, préférences)
+        builder = PromptContextBuilder("question", prompt_template)
+        builder.add("question", question, priority=10, max_tokens=500)
+        builder.add("contexte", contexte_text, priority=1)
         
-        return réponse
+        réponse = _call_llm("question", prompt_template, builder.build())
         
-    except Exception as e:
-        print(f"⚠️ Erreur réponse LangChain: {e}")
-        return f"Je ne peux pas répondre pour le moment. Veuillez réessayer plus tard."
+        # Seules les vraies réponses du modèle sont mises en cache
+        if use_cache and réponse.strip():
+            semantic_cache.store(question, réponse, cache_namespace)
+        
+        return réponse
+    
+    return _run_with_deadline(
+        "question",
+        call,
+        fallback=lambda: "Je ne peux pas répondre pour le moment. Veuillez réessayer plus tard.",
+        budget=budget
+    )
 
-def générer_sujets_llm(params: Dict[str, Any], count: int) -> List[Dict[str, Any]]:
-    """Génère des sujets avec LangChain"""
+def générer_sujets_llm(
+    params: Dict[str, Any],
+    count: int,
+    budget: Optional[float] = None,
+    fallback_to_default: bool = True
+) -> List[Dict[str, Any]]:
+    """Génère des sujets avec LangChain (sujets par défaut si le budget en secondes expire)
+    
+    Avec fallback_to_default=False, un échec renvoie une liste vide au lieu
+    des sujets par défaut (utilisé par le pré-remplissage des pools).
+    """
+    
+    def fallback() -> List[Dict[str, Any]]:
+        return generate_default_subjects(params, count) if fallback_to_default else []
     
     if not llm:
-        return generate_default_subjects(params, count)
+        return fallback()
     
     prompt_template = """
     Tu es un générateur de sujets de mémoire universitaires.
@@ -271,42 +497,41 @@ def générer_sujets_llm(params: Dict[str, Any], count: int) -> List[Dict[str, A
     Génère exactement {count} sujets originaux, pertinents et réalisables.
     """
     
-    try:
-        prompt = ChatPromptTemplate.from_template(prompt_template)
-        chain = prompt | llm | StrOutputParser()
+    def call() -> List[Dict[str, Any]]:
+        interests = params.get('interests', 'Recherche académique')
+        if isinstance(interests, list):
+            interests = ", ".join(interests)
         
-        response = chain.invoke({
-            "interests": params.get('interests', 'Recherche académique'),
-            "domaine": params.get('domaine', 'Général'),
-            "niveau": params.get('niveau', 'L3'),
-            "faculté": params.get('faculté', 'Sciences'),
-            "count": count
-        })
+        builder = PromptContextBuilder("generation", prompt_template)
+        builder.add("interests", interests, priority=5, min_tokens=20, max_tokens=150)
+        builder.add("domaine", params.get('domaine', 'Général'), priority=9, max_tokens=20)
+        builder.add("niveau", params.get('niveau', 'L3'), priority=9, max_tokens=10)
+        builder.add("faculté", params.get('faculté', 'Sciences'), priority=9, max_tokens=20)
+        builder.add("count", count, priority=10)
+        
+        response = _call_llm("generation", prompt_template, builder.build())
         
         # Parser le JSON
-        try:
-            json_match = re.search(r'\[.*\]', response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                sujets = json.loads(json_str)
-                
-                # Ajouter les champs manquants pour correspondre au schéma
-                for i, sujet in enumerate(sujets):
-                    sujet["domaine"] = params.get('domaine', 'Général')
-                    sujet["niveau"] = params.get('niveau', 'L3')
-                    sujet["faculté"] = params.get('faculté', 'Sciences')
-                    sujet["original"] = True
-                    sujet["generated_at"] = datetime.utcnow().isoformat()
-                    
-                return sujets[:count]
-        except (json.JSONDecodeError, AttributeError):
-            pass
-            
-        return generate_default_subjects(params, count)
+        sujets = _extract_json(response, "[")
+        if sujets is None:
+            raise ValueError("réponse JSON invalide")
         
-    except Exception as e:
-        print(f"⚠️ Erreur génération LangChain: {e}")
-        return generate_default_subjects(params, count)
+        # Ajouter les champs manquants pour correspondre au schéma
+        for i, sujet in enumerate(sujets):
+            sujet["domaine"] = params.get('domaine', 'Général')
+            sujet["niveau"] = params.get('niveau', 'L3')
+            sujet["faculté"] = params.get('faculté', 'Sciences')
+            sujet["original"] = True
+            sujet["generated_at"] = datetime.utcnow().isoformat()
+            
+        return sujets[:count]
+    
+    return _run_with_deadline(
+        "generation",
+        call,
+        fallback=fallback,
+        budget=budget
+    )
 
 
 def get_acceptance_criteria() -> Dict[str, Any]:
@@ -498,15 +723,13 @@ def get_tips() -> Dict[str, List[str]]:
 # ======================
 
 if __name__ == "__main__":
-    print("🧪 Test de LangChain avec Gemini...")
+    print(f"🧪 Test du fournisseur LLM ({LLM_PROVIDER})...")
     
     if llm:
         try:
             # Test simple
-            prompt = ChatPromptTemplate.from_template("Réponds simplement 'OK' si tu fonctionnes.")
-            chain = prompt | llm | StrOutputParser()
-            response = chain.invoke({})
-            print(f"✅ LangChain fonctionne: {response}")
+            response = llm.invoke("Réponds simplement 'OK' si tu fonctionnes.")
+            print(f"✅ Fournisseur fonctionnel: {response.content}")
             
             # Test des fonctions
             print(f"\n📋 Fonctions disponibles:")
@@ -519,6 +742,6 @@ if __name__ == "__main__":
         except Exception as e:
             print(f"❌ Erreur test LangChain: {e}")
     else:
-        print("⚠️ LangChain non configuré, mode fallback activé")
+        print("⚠️ Fournisseur LLM non configuré, mode fallback activé")
     
     print("\n✅ Module llm_service prêt")
\ No newline at end of file
@@ -0,0 +1,44 @@
+# app/loading.py
+"""
+Stratégies de chargement des relations, par usage.
+
+Chaque requête ORM d'une route déclare ce qu'elle charge: joinedload /
+selectinload pour les relations réellement sérialisées, rien pour le reste.
+Avec STRICT_LOADING=true (tests, développement), toute autre relation reçoit
+raiseload("*"): un chargement paresseux oublié (requête N+1) lève une
+exception au lieu de passer inaperçu. En production (false), elle retombe
+sur le chargement paresseux habituel.
+"""
+import os
+from typing import Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy.orm import joinedload, raiseload
+
+from app.models import Feedback
+
+load_dotenv()
+
+STRICT_LOADING = os.getenv("STRICT_LOADING", "false").lower() == "true"
+
+
+def strategy(*options) -> Tuple:
+    """Options de chargement d'une requête, complétées par raiseload("*") en mode strict"""
+    if STRICT_LOADING:
+        return options + (raiseload("*"),)
+    return options
+
+
+def _nested(option):
+    # Le joker raiseload("*") ne vise que l'entité principale: le répéter sous la relation chargée
+    return option.raiseload("*") if STRICT_LOADING else option
+
+
+# Sujets sérialisés avec schemas.Sujet: colonnes seules
+SUJET_COLUMNS = strategy()
+# Feedbacks listés avec leur sujet (sujets sauvegardés): une jointure au lieu d'un get_sujet par ligne
+FEEDBACK_WITH_SUJET = strategy(_nested(joinedload(Feedback.sujet)))
+# Feedbacks seuls (schemas.Feedback ne sérialise que les clés étrangères)
+FEEDBACK_COLUMNS = strategy()
+# Utilisateurs sérialisés avec schemas.User (aucune des sept relations)
+USER_COLUMNS = strategy()
@@ -1,18 +1,49 @@
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
+from app.database import engine, async_engine, Base
 from app.routes import auth, sujets, users, ai,settings
+from app.metrics import metrics
+from app.llm_service import llm_circuit
+from app.subject_pool import subject_pool
+from app.conversations import conversation_retention
+from app.search import ensure_sqlite_fts, search_backend_for
+from app.db_pool import pool_status
+from app.counters import counter_buffer
 
 # Supprimer toutes les tables existantes
 # Base.metadata.drop_all(bind=engine)
 
 # Créer les tables avec les nouvelles colonnes
 Base.metadata.create_all(bind=engine)
+# Index plein texte FTS5 en local (sous PostgreSQL il vient de la migration)
+ensure_sqlite_fts(engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tâches de fond démarrées avec l'application
+    subject_pool.start()
+    counter_buffer.start()
+    conversation_retention.start()
+    # Détection du moteur de recherche (inspection synchrone du schéma) faite ici,
+    # hors boucle d'événements, plutôt qu'au premier appel de crud_async.get_sujets
+    await run_in_threadpool(search_backend_for, engine)
+    yield
+    subject_pool.stop()
+    conversation_retention.stop()
+    # Écrire les vues/likes encore en mémoire avant de fermer les pools
+    await run_in_threadpool(counter_buffer.stop)
+    await async_engine.dispose()
 
 app = FastAPI(
     title="MemoBot API",
     description="API pour la recommandation de sujets de mémoire avec IA",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configurer CORS
@@ -42,11 +73,49 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "service": "memo-bot-api"}
+    return {"status": "healthy", "service": "memo-bot-api", "llm_circuit": llm_circuit.state_info()}
 
 @app.get("/api/v1/health")
 def health_check_v1():
-    return {"status": "healthy", "service": "memo-bot-api", "version": "v1"}
+    return {"status": "healthy", "service": "memo-bot-api", "version": "v1", "llm_circuit": llm_circuit.state_info()}
+
+def _ping_sync():
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    return round((time.perf_counter() - start) * 1000, 2)
+
+async def _ping_async():
+    start = time.perf_counter()
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return round((time.perf_counter() - start) * 1000, 2)
+
+@app.get("/health/deep")
+async def health_check_deep():
+    """Vérifie réellement la base (moteurs sync et async) et expose l'état des pools"""
+    database = {}
+    healthy = True
+    for name, ping in (("sync", lambda: run_in_threadpool(_ping_sync)), ("async", _ping_async)):
+        try:
+            database[name] = {"status": "ok", "latency_ms": await ping()}
+        except Exception as e:
+            healthy = False
+            database[name] = {"status": "error", "error": str(e)}
+
+    body = {
+        "status": "healthy" if healthy else "degraded",
+        "service": "memo-bot-api",
+        "database": database,
+        "pools": {"sync": pool_status(engine), "async": pool_status(async_engine.sync_engine)},
+        "llm_circuit": llm_circuit.state_info(),
+    }
+    return JSONResponse(body, status_code=200 if healthy else 503)
+
+@app.get("/metrics")
+def read_metrics():
+    """Métriques internes (appels LLM, tokens, latences)"""
+    return metrics.snapshot()
 
 if __name__ == "__main__":
     import uvicorn
@@ -2,6 +2,8 @@
 from app.database import SessionLocal
 from app import crud, models
 from app.auth import get_password_hash
+from app.keyword_stats import apply_keyword_delta, counted_keywords
+from app.keywords import sync_sujet_keywords
 import asyncio
 
 async def create_demo_data():
@@ -100,6 +102,9 @@ async def create_demo_data():
             
             for sujet in demo_sujets:
                 db.add(sujet)
+                apply_keyword_delta(db, [], counted_keywords(sujet))
+                db.flush()
+                sync_sujet_keywords(db, sujet.id, sujet.keywords)
             
             db.commit()
             print(f"✅ {len(demo_sujets)} sujets de démonstration créés")
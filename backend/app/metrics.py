@@ -0,0 +1,110 @@
+# app/metrics.py
+"""
+Registre de métriques en mémoire (compteurs, jauges, distributions).
+Exposé en JSON par l'endpoint /metrics de app/main.py.
+"""
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+
+def _key(name: str, labels: Dict[str, Any]) -> str:
+    if not labels:
+        return name
+    label_str = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{label_str}}}"
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class _Distribution:
+    """Résumé d'une distribution avec fenêtre glissante pour les percentiles"""
+
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.samples.append(value)
+
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "min": self.min or 0.0,
+            "max": self.max or 0.0,
+            "avg": round(self.total / self.count, 6) if self.count else 0.0,
+            "p50": _percentile(ordered, 50),
+            "p95": _percentile(ordered, 95),
+            "p99": _percentile(ordered, 99),
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._distributions: Dict[str, _Distribution] = {}
+        self._collectors: Dict[str, Callable[[], Any]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            distribution = self._distributions.get(key)
+            if distribution is None:
+                distribution = self._distributions[key] = _Distribution()
+            distribution.observe(value)
+
+    def register_collector(self, name: str, collector: Callable[[], Any]):
+        """Enregistre une fonction appelée à chaque snapshot (état calculé à la demande)"""
+        self._collectors[name] = collector
+
+    def get_counter(self, name: str, **labels) -> float:
+        return self._counters.get(_key(name, labels), 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            data = {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "distributions": {k: d.summary() for k, d in self._distributions.items()},
+            }
+        for name, collector in self._collectors.items():
+            try:
+                data[name] = collector()
+            except Exception as e:
+                data[name] = {"error": str(e)}
+        return data
+
+    def reset(self, prefix: Optional[str] = None):
+        with self._lock:
+            for store in (self._counters, self._gauges, self._distributions):
+                for key in [k for k in store if prefix is None or k.startswith(prefix)]:
+                    del store[key]
+
+
+# Instance globale
+metrics = MetricsRegistry()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -46,6 +46,10 @@ class Sujet(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Peut être null pour les sujets par défaut
     is_generated = Column(Boolean, default=False)  # Marqueur pour les sujets générés par IA
     
+    # Déduplication (MinHash sur titre + problématique + mots-clés, voir app/dedup.py)
+    minhash_signature = Column(JSON, nullable=True)
+    duplicate_of_id = Column(Integer, ForeignKey("sujets.id"), nullable=True, index=True)
+    
     vue_count = Column(Integer, default=0)
     like_count = Column(Integer, default=0)
     is_active = Column(Boolean, default=True)
@@ -57,8 +61,72 @@ class Sujet(Base):
     user = relationship("User")  # Ajoutez cette relation
 
 
+# Sujets populaires (get_popular_sujets): index partiel, lu dans l'ordre du tri, sujets actifs seulement
+Index(
+    "ix_sujets_popular_active",
+    Sujet.vue_count.desc(),
+    Sujet.like_count.desc(),
+    postgresql_where=Sujet.is_active == True,
+    sqlite_where=Sujet.is_active == True,
+)
+
+
+class SujetCounterShard(Base):
+    """Incréments en attente pour les sujets très consultés (voir app/counters.py)"""
+    __tablename__ = "sujet_counter_shards"
+    
+    sujet_id = Column(Integer, ForeignKey("sujets.id", ondelete="CASCADE"), primary_key=True)
+    counter = Column(String(20), primary_key=True)  # 'vue_count' ou 'like_count'
+    shard = Column(Integer, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+class KeywordStat(Base):
+    """Nombre de sujets actifs par mot-clé, maintenu par app/keyword_stats.py"""
+    __tablename__ = "keyword_stats"
+    __table_args__ = (Index("ix_keyword_stats_count", "count"),)
+    
+    keyword = Column(String(200), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class Keyword(Base):
+    """Mot-clé normalisé (minuscules), partagé par les sujets via sujet_keywords"""
+    __tablename__ = "keywords"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(200), nullable=False, unique=True)
+
+
+class SujetKeyword(Base):
+    """Liaison sujet <-> mot-clé, copie indexée de sujets.keywords (voir app/keywords.py)"""
+    __tablename__ = "sujet_keywords"
+    # La clé primaire couvre les recherches par sujet, l'index inverse celles par mot-clé
+    __table_args__ = (Index("ix_sujet_keywords_keyword_sujet", "keyword_id", "sujet_id"),)
+    
+    sujet_id = Column(Integer, ForeignKey("sujets.id", ondelete="CASCADE"), primary_key=True)
+    keyword_id = Column(Integer, ForeignKey("keywords.id", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, nullable=False, default=0)
+
+
+class DomainStat(Base):
+    """Synthèse par domaine des sujets actifs, recalculée par app/domain_stats.py"""
+    __tablename__ = "domain_stats"
+    
+    domaine = Column(String(100), primary_key=True)
+    sujet_count = Column(Integer, nullable=False, default=0)
+    total_views = Column(Integer, nullable=False, default=0)
+    refreshed_at = Column(DateTime(timezone=True), nullable=False)
+
+
 class Feedback(Base):
     __tablename__ = "feedbacks"
+    # Feedbacks d'un utilisateur (liste, statistiques, sauvegardés) et d'un sujet
+    __table_args__ = (
+        Index("ix_feedbacks_user_created", "user_id", "created_at"),
+        Index("ix_feedbacks_sujet_id", "sujet_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -117,7 +185,7 @@ class UserSkill(Base):
     __tablename__ = "user_skills"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     name = Column(String(100), nullable=False)
     level = Column(Integer, nullable=False)  # 1-10
     category = Column(String(100), nullable=True)
@@ -129,6 +197,7 @@ class UserSkill(Base):
 
 class UserHistory(Base):
     __tablename__ = "user_history"
+    __table_args__ = (Index("ix_user_history_user_created", "user_id", "created_at"),)
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -144,6 +213,8 @@ class UserHistory(Base):
 
 class ConversationMessage(Base):
     __tablename__ = "conversation_messages"
+    # Historique d'un utilisateur, plus récents d'abord (get_conversation_history); purge: app/conversations.py
+    __table_args__ = (Index("ix_conversation_messages_user_timestamp", "user_id", "timestamp"),)
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -0,0 +1,183 @@
+# app/pagination.py
+"""
+Pagination par clé (keyset / curseur) pour les listes.
+
+Au lieu de OFFSET n (qui relit et jette n lignes, et décale les pages quand
+des lignes sont insérées), la page suivante reprend strictement après la
+dernière ligne vue: WHERE (clé de tri, id) > (valeurs de la dernière ligne).
+Le curseur renvoyé au client est opaque (JSON en base64 url-safe) et encode
+ces valeurs ainsi que l'ordre de tri qui les a produites.
+
+Les résultats triés par pertinence (recherche plein texte) n'ont pas de clé
+stable: leur curseur encode alors simplement la position suivante.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+import sqlalchemy as sa
+from fastapi import HTTPException, Response
+from sqlalchemy import Select
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# (colonne, "asc" | "desc"); la dernière doit être unique (en pratique l'id)
+SortKey = Sequence[Tuple[Any, str]]
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+class Page(list):
+    """Liste de résultats portant le curseur de la page suivante (None en fin de liste)"""
+
+    def __init__(self, items=(), next_cursor: Optional[str] = None):
+        super().__init__(items)
+        self.next_cursor = next_cursor
+
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    raise TypeError(f"Valeur non sérialisable dans un curseur: {value!r}")
+
+
+def _json_hook(obj: dict):
+    if "$dt" in obj:
+        return datetime.fromisoformat(obj["$dt"])
+    return obj
+
+
+def encode_cursor(payload: dict) -> str:
+    raw = json.dumps(payload, default=_json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw, object_hook=_json_hook)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursorError("Curseur invalide") from e
+    if not isinstance(payload, dict):
+        raise InvalidCursorError("Curseur invalide")
+    return payload
+
+
+def _sort_signature(sort: SortKey) -> str:
+    return ",".join(f"{column.key}:{direction}" for column, direction in sort)
+
+
+def _after(sort: SortKey, values: List[Any]):
+    """(c1, c2, ...) strictement après values dans l'ordre de tri, directions mixtes comprises"""
+    clauses = []
+    for i, (column, direction) in enumerate(sort):
+        equal = [sort[j][0] == values[j] for j in range(i)]
+        beyond = column < values[i] if direction == "desc" else column > values[i]
+        clauses.append(sa.and_(*equal, beyond))
+    return sa.or_(*clauses)
+
+
+def _keyset_statement(query, sort: SortKey, limit: int, cursor: Optional[str], skip: int):
+    """Requête ORM (Query) ou select() bornée à limit + 1 lignes après le curseur"""
+    signature = _sort_signature(sort)
+    if cursor:
+        payload = decode_cursor(cursor)
+        values = payload.get("k")
+        if payload.get("s") != signature or not isinstance(values, list) or len(values) != len(sort):
+            raise InvalidCursorError("Curseur invalide pour cette liste")
+        query = query.filter(_after(sort, values))
+
+    query = query.order_by(*(c.desc() if d == "desc" else c.asc() for c, d in sort))
+    if skip and not cursor:
+        query = query.offset(skip)
+    return query.limit(limit + 1), signature
+
+
+def _keyset_page(rows: List[Any], sort: SortKey, limit: int, signature: str) -> Page:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor({"s": signature, "k": [getattr(last, c.key) for c, _ in sort]})
+    return Page(rows, next_cursor)
+
+
+def keyset_paginate(
+    query: Query,
+    sort: SortKey,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0
+) -> Page:
+    """
+    Applique l'ordre, la reprise après le curseur et la limite à la requête.
+
+    skip reste accepté pour la compatibilité (première page par OFFSET);
+    la page retournée porte quand même un curseur pour continuer par clé.
+    """
+    query, signature = _keyset_statement(query, sort, limit, cursor, skip)
+    return _keyset_page(query.all(), sort, limit, signature)
+
+
+def _statement_rows(result, stmt) -> List[Any]:
+    """select(Entité) -> objets ORM; select(colonnes...) -> lignes (projections)"""
+    columns = stmt.column_descriptions
+    if len(columns) == 1 and columns[0].get("entity") is not None and columns[0]["expr"] is columns[0]["entity"]:
+        return list(result.scalars().all())
+    return list(result.all())
+
+
+async def keyset_paginate_async(
+    db,
+    stmt: Select,
+    sort: SortKey,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0
+) -> Page:
+    """Équivalent de keyset_paginate pour un select() exécuté sur une AsyncSession"""
+    stmt, signature = _keyset_statement(stmt, sort, limit, cursor, skip)
+    rows = _statement_rows(await db.execute(stmt), stmt)
+    return _keyset_page(rows, sort, limit, signature)
+
+
+def _offset_start(cursor: Optional[str], skip: int) -> int:
+    if not cursor:
+        return skip
+    payload = decode_cursor(cursor)
+    if not isinstance(payload.get("o"), int) or payload["o"] < 0:
+        raise InvalidCursorError("Curseur invalide pour cette liste")
+    return payload["o"]
+
+
+def _offset_page(rows: List[Any], limit: int, start: int) -> Page:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor({"o": start + limit})
+    return Page(rows, next_cursor)
+
+
+def offset_paginate(query: Query, limit: int, cursor: Optional[str] = None, skip: int = 0) -> Page:
+    """Curseur positionnel pour les ordres sans clé stable (ex: tri par pertinence)"""
+    start = _offset_start(cursor, skip)
+    return _offset_page(query.offset(start).limit(limit + 1).all(), limit, start)
+
+
+async def offset_paginate_async(db, stmt: Select, limit: int, cursor: Optional[str] = None, skip: int = 0) -> Page:
+    start = _offset_start(cursor, skip)
+    stmt = stmt.offset(start).limit(limit + 1)
+    return _offset_page(_statement_rows(await db.execute(stmt), stmt), limit, start)
+
+
+def set_next_cursor(response: Response, page: Page):
+    if getattr(page, "next_cursor", None):
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+
+
+def cursor_error(e: InvalidCursorError) -> HTTPException:
+    return HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,54 @@
+# app/projection.py
+"""
+Projections de colonnes (sparse fieldsets) pour les listes de sujets.
+
+Les listes n'ont besoin que du titre et de quelques étiquettes: la projection
+"card" (par défaut) ne lit ni ne sérialise les colonnes Text volumineuses
+(description, problématique, méthodologie, ressources...). Le paramètre
+fields= accepte "card", "all" ou une liste de champs séparés par des virgules;
+la requête devient un select() de ces seules colonnes (pas d'objets ORM).
+"""
+from typing import Any, Dict, Optional, Tuple
+
+from app.models import Sujet
+
+# Champs exposés par schemas.Sujet, dans l'ordre de la réponse
+SUJET_FIELDS = (
+    "id", "titre", "keywords", "domaine", "faculté", "niveau", "problématique",
+    "méthodologie", "technologies", "description", "difficulté", "durée_estimée",
+    "ressources", "vue_count", "like_count", "is_active", "created_at",
+)
+
+SUJET_PROJECTIONS = {
+    "card": (
+        "id", "titre", "keywords", "domaine", "faculté", "niveau",
+        "difficulté", "durée_estimée", "vue_count", "like_count", "created_at",
+    ),
+    "all": SUJET_FIELDS,
+}
+
+
+class InvalidFieldsError(ValueError):
+    pass
+
+
+def parse_fields(fields: Optional[str], default: str = "card") -> Tuple[str, ...]:
+    """Champs demandés, validés; l'id est toujours inclus (clé de pagination)"""
+    fields = (fields or default).strip()
+    if fields in SUJET_PROJECTIONS:
+        return SUJET_PROJECTIONS[fields]
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in SUJET_FIELDS]
+    if unknown:
+        raise InvalidFieldsError(f"Champs inconnus: {', '.join(unknown)}")
+    wanted = set(requested) | {"id"}
+    return tuple(f for f in SUJET_FIELDS if f in wanted)
+
+
+def sujet_columns(fields: Tuple[str, ...]):
+    return [getattr(Sujet, name) for name in fields]
+
+
+def row_to_dict(row) -> Dict[str, Any]:
+    return dict(row._mapping)
@@ -1,12 +1,17 @@
 # app/routes/ai.py - NOUVELLE VERSION AMÉLIORÉE
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
 from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timezone
 
-from app.dependencies import get_current_user, get_db
-from app import schemas, crud
+from app.dependencies import get_current_user, get_current_user_async, get_db
+from app.database import get_async_db
+from app import schemas, crud, crud_async
 from app.recommendation import recommendation_engine
+from app.semantic_cache import context_fingerprint
+from app.subject_pool import subject_pool
 
 router = APIRouter(tags=["ai"])
 
@@ -26,7 +31,7 @@ except ImportError as e:
     LLM_AVAILABLE = False
     
     # Fonctions de secours (version améliorée)
-    def répondre_question(question: str, contexte: str = None) -> str:
+    def répondre_question(question: str, contexte: str = None, cache_namespace: Optional[str] = None) -> str:
         return """Je suis MemoBot, votre assistant pour les sujets de mémoire. Pour mieux vous aider :
         
 1. **Décrivez votre domaine d'étude et vos intérêts**
@@ -166,13 +171,13 @@ Je pourrai alors vous proposer des sujets pertinents et vous guider dans votre r
 @router.post("/generate-three", response_model=schemas.AIGeneratedSubjects)
 async def generate_three_subjects(
     request: schemas.GenerateSubjectsRequest,
-    current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db, scope="function")
 ):
     """Génère exactement 3 sujets avec IA et les sauvegarde temporairement"""
     try:
         # Récupérer les préférences
-        preference = crud.get_or_create_preference(db, current_user.id)
+        preference = await crud_async.get_or_create_preference(db, current_user.id)
         
         # Préparer les paramètres
         params = {
@@ -194,8 +199,12 @@ async def generate_three_subjects(
                 detail="Veuillez spécifier vos intérêts pour générer des sujets pertinents"
             )
         
-        # Générer 3 sujets avec IA
-        generated_subjects = générer_sujets_llm(params, 3)
+        # Servir depuis le pool pré-généré si un profil proche est en stock
+        subject_pool.record_demand(params)
+        generated_subjects = subject_pool.draw(params, 3)
+        if not generated_subjects:
+            # Générer 3 sujets avec IA
+            generated_subjects = await run_in_threadpool(générer_sujets_llm, params, 3)
         
         # Créer un identifiant de session pour cette génération
         import uuid
@@ -238,10 +247,10 @@ async def generate_three_subjects(
 
 # Route pour sauvegarder un sujet choisi
 @router.post("/save-chosen-subject", response_model=schemas.Sujet)
-async def save_chosen_subject(
+def save_chosen_subject(
     request: schemas.SaveChosenSubjectRequest,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """Sauvegarde un sujet choisi par l'utilisateur dans ses sujets"""
     try:
@@ -268,28 +277,12 @@ async def save_chosen_subject(
         
         print(f"📝 Création sujet: {sujet_data}")
         
-        # Créer le sujet
-        sujet = crud.create_sujet(db, sujet_data, user_id=current_user.id)
+        # Créer le sujet: un quasi-doublon du catalogue est inséré quand même, rattaché au
+        # sujet existant (duplicate_of_id) sans modifier ce dernier; l'étudiant garde son sujet
+        sujet = crud.create_sujet(db, sujet_data, user_id=current_user.id, on_duplicate="link")
         
-        # Créer un historique
-        history_data = schemas.UserHistoryCreate(
-            user_id=current_user.id,
-            action="chose_ai_subject",
-            details=f"A choisi le sujet généré par IA: {sujet.titre}",
-            sujet_id=sujet.id
-        )
-        crud.create_user_history(db, history_data)
-        
-        # Mettre à jour les préférences
-        if request.interests:
-            preference = crud.get_or_create_preference(db, current_user.id)
-            current_interests = []
-            if preference and preference.interests:
-                current_interests = [i.strip() for i in preference.interests.split(',')]
-            
-            new_interests = list(set(current_interests + request.interests))
-            update_data = {"interests": ', '.join(new_interests)}
-            crud.update_preference(db, current_user.id, update_data)
+        # Historique et préférences en une transaction (une lecture des préférences)
+        crud.record_subject_choice(db, current_user.id, sujet, request.interests, with_feedback=False)
         
         print(f"✅ Sujet créé: {sujet.id} - {sujet.titre}")
         return sujet
@@ -307,16 +300,17 @@ async def save_chosen_subject(
 @router.post("/chat", response_model=schemas.AIChatResponse)
 async def chat_with_ai(
     request: schemas.AIChatRequest,
-    current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db, scope="function")
 ):
     """Chat intelligent avec contexte et suggestions"""
+    asked_at = datetime.now(timezone.utc)
     try:
         # Récupérer l'historique de conversation
-        conversation_history = crud.get_conversation_history(db, current_user.id, limit=10)
+        conversation_history = await crud_async.get_conversation_history(db, current_user.id, limit=10)
         
         # Construire le contexte
-        preference = crud.get_or_create_preference(db, current_user.id)
+        preference = await crud_async.get_or_create_preference(db, current_user.id)
         user_context = f"Utilisateur: {current_user.email}\n"
         
         if preference:
@@ -354,8 +348,17 @@ async def chat_with_ai(
         - Un problème spécifique → Donne des solutions étape par étape
         """
         
+        # Cache sémantique sur demande, partagé entre profils identiques (hors historique)
+        cache_namespace = None
+        if request.use_cache and preference:
+            cache_namespace = "ctx:" + context_fingerprint(
+                preference.interests, preference.level, preference.faculty
+            )
+        
         # Obtenir la réponse de l'IA
-        réponse = répondre_question(request.message, full_context)
+        réponse = await run_in_threadpool(
+            répondre_question, request.message, full_context, cache_namespace=cache_namespace
+        )
         
         # Analyser la réponse pour extraire des suggestions
         suggestions = []
@@ -383,19 +386,13 @@ async def chat_with_ai(
                 "Méthodes qualitatives: entretiens, études de cas"
             ]
         
-        # Sauvegarder la conversation
-        crud.save_conversation_message(
+        # Sauvegarder l'échange (question et réponse en un seul INSERT)
+        await crud_async.save_conversation_exchange(
             db,
             user_id=current_user.id,
-            role="user",
-            content=request.message
-        )
-        
-        crud.save_conversation_message(
-            db,
-            user_id=current_user.id,
-            role="assistant",
-            content=réponse
+            question=request.message,
+            answer=réponse,
+            asked_at=asked_at
         )
         
         return {
@@ -418,16 +415,17 @@ async def chat_with_ai(
 @router.post("/ask", response_model=schemas.AIResponse)
 async def ask_question(
     request: schemas.AIRequest,
-    current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db, scope="function")
 ):
     """Route legacy pour compatibilité avec l'ancien frontend"""
+    asked_at = datetime.now(timezone.utc)
     try:
         # Récupérer l'historique de conversation
-        conversation_history = crud.get_conversation_history(db, current_user.id, limit=5)  # Limiter à 5
+        conversation_history = await crud_async.get_conversation_history(db, current_user.id, limit=5)  # Limiter à 5
         
         # Construire le contexte de manière plus propre
-        preference = crud.get_or_create_preference(db, current_user.id)
+        preference = await crud_async.get_or_create_preference(db, current_user.id)
         
         # Construire un prompt plus simple et direct
         context_parts = []
@@ -453,8 +451,16 @@ async def ask_question(
         # Construire le contexte final
         context = "\n".join(context_parts) if context_parts else ""
         
+        cache_namespace = None
+        if request.use_cache and preference:
+            cache_namespace = "ctx:" + context_fingerprint(
+                preference.interests, preference.level, preference.faculty
+            )
+        
         # Obtenir la réponse de l'IA avec un prompt plus simple
-        réponse = répondre_question(request.question, context)
+        réponse = await run_in_threadpool(
+            répondre_question, request.question, context, cache_namespace=cache_namespace
+        )
         
         # Nettoyer la réponse (enlever les répétitions de prompt)
         if "**RÉPONSE:**" in réponse:
@@ -477,19 +483,13 @@ async def ask_question(
                 "Méthodes mixtes: combinaison des deux approches"
             ]
         
-        # Sauvegarder la conversation
-        crud.save_conversation_message(
+        # Sauvegarder l'échange (question et réponse en un seul INSERT)
+        await crud_async.save_conversation_exchange(
             db,
             user_id=current_user.id,
-            role="user",
-            content=request.question
-        )
-        
-        crud.save_conversation_message(
-            db,
-            user_id=current_user.id,
-            role="assistant",
-            content=réponse
+            question=request.question,
+            answer=réponse,
+            asked_at=asked_at
         )
         
         return schemas.AIResponse(
@@ -507,10 +507,10 @@ async def ask_question(
         )
 
 @router.post("/recommend", response_model=List[schemas.RecommendedSujet])
-async def recommend_with_ai(
+def recommend_with_ai(
     request: schemas.RecommendationRequest,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """Recommandation améliorée avec suggestion de 3 sujets maximum"""
     try:
@@ -547,10 +547,10 @@ async def recommend_with_ai(
             detail=f"Erreur lors de la recommandation: {str(e)}"
         )
 @router.post("/analyze", response_model=schemas.AIAnalysisResponse)
-async def analyze_subject(
+def analyze_subject(
     request: schemas.AnalyzeSubjectRequest,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """Analyse un sujet avec l'IA"""
     try:
@@ -619,16 +619,15 @@ async def analyze_subject(
 # Route publique pour le chat sans authentification
 @router.post("/ask-public", response_model=schemas.AIResponse)
 async def ask_question_public(
-    request: schemas.AIRequest,
-    db: Session = Depends(get_db)  # Pas de get_current_user ici
+    request: schemas.AIRequest  # Pas de get_current_user ici
 ):
     """Route publique pour le chat - accessible sans authentification"""
     try:
         # Construire un prompt simple
         context = "Utilisateur non connecté posant une question sur un sujet de mémoire."
         
-        # Obtenir la réponse de l'IA
-        réponse = répondre_question(request.question, context)
+        # Obtenir la réponse de l'IA (questions anonymes mutualisées dans le cache sémantique)
+        réponse = await run_in_threadpool(répondre_question, request.question, context, cache_namespace="public")
         
         # Nettoyer la réponse
         if "**RÉPONSE:**" in réponse:
@@ -682,7 +681,7 @@ async def analyze_subject_public(
         }
         
         # Utiliser la fonction d'analyse existante
-        analysis = analyser_sujet(sujet_data)
+        analysis = await run_in_threadpool(analyser_sujet, sujet_data)
         
         return {
             "pertinence": analysis.get("pertinence", 75),
@@ -13,7 +13,7 @@ from app.dependencies import get_current_user
 router = APIRouter()
 
 @router.post("/register", response_model=User, status_code=status.HTTP_201_CREATED)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+def register_user(user: schemas.UserCreate, db: Session = Depends(get_db, scope="function")):
     """
     Enregistrement d'un nouvel utilisateur.
     """
@@ -31,7 +31,7 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
 @router.post("/login", response_model=Token)
 def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Connexion d'un utilisateur.
@@ -66,7 +66,7 @@ def login(
 @router.post("/login-json", response_model=schemas.Token)
 def login_json(
     login_data: schemas.UserLogin,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Connexion avec JSON (alternative).
@@ -116,7 +116,7 @@ def login_json(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/forgot-password")
-def forgot_password(email: schemas.PasswordResetRequest, db: Session = Depends(get_db)):
+def forgot_password(email: schemas.PasswordResetRequest, db: Session = Depends(get_db, scope="function")):
     """
     Demande de réinitialisation de mot de passe.
     """
@@ -137,7 +137,7 @@ def forgot_password(email: schemas.PasswordResetRequest, db: Session = Depends(g
     return {"message": "Password reset link sent"}
 
 @router.post("/reset-password")
-def reset_password(reset_data: schemas.PasswordReset, db: Session = Depends(get_db)):
+def reset_password(reset_data: schemas.PasswordReset, db: Session = Depends(get_db, scope="function")):
     """
     Réinitialisation du mot de passe avec un token valide.
     """
@@ -160,7 +160,6 @@ def reset_password(reset_data: schemas.PasswordReset, db: Session = Depends(get_
     # Mettre à jour le mot de passe
     from app.auth import get_password_hash
     user.hashed_password = get_password_hash(reset_data.new_password)
-    db.commit()
     
     return {"message": "Password reset successful"}
 
@@ -176,7 +175,7 @@ def change_password(
     old_password: str,
     new_password: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Changer le mot de passe de l'utilisateur connecté.
@@ -190,7 +189,8 @@ def change_password(
     
     # Mettre à jour avec le nouveau mot de passe
     from app.auth import get_password_hash
-    current_user.hashed_password = get_password_hash(new_password)
-    db.commit()
+    # current_user vient de la session asynchrone de l'authentification: recharger dans db
+    user = crud.get_user(db, current_user.id)
+    user.hashed_password = get_password_hash(new_password)
     
     return {"message": "Password changed successfully"}
\ No newline at end of file
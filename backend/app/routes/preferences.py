@@ -13,7 +13,7 @@ router = APIRouter(prefix="/users/me/preferences", tags=["preferences"])
 @router.get("", response_model=schemas.UserPreference)
 def get_preferences(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """Récupérer les préférences de l'utilisateur connecté"""
     preference = crud.get_or_create_preference(db, current_user.id)
@@ -23,7 +23,7 @@ def get_preferences(
 def update_preferences(
     preference_update: schemas.UserPreferenceUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """Mettre à jour les préférences de l'utilisateur"""
     preference = crud.update_preference(
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from app.database import get_db
 from app import crud, schemas
 from app.dependencies import get_current_user, require_admin
+from app.pagination import InvalidCursorError, cursor_error, set_next_cursor
 from app.recommendation import recommendation_engine
 from app.schemas import (
     RecommendationRequest, 
@@ -22,7 +23,7 @@ router = APIRouter()
 @router.post("/recommend", response_model=List[RecommendedSujet])
 def get_recommendations(
     request: RecommendationRequest,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(get_current_user)
 ):
     """
@@ -45,7 +46,7 @@ def get_recommendations(
 @router.get("/personalized", response_model=List[RecommendedSujet])
 def get_personalized_recommendations(
     limit: int = Query(10, ge=1, le=50),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(get_current_user)
 ):
     """
@@ -61,35 +62,42 @@ def get_personalized_recommendations(
 
 @router.get("/sujets/", response_model=List[schemas.SujetMemoire])
 def read_sujets(
+    response: Response,
     skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Curseur de page (en-tête X-Next-Cursor de la page précédente)"),
     limit: int = Query(100, ge=1, le=500),
     search: Optional[str] = None,
     faculty: Optional[str] = None,
     level: Optional[str] = None,
     domain: Optional[str] = None,
     difficulty: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Lister tous les sujets de mémoire avec filtres.
     """
-    sujets = crud.get_sujets(
-        db=db,
-        skip=skip,
-        limit=limit,
-        search=search,
-        faculty=faculty,
-        level=level,
-        domain=domain,
-        difficulty=difficulty,
-        is_active=True
-    )
+    try:
+        sujets = crud.get_sujets(
+            db=db,
+            skip=skip,
+            cursor=cursor,
+            limit=limit,
+            search=search,
+            faculté=faculty,
+            niveau=level,
+            domaine=domain,
+            difficulté=difficulty,
+            is_active=True
+        )
+    except InvalidCursorError as e:
+        raise cursor_error(e)
+    set_next_cursor(response, sujets)
     return sujets
 
 @router.get("/sujets/{sujet_id}", response_model=schemas.SujetMemoire)
 def read_sujet(
     sujet_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(get_current_user)
 ):
     """
@@ -111,7 +119,7 @@ def read_sujet(
 @router.post("/sujets/", response_model=schemas.SujetMemoire, status_code=status.HTTP_201_CREATED)
 def create_sujet(
     sujet: schemas.SujetMemoireCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(require_admin)  # Seulement pour les admins
 ):
     """
@@ -124,7 +132,7 @@ def create_sujet(
 def update_sujet(
     sujet_id: int,
     sujet_update: schemas.SujetMemoireUpdate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(require_admin)  # Seulement pour les admins
 ):
     """
@@ -148,7 +156,7 @@ def update_sujet(
 @router.delete("/sujets/{sujet_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_sujet(
     sujet_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(require_admin)  # Seulement pour les admins
 ):
     """
@@ -164,7 +172,7 @@ def delete_sujet(
 
 @router.get("/preferences", response_model=UserPreference)
 def get_user_preferences(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(get_current_user)
 ):
     """
@@ -176,7 +184,7 @@ def get_user_preferences(
 @router.put("/preferences", response_model=UserPreference)
 def update_user_preferences(
     preference_update: UserPreferenceCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(get_current_user)
 ):
     """
@@ -193,7 +201,7 @@ def update_user_preferences(
 @router.post("/feedback", response_model=Feedback)
 def submit_feedback(
     feedback: FeedbackCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(get_current_user)
 ):
     """
@@ -208,7 +216,7 @@ def submit_feedback(
 @router.post("/save", response_model=SavedSujetResponse)
 def save_sujet(
     save_request: SaveSujetRequest,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(get_current_user)
 ):
     """
@@ -233,31 +241,27 @@ def save_sujet(
 
 @router.get("/saved", response_model=List[SavedSujetResponse])
 def get_saved_sujets(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(get_current_user)
 ):
     """
     Récupérer tous les sujets sauvegardés par l'utilisateur.
     """
-    saved_sujets = crud.get_saved_sujets(db, current_user.id)
-    
-    result = []
-    for saved in saved_sujets:
-        sujet = crud.get_sujet(db, saved.sujet_id)
-        if sujet:
-            result.append(SavedSujetResponse(
-                id=saved.id,
-                sujet=sujet,
-                saved_at=saved.saved_at,
-                notes=saved.notes
-            ))
-    
-    return result
+    # Une seule requête: chaque feedback arrive avec son sujet (joinedload)
+    return [
+        SavedSujetResponse(
+            id=saved.id,
+            sujet=saved.sujet,
+            saved_at=saved.created_at,
+            notes=saved.commentaire
+        )
+        for saved in crud.get_saved_sujets(db, current_user.id)
+    ]
 
 @router.delete("/saved/{sujet_id}", status_code=status.HTTP_204_NO_CONTENT)
 def remove_saved_sujet(
     sujet_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(get_current_user)
 ):
     """
@@ -273,7 +277,7 @@ def remove_saved_sujet(
 @router.get("/stats/popular")
 def get_popular_sujets(
     limit: int = Query(10, ge=1, le=50),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Récupérer les sujets les plus populaires.
@@ -289,24 +293,9 @@ def get_popular_sujets(
 @router.get("/stats/keywords")
 def get_popular_keywords(
     limit: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Récupérer les mots-clés les plus populaires.
     """
-    from collections import Counter
-    
-    sujets = crud.get_sujets(db, is_active=True, limit=1000)
-    
-    all_keywords = []
-    for sujet in sujets:
-        keywords = [k.strip() for k in sujet.keywords.split(',')]
-        all_keywords.extend(keywords)
-    
-    keyword_counts = Counter(all_keywords)
-    popular_keywords = keyword_counts.most_common(limit)
-    
-    return [
-        {"keyword": keyword, "count": count}
-        for keyword, count in popular_keywords
-    ]
\ No newline at end of file
+    return crud.get_popular_keywords(db, limit)
\ No newline at end of file
@@ -7,7 +7,7 @@ from datetime import datetime
 
 from app.database import get_db
 from app.dependencies import get_current_user
-from app import schemas
+from app import crud, schemas
 from app.models import User, UserPreference
 
 router = APIRouter()
@@ -15,7 +15,7 @@ router = APIRouter()
 @router.get("/preferences")
 def get_user_preferences(
     current_user: schemas.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Récupérer les préférences de l'utilisateur connecté
@@ -33,8 +33,7 @@ def get_user_preferences(
             preferences='{}'
         )
         db.add(preference)
-        db.commit()
-        db.refresh(preference)
+        db.flush()
     
     # Parser les préférences JSON
     prefs_dict = {}
@@ -55,7 +54,7 @@ def get_user_preferences(
 def update_preferences(
     preferences: Dict[str, Any],
     current_user: schemas.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Mettre à jour les préférences de l'utilisateur
@@ -80,7 +79,6 @@ def update_preferences(
         preference.level = preferences["level"]
     
     preference.updated_at = datetime.utcnow()
-    db.commit()
     
     return {"message": "Préférences mises à jour avec succès"}
 
@@ -88,7 +86,7 @@ def update_preferences(
 def change_password(
     data: Dict[str, str],
     current_user: schemas.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Changer le mot de passe de l'utilisateur
@@ -119,7 +117,8 @@ def change_password(
         )
     
     # Mettre à jour le mot de passe
-    current_user.hashed_password = get_password_hash(new_password)
-    db.commit()
+    # current_user vient de la session asynchrone de l'authentification: recharger dans db
+    user = crud.get_user(db, current_user.id)
+    user.hashed_password = get_password_hash(new_password)
     
     return {"message": "Mot de passe changé avec succès"}
\ No newline at end of file
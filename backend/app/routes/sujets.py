@@ -1,12 +1,22 @@
 from app.models import Sujet, User, Feedback, UserPreference
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
 import json
 import datetime
-from app.database import get_db
-from app import crud, schemas
-from app.dependencies import get_current_user, require_admin
+from app.database import get_db, get_async_db
+from app import crud, crud_async, schemas
+from app.dependencies import get_current_user, get_current_user_async, require_admin
+from app.bulk_import import ImportFormatError, detect_format, import_sujets
+from app.counters import counter_buffer
+from app.dedup import DuplicateSujetError
+from app.export import EXPORT_FORMATS, ExportFormatUnavailable, check_format, stream_sujets
+from app.keywords import keyword_facets, related_keywords
+from app.pagination import InvalidCursorError, cursor_error, set_next_cursor
+from app.projection import InvalidFieldsError, parse_fields, row_to_dict
 from app.llm_service import (
     recommander_sujets_llm as recommander_sujets,
     analyser_sujet,
@@ -17,9 +27,9 @@ from app.llm_service import (
 router = APIRouter()
 
 @router.post("/recommend", response_model=List[schemas.RecommendedSujet])
-async def recommend_sujets(
+def recommend_sujets(
     request: schemas.RecommendationRequest,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(get_current_user)
 ):
     """
@@ -87,47 +97,96 @@ async def recommend_sujets(
 
 @router.get("/search")
 async def search_sujets(
+    response: Response,
     q: str = Query(None, description="Terme de recherche"),
     domaine: str = Query(None, description="Domaine"),
     faculté: str = Query(None, description="Faculté"),
     niveau: str = Query(None, description="Niveau"),
+    keyword: Optional[List[str]] = Query(None, description="Mots-clés (tous requis)"),
+    fields: Optional[str] = Query(None, description="Projection: card (défaut), all, ou champs séparés par des virgules"),
     skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Curseur de page (en-tête X-Next-Cursor de la page précédente)"),
     limit: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db, scope="function")
 ):
     """
-    Rechercher des sujets
+    Rechercher des sujets (projection "card" par défaut, voir fields)
     """
-    sujets = crud.get_sujets(
-        db=db,
-        skip=skip,
-        limit=limit,
-        search=q,
-        domaine=domaine,
-        faculté=faculté,
-        niveau=niveau
-    )
+    try:
+        sujets = await crud_async.get_sujets(
+            db=db,
+            skip=skip,
+            cursor=cursor,
+            limit=limit,
+            search=q,
+            domaine=domaine,
+            faculté=faculté,
+            niveau=niveau,
+            keywords=keyword,
+            fields=parse_fields(fields)
+        )
+    except InvalidFieldsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except InvalidCursorError as e:
+        raise cursor_error(e)
+    set_next_cursor(response, sujets)
     
-    return sujets
+    return [row_to_dict(row) for row in sujets]
+
+@router.get("/export")
+def export_sujets(
+    format: str = Query("jsonl", pattern="^(jsonl|csv|parquet)$", description="Format du fichier"),
+    q: str = Query(None, description="Terme de recherche"),
+    domaine: str = Query(None, description="Domaine"),
+    faculté: str = Query(None, description="Faculté"),
+    niveau: str = Query(None, description="Niveau"),
+    difficulté: str = Query(None, description="Difficulté"),
+    keyword: Optional[List[str]] = Query(None, description="Mots-clés (tous requis)"),
+    fields: Optional[str] = Query(None, description="Projection: all (défaut), card, ou champs séparés par des virgules"),
+    current_user = Depends(get_current_user)
+):
+    """
+    Exporter le catalogue filtré en un seul fichier (mêmes filtres que la liste),
+    envoyé en flux: lecture par curseur côté serveur, mémoire constante
+    """
+    try:
+        selected = parse_fields(fields, default="all")
+        check_format(format)
+    except InvalidFieldsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExportFormatUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"sujets-{datetime.date.today().isoformat()}.{extension}"
+    return StreamingResponse(
+        stream_sujets(
+            format, selected, search=q, domaine=domaine, faculté=faculté,
+            niveau=niveau, difficulté=difficulté, keywords=keyword
+        ),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @router.get("/{sujet_id}")
 async def get_sujet(
     sujet_id: int,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db, scope="function"),
+    current_user = Depends(get_current_user_async)
 ):
     """
     Récupérer un sujet spécifique avec analyse IA
     """
-    sujet = crud.get_sujet(db, sujet_id)
+    sujet = await crud_async.get_sujet(db, sujet_id)
     if not sujet or not sujet.is_active:
         raise HTTPException(status_code=404, detail="Sujet non trouvé")
     
-    # Incrémenter le compteur de vues
-    crud.update_sujet_vue_count(db, sujet_id)
+    # Incrémenter le compteur de vues (écriture différée, la réponse inclut les vues en attente)
+    await crud_async.update_sujet_vue_count(db, sujet_id)
+    counter_buffer.apply_pending(sujet)
     
     # Analyser le sujet avec IA
-    analyse = analyser_sujet({
+    analyse = await run_in_threadpool(analyser_sujet, {
         "titre": sujet.titre,
         "domaine": sujet.domaine,
         "niveau": sujet.niveau,
@@ -143,43 +202,83 @@ async def get_sujet(
     }
 
 @router.post("/", response_model=schemas.Sujet)
-async def create_sujet(
+def create_sujet(
     sujet: schemas.SujetCreate,
-    db: Session = Depends(get_db),
+    on_duplicate: str = Query("reject", pattern="^(allow|reject|merge|link)$", description="Action si un quasi-doublon existe"),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(require_admin)
 ):
     """
     Créer un nouveau sujet (admin only)
     """
-    return crud.create_sujet(db, sujet)
-@router.get("/", response_model=List[schemas.Sujet])
+    try:
+        return crud.create_sujet(db, sujet, on_duplicate=on_duplicate)
+    except DuplicateSujetError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": str(e), "existing_id": e.existing_id, "similarity": round(e.similarity, 3)}
+        )
+
+@router.post("/import")
+def import_sujets_file(
+    file: UploadFile = File(..., description="Fichier CSV ou JSONL (colonnes de SujetCreate)"),
+    format: Optional[str] = Query(None, pattern="^(csv|jsonl)$", description="Format, sinon déduit de l'extension"),
+    on_duplicate: str = Query("reject", pattern="^(allow|reject)$", description="Action si un quasi-doublon existe"),
+    dry_run: bool = Query(False, description="Valider sans rien écrire"),
+    db: Session = Depends(get_db, scope="function"),
+    current_user = Depends(require_admin)
+):
+    """
+    Import en masse de sujets (admin only): lecture en flux, validation et
+    insertion par lots, rapport d'erreurs par numéro de ligne
+    """
+    try:
+        fmt = detect_format(file.filename, format)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return import_sujets(db, file.file, fmt, on_duplicate=on_duplicate, dry_run=dry_run).to_dict()
+
+@router.get("/")
 async def list_sujets(
+    response: Response,
     q: str = Query(None, description="Terme de recherche"),
     domaine: str = Query(None, description="Domaine"),
     faculté: str = Query(None, description="Faculté"),
     niveau: str = Query(None, description="Niveau"),
     difficulté: str = Query(None, description="Difficulté"),
+    keyword: Optional[List[str]] = Query(None, description="Mots-clés (tous requis)"),
+    fields: Optional[str] = Query(None, description="Projection: card (défaut), all, ou champs séparés par des virgules"),
     skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Curseur de page (en-tête X-Next-Cursor de la page précédente)"),
     limit: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db, scope="function")
 ):
     """
-    Lister tous les sujets avec filtres
+    Lister tous les sujets avec filtres (projection "card" par défaut, voir fields)
     """
-    sujets = crud.get_sujets(
-        db=db,
-        skip=skip,
-        limit=limit,
-        search=q,
-        domaine=domaine,
-        faculté=faculté,
-        niveau=niveau,
-        difficulté=difficulté
-    )
+    try:
+        sujets = await crud_async.get_sujets(
+            db=db,
+            skip=skip,
+            cursor=cursor,
+            limit=limit,
+            search=q,
+            domaine=domaine,
+            faculté=faculté,
+            niveau=niveau,
+            difficulté=difficulté,
+            keywords=keyword,
+            fields=parse_fields(fields)
+        )
+    except InvalidFieldsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except InvalidCursorError as e:
+        raise cursor_error(e)
+    set_next_cursor(response, sujets)
     
-    return sujets
+    return [row_to_dict(row) for row in sujets]
 @router.post("/generate")
-async def generate_sujets(
+def generate_sujets(
     interests: List[str] = Query(..., description="Intérêts"),
     domaine: str = Query("Génie Civil", description="Domaine"),
     niveau: str = Query("L3", description="Niveau"),
@@ -200,9 +299,9 @@ async def generate_sujets(
     return sujets
 
 @router.post("/feedback")
-async def submit_feedback(
+def submit_feedback(
     feedback: schemas.FeedbackCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(get_current_user)
 ):
     """
@@ -212,7 +311,7 @@ async def submit_feedback(
 
 @router.get("/stats/popular")
 def get_popular_sujets(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     limit: int = Query(10, ge=1, le=100)
 ):
     """Récupère les sujets les plus populaires"""
@@ -251,37 +350,54 @@ def get_popular_sujets(
         )
 
 @router.get("/stats/keywords")
-async def get_popular_keywords(
+def get_popular_keywords(
     limit: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Mots-clés les plus populaires
     """
     return crud.get_popular_keywords(db, limit)
 
+@router.get("/facets/keywords")
+def get_keyword_facets(
+    keyword: Optional[List[str]] = Query(None, description="Mots-clés déjà sélectionnés"),
+    domaine: str = Query(None, description="Domaine"),
+    faculté: str = Query(None, description="Faculté"),
+    niveau: str = Query(None, description="Niveau"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db, scope="function")
+):
+    """
+    Facettes: mots-clés des sujets correspondant aux filtres, avec leur nombre
+    """
+    return keyword_facets(db, limit, keywords=keyword, domaine=domaine, faculté=faculté, niveau=niveau)
+
+@router.get("/keywords/{keyword}/related")
+def get_related_keywords(
+    keyword: str,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db, scope="function")
+):
+    """
+    Mots-clés qui apparaissent le plus souvent avec ce mot-clé
+    """
+    return related_keywords(db, keyword, limit)
+
 @router.get("/stats/domains")
-async def get_domains_stats(db: Session = Depends(get_db)):
+def get_domains_stats(db: Session = Depends(get_db, scope="function")):
     """
     Statistiques par domaine
     """
-    from sqlalchemy import func
-    
-    stats = db.query(
-        Sujet.domaine,
-        func.count(Sujet.id).label('count'),
-        func.avg(Sujet.vue_count).label('avg_views')
-    ).group_by(Sujet.domaine).all()
-    
     return [
-        {"domaine": domaine, "count": count, "avg_views": round(avg_views or 0, 1)}
-        for domaine, count, avg_views in stats
+        {"domaine": stat["domaine"], "count": stat["count"], "avg_views": round(stat["avg_views"], 1)}
+        for stat in crud.get_domain_stats(db)
     ]
     
 @router.get("/stats/popular")
 def get_popular_sujets(
     limit: int = 5,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Récupérer les sujets les plus populaires
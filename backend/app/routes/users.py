@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 
 from app.database import get_db
 from app import crud, schemas
-from app.dependencies import get_current_user, require_admin
+from app.dependencies import get_current_user, get_current_user_async, require_admin
+from app.pagination import InvalidCursorError, cursor_error, set_next_cursor
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -13,7 +14,7 @@ router = APIRouter(prefix="/users", tags=["users"])
 @router.get("/me/preferences")
 def get_my_preferences(
     current_user: schemas.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Récupérer les préférences de l'utilisateur connecté
@@ -25,7 +26,7 @@ def get_my_preferences(
 def update_my_preferences(
     preference_update: dict,
     current_user: schemas.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Mettre à jour les préférences de l'utilisateur connecté
@@ -37,7 +38,7 @@ def update_my_preferences(
 @router.get("/{user_id}/profile")
 def get_user_profile(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """
@@ -67,7 +68,7 @@ def get_user_profile(
 def update_user_profile(
     user_id: int,
     profile_update: dict,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """
@@ -91,22 +92,28 @@ def update_user_profile(
 # Routes admin
 @router.get("/", response_model=List[schemas.User])
 def read_users(
+    response: Response,
     skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Curseur de page (en-tête X-Next-Cursor de la page précédente)"),
     limit: int = Query(100, ge=1, le=500),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(require_admin)  # Seulement pour les admins
 ):
     """
     Récupérer tous les utilisateurs.
     Accessible uniquement aux administrateurs.
     """
-    users = crud.get_users(db, skip=skip, limit=limit)
+    try:
+        users = crud.get_users(db, skip=skip, limit=limit, cursor=cursor)
+    except InvalidCursorError as e:
+        raise cursor_error(e)
+    set_next_cursor(response, users)
     return users
 
 @router.get("/{user_id}", response_model=schemas.User)
 def read_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(require_admin)  # Seulement pour les admins
 ):
     """
@@ -125,7 +132,7 @@ def read_user(
 @router.get("/{user_id}/skills")
 def get_user_skills(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """
@@ -162,7 +169,7 @@ def get_user_skills(
 @router.get("/{user_id}/stats")
 def get_user_stats(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """
@@ -177,14 +184,15 @@ def get_user_stats(
         "last_active": datetime.now().isoformat()
     }
     
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 
 from app.database import get_db
-from app import crud, schemas
-from app.dependencies import get_current_user, require_admin
+from app import crud, crud_async, schemas
+from app.dependencies import get_current_user, get_current_user_async, require_admin
+from app.bulk_import import ImportFormatError, detect_format, import_users
 
 router = APIRouter()
 
@@ -192,7 +200,7 @@ router = APIRouter()
 @router.get("/me/preferences")
 def get_my_preferences(
     current_user: schemas.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Récupérer les préférences de l'utilisateur connecté
@@ -204,7 +212,7 @@ def get_my_preferences(
 def update_my_preferences(
     preference_update: dict,
     current_user: schemas.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Mettre à jour les préférences de l'utilisateur connecté
@@ -217,7 +225,7 @@ def update_my_preferences(
 @router.get("/{user_id}/profile", response_model=schemas.UserProfile)
 def get_user_profile(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """
@@ -237,7 +245,7 @@ def get_user_profile(
 def update_user_profile(
     user_id: int,
     profile_update: schemas.UserProfileUpdate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """
@@ -256,7 +264,7 @@ def update_user_profile(
 @router.get("/{user_id}/skills", response_model=List[schemas.UserSkill])
 def get_user_skills(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """
@@ -276,7 +284,7 @@ def get_user_skills(
 def create_user_skill_endpoint(
     user_id: int,
     skill: schemas.UserSkillCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """
@@ -294,7 +302,7 @@ def create_user_skill_endpoint(
 def update_user_skills_endpoint(
     user_id: int,
     skills: List[schemas.UserSkillCreate],
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """
@@ -311,7 +319,7 @@ def update_user_skills_endpoint(
 @router.get("/{user_id}/stats", response_model=schemas.UserStats)
 def get_user_stats(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """
@@ -331,22 +339,28 @@ def get_user_stats(
 # Routes admin
 @router.get("/", response_model=List[schemas.User])
 def read_users(
+    response: Response,
     skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Curseur de page (en-tête X-Next-Cursor de la page précédente)"),
     limit: int = Query(100, ge=1, le=500),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(require_admin)  # Seulement pour les admins
 ):
     """
     Récupérer tous les utilisateurs.
     Accessible uniquement aux administrateurs.
     """
-    users = crud.get_users(db, skip=skip, limit=limit)
+    try:
+        users = crud.get_users(db, skip=skip, limit=limit, cursor=cursor)
+    except InvalidCursorError as e:
+        raise cursor_error(e)
+    set_next_cursor(response, users)
     return users
 
 @router.get("/{user_id}", response_model=schemas.User)
 def read_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(require_admin)  # Seulement pour les admins
 ):
     """
@@ -361,4 +375,32 @@ def read_user(
         )
     return user
 
-    
\ No newline at end of file
+    
+@router.get("/me/dashboard")
+async def get_my_dashboard(
+    current_user = Depends(get_current_user_async)
+):
+    """
+    Statistiques du tableau de bord de l'utilisateur connecté
+    (compteurs calculés en parallèle sur des sessions asynchrones distinctes)
+    """
+    return await crud_async.get_dashboard_stats(current_user.id)
+
+
+@router.post("/import")
+def import_users_file(
+    file: UploadFile = File(..., description="Fichier CSV ou JSONL (email, full_name, role, password)"),
+    format: Optional[str] = Query(None, pattern="^(csv|jsonl)$", description="Format, sinon déduit de l'extension"),
+    dry_run: bool = Query(False, description="Valider sans rien écrire"),
+    db: Session = Depends(get_db, scope="function"),
+    current_user = Depends(require_admin)
+):
+    """
+    Import en masse d'utilisateurs (admin only); les emails déjà utilisés
+    sont écartés et signalés dans le rapport
+    """
+    try:
+        fmt = detect_format(file.filename, format)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return import_users(db, file.file, fmt, dry_run=dry_run).to_dict()
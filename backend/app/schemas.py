@@ -220,6 +220,7 @@ class UserStats(BaseModel):
 class AIRequest(BaseModel):
     question: str
     context: Optional[str] = None
+    use_cache: bool = Field(False, description="Autoriser une réponse du cache sémantique pour ce profil")
 
 class AIResponse(BaseModel):
     question: str
@@ -319,6 +320,7 @@ class ActionButton(BaseModel):
 class AIChatRequest(BaseModel):
     message: str
     context: Optional[str] = None
+    use_cache: bool = Field(False, description="Autoriser une réponse du cache sémantique pour ce profil")
 
 class AIChatResponse(BaseModel):
     message: str
@@ -0,0 +1,206 @@
+# app/search.py
+"""
+Recherche plein texte sur les sujets.
+
+- PostgreSQL: colonne générée sujets.search_vector (config 'french', poids
+  A titre / B mots-clés / C description) indexée en GIN, interrogée avec
+  websearch_to_tsquery et triée par ts_rank.
+- SQLite: table virtuelle FTS5 sujets_fts (contenu externe = sujets) tenue
+  à jour par des triggers, triée par bm25.
+- Sinon (ou migration non appliquée): ancien filtre LIKE sans classement.
+
+La recherche par mots-clés (recommandations) utilise pg_trgm: index GIN
+trigrammes sur lower(titre) et lower(keywords), opérateur <% et score
+word_similarity. Hors PostgreSQL, le score est le nombre de correspondances LIKE.
+
+La colonne search_vector n'est pas mappée dans le modèle: elle est gérée par
+la base (migration) et n'a pas à transiter dans les objets Sujet.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy import func, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query, Session
+
+from app.models import Sujet
+
+SEARCH_CONFIG = "french"
+
+_search_vector = sa.literal_column("sujets.search_vector")
+_sujets_fts = sa.table("sujets_fts", sa.column("rowid"))
+
+# Capacités détectées par moteur (évite une inspection du schéma à chaque requête)
+_capabilities: Dict[Tuple[str, int], str] = {}
+
+# Index trigrammes (migration e5a9c0d3b214, repris par benchmark_keyword_search.py)
+TRGM_INDEXES = {
+    "ix_sujets_keywords_trgm": "lower(keywords) gin_trgm_ops",
+    "ix_sujets_titre_trgm": "lower(titre) gin_trgm_ops",
+}
+
+SQLITE_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS sujets_fts USING fts5(
+        titre, keywords, description,
+        content='sujets', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS sujets_fts_ai AFTER INSERT ON sujets BEGIN
+        INSERT INTO sujets_fts(rowid, titre, keywords, description)
+        VALUES (new.id, new.titre, new.keywords, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS sujets_fts_ad AFTER DELETE ON sujets BEGIN
+        INSERT INTO sujets_fts(sujets_fts, rowid, titre, keywords, description)
+        VALUES ('delete', old.id, old.titre, old.keywords, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS sujets_fts_au AFTER UPDATE OF titre, keywords, description ON sujets BEGIN
+        INSERT INTO sujets_fts(sujets_fts, rowid, titre, keywords, description)
+        VALUES ('delete', old.id, old.titre, old.keywords, old.description);
+        INSERT INTO sujets_fts(rowid, titre, keywords, description)
+        VALUES (new.id, new.titre, new.keywords, new.description);
+    END
+    """,
+]
+
+
+def ensure_sqlite_fts(engine: Engine):
+    """Crée (une seule fois) l'index FTS5 et ses triggers pour une base SQLite"""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        created = not inspect(conn).has_table("sujets_fts")
+        for ddl in SQLITE_FTS_DDL:
+            conn.execute(text(ddl))
+        if created:
+            conn.execute(text("INSERT INTO sujets_fts(sujets_fts) VALUES ('rebuild')"))
+            print("🔎 Index FTS5 des sujets créé")
+    _capabilities.pop(("text", id(engine)), None)
+
+
+def search_backend(db: Session) -> str:
+    """'postgres', 'fts5' ou 'like' selon la base et les migrations appliquées"""
+    return search_backend_for(db.get_bind())
+
+
+def search_backend_for(engine: Engine) -> str:
+    """Même détection à partir d'un moteur synchrone (utilisé aussi par crud_async)"""
+    key = ("text", id(engine))
+    if key not in _capabilities:
+        backend = "like"
+        inspector = inspect(engine)
+        if engine.dialect.name == "postgresql":
+            if any(c["name"] == "search_vector" for c in inspector.get_columns("sujets")):
+                backend = "postgres"
+        elif engine.dialect.name == "sqlite" and inspector.has_table("sujets_fts"):
+            backend = "fts5"
+        if backend == "like":
+            print("⚠️ Recherche plein texte indisponible, repli sur LIKE")
+        _capabilities[key] = backend
+    return _capabilities[key]
+
+
+def fts5_query(search: str) -> str:
+    """Transforme une saisie libre en requête FTS5 sûre (termes entre guillemets, préfixes)"""
+    terms = re.findall(r"\w+", search, flags=re.UNICODE)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def apply_text_search(db: Optional[Session], query, search: str, backend: Optional[str] = None):
+    """Filtre la requête (Query ou select()) sur le texte cherché et la trie par pertinence"""
+    backend = backend or search_backend(db)
+
+    if backend == "postgres":
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, search)
+        return (
+            query.filter(_search_vector.op("@@")(ts_query))
+            .order_by(func.ts_rank(_search_vector, ts_query).desc(), Sujet.id)
+        )
+
+    if backend == "fts5":
+        match = fts5_query(search)
+        if not match:
+            return query
+        # bm25: plus petit = plus pertinent; poids titre > mots-clés > description comme sous Postgres
+        return (
+            query.join(_sujets_fts, _sujets_fts.c.rowid == Sujet.id)
+            .filter(text("sujets_fts MATCH :fts_query").bindparams(fts_query=match))
+            .order_by(text("bm25(sujets_fts, 10.0, 4.0, 1.0)"), Sujet.id)
+        )
+
+    return query.filter(
+        Sujet.titre.contains(search) |
+        Sujet.keywords.contains(search) |
+        Sujet.description.contains(search)
+    )
+
+
+def has_trigram_search(db: Session) -> bool:
+    """pg_trgm installé (et donc index trigrammes disponibles)"""
+    engine = db.get_bind()
+    key = ("trgm", id(engine))
+    if key not in _capabilities:
+        available = False
+        if engine.dialect.name == "postgresql":
+            available = db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+        _capabilities[key] = "trgm" if available else "like"
+    return _capabilities[key] == "trgm"
+
+
+def normalize_keywords(keywords: List[str]) -> List[str]:
+    seen = []
+    for keyword in keywords:
+        keyword = (keyword or "").strip().lower()
+        if keyword and keyword not in seen:
+            seen.append(keyword)
+    return seen
+
+
+def keyword_search_query(db: Session, keywords: List[str], limit: int = 10) -> Query:
+    """Requête (Sujet, score) pour des mots-clés déjà normalisés"""
+    titre, mots = func.lower(Sujet.titre), func.lower(Sujet.keywords)
+
+    if has_trigram_search(db):
+        # kw <% col utilise les index GIN trigrammes; le score somme le meilleur champ par mot-clé
+        conditions = []
+        scores = []
+        for keyword in keywords:
+            kw = sa.literal(keyword, sa.Text)
+            conditions += [kw.op("<%")(titre), kw.op("<%")(mots)]
+            scores.append(func.greatest(func.word_similarity(kw, titre), func.word_similarity(kw, mots)))
+        score = sum(scores[1:], scores[0]) / len(keywords)
+    else:
+        conditions = []
+        matches = []
+        for keyword in keywords:
+            pattern = f"%{keyword}%"
+            for column in (titre, mots, func.lower(Sujet.description)):
+                condition = column.like(pattern)
+                conditions.append(condition)
+                matches.append(sa.case((condition, 1.0), else_=0.0))
+        score = sum(matches[1:], matches[0]) / len(matches)
+
+    score = score.label("score")
+    return (
+        db.query(Sujet, score)
+        .filter(Sujet.is_active == True)
+        .filter(sa.or_(*conditions))
+        .order_by(score.desc(), Sujet.vue_count.desc())
+        .limit(limit)
+    )
+
+
+def keyword_search(db: Session, keywords: List[str], limit: int = 10) -> List[Tuple[Sujet, float]]:
+    """Sujets actifs correspondant aux mots-clés, avec leur score (plus grand = plus pertinent)"""
+    keywords = normalize_keywords(keywords)
+    if not keywords:
+        return []
+    rows = keyword_search_query(db, keywords, limit).all()
+    return [(sujet, round(float(value or 0), 4)) for sujet, value in rows]
@@ -0,0 +1,242 @@
+# app/semantic_cache.py
+"""
+Cache sémantique des réponses de répondre_question.
+
+Les questions sont projetées localement (hachage de mots et de trigrammes
+de caractères, sans appel réseau) dans un espace de dimension fixe. Une
+question suffisamment proche d'une question déjà répondue (similarité
+cosinus >= seuil) réutilise la réponse stockée. Chaque entrée expire après
+un TTL. Les entrées sont rangées par espace de noms: "public" pour les
+routes anonymes, "ctx:<empreinte>" pour le chat authentifié.
+
+La mémoire est bornée globalement: au plus SEMANTIC_CACHE_MAX_NAMESPACES
+espaces et SEMANTIC_CACHE_MAX_TOTAL_ENTRIES emplacements alloués, tous espaces
+confondus; au-delà, les espaces les moins récemment utilisés sont supprimés en
+entier (LRU). Chaque écriture purge les entrées expirées de son espace et
+supprime les espaces dont toutes les entrées ont expiré.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.metrics import metrics
+
+load_dotenv()
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", str(24 * 3600)))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+# Bornes globales (un espace "ctx:<empreinte>" par contexte utilisateur)
+SEMANTIC_CACHE_MAX_TOTAL_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_TOTAL_ENTRIES", "20000"))
+SEMANTIC_CACHE_MAX_NAMESPACES = int(os.getenv("SEMANTIC_CACHE_MAX_NAMESPACES", "1000"))
+EMBEDDING_DIM = 512
+
+STOPWORDS = {
+    "le", "la", "les", "un", "une", "des", "de", "du", "d", "l", "et", "ou", "a", "au", "aux",
+    "en", "pour", "par", "sur", "dans", "avec", "ce", "cet", "cette", "ces", "mon", "ma", "mes",
+    "ton", "ta", "tes", "son", "sa", "ses", "je", "tu", "il", "elle", "on", "nous", "vous",
+    "me", "te", "se", "que", "qui", "quoi", "est", "suis", "sont", "etre", "comment", "quel",
+    "quelle", "quels", "quelles", "faut", "il", "y", "s", "t", "ne", "pas", "plus", "bien",
+}
+
+
+def normalize_text(text: str) -> str:
+    """Minuscules, sans accents ni ponctuation"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+
+def _hash_feature(feature: str, weight: float, vector: np.ndarray):
+    h = zlib.crc32(feature.encode("utf-8"))
+    sign = 1.0 if (h >> 31) & 1 else -1.0
+    vector[h % EMBEDDING_DIM] += sign * weight
+
+
+def embed(text: str) -> np.ndarray:
+    """Plongement local: mots pleins + trigrammes de caractères hachés, normalisé L2"""
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    words = [w for w in normalize_text(text).split() if w not in STOPWORDS]
+    for word in words:
+        _hash_feature("w:" + word, 1.0, vector)
+        padded = f"#{word}#"
+        for i in range(len(padded) - 2):
+            _hash_feature("c:" + padded[i:i + 3], 0.4, vector)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def context_fingerprint(*parts: Optional[str]) -> str:
+    """Empreinte stable d'un contexte utilisateur (intérêts, niveau, faculté...)"""
+    normalized = "|".join(normalize_text(p or "") for p in parts)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+class _Namespace:
+    """Matrice des plongements d'un espace de noms, agrandie à la demande"""
+
+    def __init__(self, max_entries: int, initial_capacity: int = 64):
+        capacity = min(initial_capacity, max_entries)
+        self.max_entries = max_entries
+        self.vectors = np.zeros((capacity, EMBEDDING_DIM), dtype=np.float32)
+        self.entries: List[Optional[Dict[str, Any]]] = [None] * capacity
+        # Échéance par slot (0: vide), pour purger sans parcourir les dicts
+        self.expires = np.zeros(capacity, dtype=np.float64)
+        self.next_slot = 0
+        self.size = 0
+        self.newest_expiry = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return len(self.entries)
+
+    def reserve_slot(self) -> int:
+        capacity = len(self.entries)
+        if self.next_slot >= capacity and capacity < self.max_entries:
+            new_capacity = min(capacity * 2, self.max_entries)
+            vectors = np.zeros((new_capacity, EMBEDDING_DIM), dtype=np.float32)
+            vectors[:capacity] = self.vectors
+            self.vectors = vectors
+            self.entries.extend([None] * (new_capacity - capacity))
+            self.expires = np.concatenate([self.expires, np.zeros(new_capacity - capacity)])
+        # Tampon circulaire une fois la taille maximale atteinte
+        slot = self.next_slot % len(self.entries)
+        self.next_slot = slot + 1
+        return slot
+
+    def put(self, slot: int, vector: np.ndarray, entry: Dict[str, Any]):
+        if self.entries[slot] is None:
+            self.size += 1
+        self.vectors[slot] = vector
+        self.entries[slot] = entry
+        self.expires[slot] = entry["expires_at"]
+        self.newest_expiry = max(self.newest_expiry, entry["expires_at"])
+
+    def clear_slot(self, slot: int):
+        if self.entries[slot] is not None:
+            self.size -= 1
+        self.entries[slot] = None
+        self.vectors[slot] = 0
+        self.expires[slot] = 0
+
+    def purge_expired(self, now: float) -> int:
+        expired = np.flatnonzero((self.expires > 0) & (self.expires < now))
+        for slot in expired:
+            self.clear_slot(int(slot))
+        return len(expired)
+
+
+class SemanticCache:
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl: int = SEMANTIC_CACHE_TTL,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        max_total_entries: int = SEMANTIC_CACHE_MAX_TOTAL_ENTRIES,
+        max_namespaces: int = SEMANTIC_CACHE_MAX_NAMESPACES
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        # Un espace seul ne peut dépasser la borne globale
+        self.max_entries = min(max_entries, max_total_entries)
+        self.max_total_entries = max_total_entries
+        self.max_namespaces = max_namespaces
+        # Ordre LRU: le plus récemment utilisé en dernier
+        self._namespaces: "OrderedDict[str, _Namespace]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, question: str, namespace: str = "public") -> Optional[Dict[str, Any]]:
+        """Retourne la réponse d'une question proche encore valide, sinon None"""
+        query = embed(question)
+        now = time.time()
+
+        with self._lock:
+            space = self._namespaces.get(namespace)
+            if space is None:
+                metrics.inc("semantic_cache_misses_total", namespace=namespace.split(":")[0])
+                return None
+            self._namespaces.move_to_end(namespace)
+
+            # Produit scalaire = cosinus (vecteurs normalisés); slots vides à 0
+            scores = space.vectors @ query
+            for index in np.argsort(-scores)[:5]:
+                score = float(scores[index])
+                if score < self.threshold:
+                    break
+                entry = space.entries[index]
+                if entry is None:
+                    continue
+                if entry["expires_at"] < now:
+                    space.clear_slot(int(index))
+                    continue
+                metrics.inc("semantic_cache_hits_total", namespace=namespace.split(":")[0])
+                return {**entry, "similarity": round(score, 4)}
+
+        metrics.inc("semantic_cache_misses_total", namespace=namespace.split(":")[0])
+        return None
+
+    def store(self, question: str, answer: str, namespace: str = "public"):
+        vector = embed(question)
+        now = time.time()
+        with self._lock:
+            space = self._namespaces.get(namespace)
+            if space is None:
+                space = self._namespaces[namespace] = _Namespace(self.max_entries)
+            self._namespaces.move_to_end(namespace)
+            space.purge_expired(now)
+            slot = space.reserve_slot()
+            space.put(slot, vector, {
+                "question": question,
+                "answer": answer,
+                "expires_at": now + self.ttl,
+            })
+            self._evict_unlocked(now)
+
+    def _evict_unlocked(self, now: float):
+        """Supprime les espaces expirés, puis les moins récemment utilisés au-delà des bornes globales"""
+        for name in [n for n, space in self._namespaces.items() if space.newest_expiry < now]:
+            del self._namespaces[name]
+            metrics.inc("semantic_cache_evictions_total", reason="expired")
+        slots = sum(space.capacity for space in self._namespaces.values())
+        # L'espace qui vient d'être écrit (le dernier) n'est jamais évincé
+        while len(self._namespaces) > 1 and (
+            len(self._namespaces) > self.max_namespaces or slots > self.max_total_entries
+        ):
+            _, space = self._namespaces.popitem(last=False)
+            slots -= space.capacity
+            metrics.inc("semantic_cache_evictions_total", reason="lru")
+
+    def clear(self, namespace: Optional[str] = None):
+        with self._lock:
+            if namespace is None:
+                self._namespaces.clear()
+            else:
+                self._namespaces.pop(namespace, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": SEMANTIC_CACHE_ENABLED,
+                "threshold": self.threshold,
+                "ttl": self.ttl,
+                "namespaces": len(self._namespaces),
+                "entries": sum(space.size for space in self._namespaces.values()),
+                "slots": sum(space.capacity for space in self._namespaces.values()),
+                "max_total_entries": self.max_total_entries,
+                "max_namespaces": self.max_namespaces,
+            }
+
+
+# Instance globale
+semantic_cache = SemanticCache()
+metrics.register_collector("semantic_cache", semantic_cache.stats)
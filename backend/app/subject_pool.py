@@ -0,0 +1,207 @@
+# app/subject_pool.py
+"""
+Pools de sujets pré-générés pour les profils de génération les plus demandés.
+
+Un profil regroupe (domaine, niveau, faculté, groupe d'intérêts). Chaque appel
+à /ai/generate-three enregistre la demande de son profil; un producteur en
+arrière-plan maintient un stock de sujets pour les profils les plus populaires
+en lançant des générations de basse priorité (seulement quand la file LLM est
+calme et le circuit fermé). Une demande proche d'un profil en stock est servie
+directement depuis le pool.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.metrics import metrics
+from app.semantic_cache import STOPWORDS, normalize_text
+
+load_dotenv()
+
+SUBJECT_POOL_ENABLED = os.getenv("SUBJECT_POOL_ENABLED", "true").lower() == "true"
+SUBJECT_POOL_MAX_PROFILES = int(os.getenv("SUBJECT_POOL_MAX_PROFILES", "20"))
+SUBJECT_POOL_TARGET_SIZE = int(os.getenv("SUBJECT_POOL_TARGET_SIZE", "9"))
+SUBJECT_POOL_MIN_DEMAND = float(os.getenv("SUBJECT_POOL_MIN_DEMAND", "3"))
+SUBJECT_POOL_MATCH_THRESHOLD = float(os.getenv("SUBJECT_POOL_MATCH_THRESHOLD", "0.5"))
+SUBJECT_POOL_ENTRY_TTL = int(os.getenv("SUBJECT_POOL_ENTRY_TTL", str(6 * 3600)))
+SUBJECT_POOL_REFILL_INTERVAL = float(os.getenv("SUBJECT_POOL_REFILL_INTERVAL", "30"))
+# Demi-vie de la popularité d'un profil (les anciennes demandes comptent moins)
+SUBJECT_POOL_DEMAND_HALF_LIFE = float(os.getenv("SUBJECT_POOL_DEMAND_HALF_LIFE", str(24 * 3600)))
+
+ProfileKey = Tuple[str, str, str, FrozenSet[str]]
+
+
+def interest_tokens(interests: Any) -> FrozenSet[str]:
+    """Groupe d'intérêts normalisé (mots pleins sans accents)"""
+    if isinstance(interests, (list, tuple)):
+        interests = " ".join(str(i) for i in interests)
+    words = normalize_text(interests or "").split()
+    return frozenset(w for w in words if w not in STOPWORDS and len(w) > 2)
+
+
+def profile_key(params: Dict[str, Any]) -> ProfileKey:
+    return (
+        normalize_text(params.get("domaine") or ""),
+        normalize_text(params.get("niveau") or ""),
+        normalize_text(params.get("faculté") or ""),
+        interest_tokens(params.get("interests")),
+    )
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class _Profile:
+    def __init__(self, key: ProfileKey, params: Dict[str, Any]):
+        self.key = key
+        self.params = dict(params)
+        self.demand = 0.0
+        self.demand_at = time.time()
+        self.subjects: List[Dict[str, Any]] = []  # chaque entrée: {"subject": ..., "expires_at": ...}
+
+    def add_demand(self, now: float):
+        decay = 0.5 ** ((now - self.demand_at) / SUBJECT_POOL_DEMAND_HALF_LIFE)
+        self.demand = self.demand * decay + 1
+        self.demand_at = now
+
+    def current_demand(self, now: float) -> float:
+        return self.demand * 0.5 ** ((now - self.demand_at) / SUBJECT_POOL_DEMAND_HALF_LIFE)
+
+    def purge_expired(self, now: float):
+        self.subjects = [s for s in self.subjects if s["expires_at"] > now]
+
+
+class SubjectPool:
+    def __init__(self):
+        self._profiles: Dict[ProfileKey, _Profile] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- côté requête ----------
+
+    def record_demand(self, params: Dict[str, Any]):
+        key = profile_key(params)
+        now = time.time()
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is None:
+                profile = self._profiles[key] = _Profile(key, params)
+            profile.add_demand(now)
+
+    def draw(self, params: Dict[str, Any], count: int) -> Optional[List[Dict[str, Any]]]:
+        """Prélève count sujets du pool le plus proche, ou None s'il n'y en a pas assez"""
+        if not SUBJECT_POOL_ENABLED:
+            return None
+        domaine, niveau, faculté, interests = profile_key(params)
+        now = time.time()
+
+        with self._lock:
+            best, best_score = None, SUBJECT_POOL_MATCH_THRESHOLD
+            for profile in self._profiles.values():
+                if profile.key[:3] != (domaine, niveau, faculté):
+                    continue
+                profile.purge_expired(now)
+                if len(profile.subjects) < count:
+                    continue
+                score = _jaccard(profile.key[3], interests)
+                if score >= best_score:
+                    best, best_score = profile, score
+            if best is None:
+                metrics.inc("subject_pool_misses_total")
+                return None
+            drawn = [entry["subject"] for entry in best.subjects[:count]]
+            best.subjects = best.subjects[count:]
+
+        metrics.inc("subject_pool_hits_total")
+        return [dict(subject) for subject in drawn]
+
+    # ---------- producteur ----------
+
+    def popular_profiles(self) -> List[_Profile]:
+        now = time.time()
+        with self._lock:
+            ranked = sorted(self._profiles.values(), key=lambda p: -p.current_demand(now))
+            # Oublier les profils trop anciens pour borner la mémoire
+            for profile in ranked[SUBJECT_POOL_MAX_PROFILES * 5:]:
+                del self._profiles[profile.key]
+            return [
+                p for p in ranked[:SUBJECT_POOL_MAX_PROFILES]
+                if round(p.current_demand(now), 3) >= SUBJECT_POOL_MIN_DEMAND
+            ]
+
+    def refill_once(self) -> int:
+        """Complète les pools des profils populaires; retourne le nombre de sujets ajoutés"""
+        from app.llm_service import LLM_MAX_CONCURRENCY, get_queue_depth, générer_sujets_llm, llm_circuit
+        from app.circuit_breaker import CLOSED
+
+        added = 0
+        for profile in self.popular_profiles():
+            if self._stop.is_set():
+                break
+            # Basse priorité: ne jamais concurrencer le trafic interactif
+            if get_queue_depth() >= max(LLM_MAX_CONCURRENCY // 2, 1) or llm_circuit.state != CLOSED:
+                break
+
+            with self._lock:
+                profile.purge_expired(time.time())
+                missing = SUBJECT_POOL_TARGET_SIZE - len(profile.subjects)
+            if missing <= 0:
+                continue
+
+            subjects = générer_sujets_llm(profile.params, min(missing, 3), fallback_to_default=False)
+            expires_at = time.time() + SUBJECT_POOL_ENTRY_TTL
+            with self._lock:
+                profile.subjects.extend({"subject": s, "expires_at": expires_at} for s in subjects)
+            added += len(subjects)
+
+        metrics.inc("subject_pool_generated_total", added)
+        return added
+
+    def _run(self):
+        while not self._stop.wait(SUBJECT_POOL_REFILL_INTERVAL):
+            try:
+                self.refill_once()
+            except Exception as e:
+                print(f"⚠️ Erreur remplissage des pools de sujets: {e}")
+
+    def start(self):
+        if not SUBJECT_POOL_ENABLED or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="subject-pool", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            return {
+                "enabled": SUBJECT_POOL_ENABLED,
+                "profiles": len(self._profiles),
+                "stocked_profiles": sum(1 for p in self._profiles.values() if p.subjects),
+                "stocked_subjects": sum(len(p.subjects) for p in self._profiles.values()),
+                "top": [
+                    {
+                        "domaine": p.params.get("domaine"),
+                        "niveau": p.params.get("niveau"),
+                        "interests": sorted(p.key[3])[:5],
+                        "demand": round(p.current_demand(now), 2),
+                        "stock": len(p.subjects),
+                    }
+                    for p in sorted(self._profiles.values(), key=lambda p: -p.current_demand(now))[:5]
+                ],
+            }
+
+
+# Instance globale
+subject_pool = SubjectPool()
+metrics.register_collector("subject_pool", subject_pool.stats)
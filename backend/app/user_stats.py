@@ -0,0 +1,112 @@
+# app/user_stats.py
+"""
+Statistiques utilisateur (tableau de bord et /users/{id}/stats) en une requête.
+
+Une seule requête agrégée renvoie tous les compteurs d'un utilisateur:
+compteurs de feedbacks par COUNT(*) FILTER (WHERE ...), jours actifs, dernière
+activité, plus des sous-requêtes scalaires pour les sujets et la complétion du
+profil. Le résultat est gardé en mémoire comme instantané par utilisateur
+(USER_STATS_TTL secondes), invalidé par create_feedback, la mise à jour du
+profil et la création de sujets par l'utilisateur. Mots-clés populaires et
+statistiques par domaine sont des données globales servies par leurs propres
+caches: ouvrir le tableau de bord coûte au plus une requête.
+
+L'invalidation est locale au worker; entre workers l'instantané reste
+borné par USER_STATS_TTL.
+"""
+import os
+from datetime import datetime
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+from sqlalchemy import case, func, select
+
+from app.cache import TTLCache
+from app.metrics import metrics
+from app.models import Feedback, Sujet, UserProfile
+
+load_dotenv()
+
+USER_STATS_TTL = float(os.getenv("USER_STATS_TTL", "60"))
+USER_STATS_MAX_ENTRIES = int(os.getenv("USER_STATS_MAX_ENTRIES", "10000"))
+# Les mots-clés populaires sont communs à tous les tableaux de bord
+POPULAR_KEYWORDS_TTL = float(os.getenv("POPULAR_KEYWORDS_TTL", "30"))
+
+PROFILE_FIELDS = (
+    "bio", "location", "university", "field", "level",
+    "interests", "phone", "website", "linkedin", "github",
+)
+
+user_snapshots = TTLCache(ttl=USER_STATS_TTL, max_entries=USER_STATS_MAX_ENTRIES)
+popular_keywords_cache = TTLCache(ttl=POPULAR_KEYWORDS_TTL, max_entries=10)
+
+
+def user_stats_statement(user_id: int):
+    """Tous les compteurs d'un utilisateur en une seule requête"""
+    filled = sum(
+        case((func.length(func.trim(getattr(UserProfile, name))) > 0, 1), else_=0)
+        for name in PROFILE_FIELDS
+    )
+    return select(
+        select(func.count(Sujet.id)).where(Sujet.is_active == True).scalar_subquery().label("total_sujets"),
+        select(func.count(Sujet.id)).where(Sujet.user_id == user_id).scalar_subquery().label("user_sujets"),
+        select(filled).where(UserProfile.user_id == user_id).scalar_subquery().label("profile_filled"),
+        func.count(Feedback.id).label("feedbacks"),
+        func.count(Feedback.id).filter(Feedback.intéressé == True).label("interested"),
+        func.count(Feedback.id).filter(Feedback.pertinence.isnot(None)).label("explored"),
+        func.count(func.distinct(func.date(Feedback.created_at))).label("active_days"),
+        func.max(Feedback.created_at).label("last_feedback_at"),
+    ).where(Feedback.user_id == user_id)
+
+
+def _snapshot(row) -> Dict[str, Any]:
+    snapshot = dict(row._mapping)
+    snapshot["profile_completion"] = int((snapshot.pop("profile_filled") or 0) * 100 / len(PROFILE_FIELDS))
+    return snapshot
+
+
+def load_snapshot(db, user_id: int) -> Dict[str, Any]:
+    snapshot = user_snapshots.get(user_id)
+    if snapshot is None:
+        metrics.inc("user_stats_queries_total")
+        snapshot = _snapshot(db.execute(user_stats_statement(user_id)).one())
+        user_snapshots.set(user_id, snapshot)
+    return snapshot
+
+
+async def load_snapshot_async(db, user_id: int) -> Dict[str, Any]:
+    snapshot = user_snapshots.get(user_id)
+    if snapshot is None:
+        metrics.inc("user_stats_queries_total")
+        snapshot = _snapshot((await db.execute(user_stats_statement(user_id))).one())
+        user_snapshots.set(user_id, snapshot)
+    return snapshot
+
+
+def invalidate_user(user_id: int):
+    user_snapshots.delete(user_id)
+
+
+def user_stats_from(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "profile_completion": snapshot["profile_completion"],
+        "explored_subjects": snapshot["explored"],
+        "recommendations_count": snapshot["interested"],
+        "active_days": snapshot["active_days"],
+        "last_active": snapshot["last_feedback_at"] or datetime.utcnow(),
+    }
+
+
+def dashboard_from(snapshot: Dict[str, Any], popular_keywords, domain_stats) -> Dict[str, Any]:
+    return {
+        "total_sujets": snapshot["total_sujets"],
+        "user_sujets": snapshot["user_sujets"],
+        "saved_sujets": snapshot["interested"],
+        "recommendations_count": snapshot["feedbacks"],
+        "last_activity": snapshot["last_feedback_at"],
+        "popular_keywords": popular_keywords,
+        "domain_stats": domain_stats,
+    }
+
+
+metrics.register_collector("user_stats_cache", user_snapshots.stats)
@@ -0,0 +1,459 @@
+# backend/audit_query_plans.py
+"""
+Audit des plans d'exécution des requêtes chaudes de app/crud.py.
+
+Le script crée un schéma PostgreSQL jetable (plan_audit), y insère un jeu de
+données synthétique volumineux (utilisateurs, sujets, mots-clés, feedbacks,
+historique, messages de chat), puis appelle les fonctions de lecture de crud
+telles quelles: chaque SELECT qu'elles émettent est capturé avec ses
+paramètres et rejoué sous EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON).
+
+Sont signalés: les Seq Scan sur une table d'au moins --seq-scan-rows lignes
+et les requêtes plus lentes que --slow-ms. Un instantané JSON des plans (forme
+du plan, index utilisés, temps, tampons) peut être écrit (--snapshot) puis
+comparé à une exécution ultérieure (--compare): un nouveau Seq Scan, un index
+qui n'est plus utilisé ou un ralentissement au-delà de --max-slowdown sont des
+régressions (code de sortie 1). La base de l'application n'est pas touchée.
+
+Exemples:
+    python audit_query_plans.py                                  # 5 000 utilisateurs, 100 000 sujets
+    python audit_query_plans.py --snapshot query_plans.json      # instantané de référence
+    python audit_query_plans.py --compare query_plans.json       # régressions par rapport à la référence
+    python audit_query_plans.py --drop-index ix_feedbacks_user_created --verbose
+    python audit_query_plans.py --users 500 --sujets 10000 --keep --strict
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy as sa
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+load_dotenv()
+
+from app import crud
+from app.database import Base, engine
+from app.keyword_stats import split_keywords
+from app.keywords import keyword_facets
+from app.models import (
+    ConversationMessage, Feedback, Keyword, KeywordStat, Sujet, SujetKeyword,
+    User, UserHistory, UserProfile, UserSkill,
+)
+from app.projection import SUJET_PROJECTIONS
+from app.search import TRGM_INDEXES
+from app.user_stats import user_stats_statement
+from benchmark_keyword_search import DOMAINES, NIVEAUX, VOCABULAIRE, fake_sujet
+
+SCHEMA = "plan_audit"
+CHUNK_SIZE = 5000
+
+# Objets créés par les migrations mais absents des modèles (recherche plein texte et trigrammes)
+SCHEMA_EXTRAS = [
+    f"""
+    ALTER TABLE {SCHEMA}.sujets ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('french', coalesce(titre, '')), 'A') ||
+        setweight(to_tsvector('french', coalesce(keywords, '')), 'B') ||
+        setweight(to_tsvector('french', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    f"CREATE INDEX IF NOT EXISTS ix_sujets_search_vector ON {SCHEMA}.sujets USING gin (search_vector)",
+] + [
+    f"CREATE INDEX IF NOT EXISTS {name} ON {SCHEMA}.sujets USING gin ({expression})"
+    for name, expression in TRGM_INDEXES.items()
+]
+
+ACTIONS = ["viewed_subject", "liked_subject", "generated_subjects", "chose_ai_subject"]
+SKILLS = ["Python", "SQL", "AutoCAD", "MATLAB", "R", "Excel", "Java", "SIG", "Statistiques", "Rédaction"]
+
+
+# ---------- jeu de données ----------
+
+def _insert(conn, model, rows, total: int, label: str):
+    table = model.__table__
+    chunk, done = [], 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            conn.execute(sa.insert(table), chunk)
+            done += len(chunk)
+            chunk = []
+            print(f"  … {done} / {total} {label}")
+    if chunk:
+        conn.execute(sa.insert(table), chunk)
+        print(f"  … {total} / {total} {label}")
+
+
+def _past(rng: random.Random, now: datetime, days: int = 365) -> datetime:
+    return now - timedelta(minutes=rng.randint(0, days * 24 * 60))
+
+
+def populate(conn, users: int, sujets: int, per_user: int, seed: int):
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+
+    _insert(conn, User, (
+        {"email": f"audit{i}@example.org", "full_name": f"Étudiant {i}", "hashed_password": "-", "role": "etudiant"}
+        for i in range(1, users + 1)
+    ), users, "utilisateurs")
+    _insert(conn, UserProfile, (
+        {"user_id": i, "field": rng.choice(DOMAINES), "level": rng.choice(NIVEAUX)} for i in range(1, users + 1)
+    ), users, "profils")
+
+    # Identifiants séquentiels: le schéma vient d'être créé
+    def sujet_rows():
+        for _ in range(sujets):
+            row = fake_sujet(rng)
+            row["is_active"] = rng.random() < 0.9
+            row["user_id"] = rng.randint(1, users) if rng.random() < 0.1 else None
+            yield row
+    _insert(conn, Sujet, sujet_rows(), sujets, "sujets")
+
+    keyword_ids = {name: i for i, name in enumerate(sorted(VOCABULAIRE), 1)}
+    conn.execute(sa.insert(Keyword.__table__), [{"id": i, "name": name} for name, i in keyword_ids.items()])
+    counts = {name: 0 for name in keyword_ids}
+
+    def link_rows():
+        rows = conn.execute(sa.select(Sujet.id, Sujet.keywords, Sujet.is_active).order_by(Sujet.id))
+        for sujet_id, keywords, is_active in rows:
+            for position, name in enumerate(split_keywords(keywords)):
+                if is_active:
+                    counts[name] += 1
+                yield {"sujet_id": sujet_id, "keyword_id": keyword_ids[name], "position": position}
+    links = list(link_rows())
+    _insert(conn, SujetKeyword, links, len(links), "liens sujet-mot-clé")
+    conn.execute(sa.insert(KeywordStat.__table__), [{"keyword": k, "count": c} for k, c in counts.items()])
+
+    total = users * per_user
+    _insert(conn, Feedback, (
+        {
+            "user_id": rng.randint(1, users), "sujet_id": rng.randint(1, sujets),
+            "rating": rng.randint(1, 5), "pertinence": rng.choice([None, 1, 2, 3, 4, 5]),
+            "intéressé": rng.random() < 0.3, "sélectionné": rng.random() < 0.05,
+            "created_at": _past(rng, now),
+        }
+        for _ in range(total)
+    ), total, "feedbacks")
+    _insert(conn, UserHistory, (
+        {
+            "user_id": rng.randint(1, users), "action": rng.choice(ACTIONS),
+            "sujet_id": rng.randint(1, sujets), "created_at": _past(rng, now),
+        }
+        for _ in range(total)
+    ), total, "entrées d'historique")
+    _insert(conn, ConversationMessage, (
+        {
+            "user_id": rng.randint(1, users), "role": rng.choice(["user", "assistant"]),
+            "content": " ".join(rng.sample(VOCABULAIRE, 8)), "timestamp": _past(rng, now, days=180),
+        }
+        for _ in range(total * 2)
+    ), total * 2, "messages de chat")
+    _insert(conn, UserSkill, (
+        {"user_id": i, "name": name, "level": rng.choice(["débutant", "intermédiaire", "avancé"])}
+        for i in range(1, users + 1) for name in rng.sample(SKILLS, 5)
+    ), users * 5, "compétences")
+
+
+def prepare_schema(conn, args):
+    conn.execute(sa.text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}"))
+    # La connexion qualifie déjà les tables des modèles (schema_translate_map): création,
+    # index et comptage visent le schéma d'audit même si public contient les tables de l'application.
+    # Le search_path ne sert qu'au SQL textuel de l'application (inspection de search.py, pg_trgm).
+    conn.execute(sa.text(f"SET search_path TO {SCHEMA}, public"))
+    Base.metadata.create_all(bind=conn)
+    # Schéma conservé (--keep): les index des modèles ajoutés depuis sont créés
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+    conn.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pg_trgm SCHEMA public"))
+    for ddl in SCHEMA_EXTRAS:
+        conn.execute(sa.text(ddl))
+
+    if conn.execute(sa.select(sa.func.count()).select_from(User.__table__)).scalar():
+        print(f"♻️ Données existantes du schéma {SCHEMA} réutilisées")
+    else:
+        print(f"🏗️ Préparation du schéma {SCHEMA}: {args.users} utilisateurs, {args.sujets} sujets")
+        populate(conn, args.users, args.sujets, args.per_user, args.seed)
+
+    for name in args.drop_index:
+        conn.execute(sa.text(f"DROP INDEX IF EXISTS {SCHEMA}.{name}"))
+        print(f"🗑️ Index {name} supprimé pour l'audit")
+    for table in Base.metadata.sorted_tables:
+        conn.execute(sa.text(f"ANALYZE {SCHEMA}.{table.name}"))
+
+
+def table_sizes(conn) -> dict:
+    return dict(conn.execute(sa.text(
+        "SELECT c.relname, c.reltuples::bigint FROM pg_class c "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = :schema AND c.relkind = 'r'"
+    ), {"schema": SCHEMA}).all())
+
+
+# ---------- requêtes chaudes ----------
+
+def build_context(db: Session, rng: random.Random) -> dict:
+    """Valeurs réalistes pour les paramètres (utilisateur actif, sujet existant, curseur de page 2)"""
+    user_id = db.execute(
+        sa.select(Feedback.user_id).group_by(Feedback.user_id).order_by(sa.func.count().desc()).limit(1)
+    ).scalar()
+    return {
+        "user_id": user_id,
+        "email": db.execute(sa.select(User.email).where(User.id == user_id)).scalar(),
+        "sujet_id": db.execute(sa.select(Feedback.sujet_id).where(Feedback.user_id == user_id).limit(1)).scalar(),
+        "domaine": rng.choice(DOMAINES),
+        "niveau": rng.choice(NIVEAUX),
+        "keywords": rng.sample(VOCABULAIRE, 2),
+        "cursor": crud.get_sujets(db, limit=20).next_cursor,
+    }
+
+
+def hot_queries(ctx: dict):
+    """(nom, appel) des lectures de app/crud.py sur les chemins chauds de l'API"""
+    return [
+        ("get_sujets", lambda db: crud.get_sujets(db, limit=20)),
+        ("get_sujets (page suivante)", lambda db: crud.get_sujets(db, limit=20, cursor=ctx["cursor"])),
+        ("get_sujets (projection card)", lambda db: crud.get_sujets(db, limit=20, fields=SUJET_PROJECTIONS["card"])),
+        ("get_sujets (domaine, niveau)", lambda db: crud.get_sujets(db, limit=20, domaine=ctx["domaine"], niveau=ctx["niveau"])),
+        ("get_sujets (mots-clés)", lambda db: crud.get_sujets(db, limit=20, keywords=ctx["keywords"])),
+        ("get_sujets (recherche)", lambda db: crud.get_sujets(db, limit=20, search=" ".join(ctx["keywords"]))),
+        ("get_sujet", lambda db: crud.get_sujet(db, ctx["sujet_id"])),
+        ("get_popular_sujets", lambda db: crud.get_popular_sujets(db, limit=10)),
+        ("search_sujets_by_keywords", lambda db: crud.search_sujets_by_keywords(db, ctx["keywords"], limit=10)),
+        ("keyword_facets", lambda db: keyword_facets(db, limit=20, domaine=ctx["domaine"])),
+        ("get_popular_keywords", lambda db: crud.get_popular_keywords(db, limit=20)),
+        ("get_user_by_email", lambda db: crud.get_user_by_email(db, ctx["email"])),
+        ("get_users", lambda db: crud.get_users(db, limit=50)),
+        ("get_user_feedbacks", lambda db: crud.get_user_feedbacks(db, ctx["user_id"], limit=20)),
+        ("get_sujet_feedbacks", lambda db: crud.get_sujet_feedbacks(db, ctx["sujet_id"], limit=20)),
+        ("get_saved_sujets", lambda db: crud.get_saved_sujets(db, ctx["user_id"])),
+        ("get_user_profile", lambda db: crud.get_user_profile(db, ctx["user_id"])),
+        ("get_user_skills", lambda db: crud.get_user_skills(db, ctx["user_id"])),
+        ("get_user_settings", lambda db: crud.get_user_settings(db, ctx["user_id"])),
+        ("get_conversation_history", lambda db: crud.get_conversation_history(db, ctx["user_id"], limit=10)),
+        # get_user_stats / get_dashboard_stats passent par un cache: la requête sous-jacente directement
+        ("user_stats", lambda db: db.execute(user_stats_statement(ctx["user_id"])).one()),
+    ]
+
+
+class StatementCapture:
+    """Garde les SELECT émis sur la connexion (texte et paramètres du pilote) pendant un appel"""
+
+    def __init__(self, conn):
+        self.statements = []
+        self.active = False
+        event.listen(conn, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            self.statements.append((statement, parameters))
+
+    def run(self, call):
+        self.statements, self.active = [], True
+        try:
+            call()
+        finally:
+            self.active = False
+        return self.statements
+
+
+# ---------- plans ----------
+
+def _walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def _describe(node) -> str:
+    label = node["Node Type"]
+    if "Relation Name" in node:
+        label += f" on {node['Relation Name']}"
+    if "Index Name" in node:
+        label += f" using {node['Index Name']}"
+    return label
+
+
+def explain(conn, statement: str, parameters, runs: int) -> dict:
+    """Plan (dernière exécution) et temps médians sur runs exécutions"""
+    results = []
+    for _ in range(runs):
+        output = conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters).scalar()
+        results.append((json.loads(output) if isinstance(output, str) else output)[0])
+    plan = results[-1]["Plan"]
+    nodes = list(_walk(plan))
+    return {
+        "sql": " ".join(statement.split()),
+        "shape": [_describe(node) for node in nodes],
+        "seq_scans": sorted({node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"}),
+        "indexes": sorted({node["Index Name"] for node in nodes if "Index Name" in node}),
+        "execution_ms": round(statistics.median(r["Execution Time"] for r in results), 3),
+        "planning_ms": round(statistics.median(r["Planning Time"] for r in results), 3),
+        "shared_hit": plan.get("Shared Hit Blocks", 0),
+        "shared_read": plan.get("Shared Read Blocks", 0),
+        "rows": plan.get("Actual Rows", 0),
+    }
+
+
+def audit(db: Session, conn, ctx: dict, runs: int) -> dict:
+    capture = StatementCapture(conn)
+    plans = {}
+    for name, call in hot_queries(ctx):
+        # Passe de chauffe: caches de capacités (search.py), pages en mémoire
+        call(db)
+        statements = capture.run(lambda: call(db))
+        for i, (statement, parameters) in enumerate(statements, 1):
+            key = name if len(statements) == 1 else f"{name} #{i}"
+            plans[key] = explain(conn, statement, parameters, runs)
+        db.rollback()
+    return plans
+
+
+def findings(plans: dict, sizes: dict, seq_scan_rows: int, slow_ms: float):
+    found = []
+    for name, entry in plans.items():
+        for relation in entry["seq_scans"]:
+            if sizes.get(relation, 0) >= seq_scan_rows:
+                found.append((name, f"Seq Scan sur {relation} ({sizes[relation]} lignes)"))
+        if entry["execution_ms"] > slow_ms:
+            found.append((name, f"lente: {entry['execution_ms']:.1f}ms (seuil {slow_ms:.0f}ms)"))
+    return found
+
+
+def compare(plans: dict, baseline: dict, max_slowdown: float, min_delta_ms: float):
+    """(régressions, changements notables) par rapport à un instantané"""
+    regressions, notes = [], []
+    for name, entry in plans.items():
+        base = baseline.get(name)
+        if base is None:
+            notes.append((name, "nouvelle requête (absente de l'instantané)"))
+            continue
+        for relation in sorted(set(entry["seq_scans"]) - set(base["seq_scans"])):
+            regressions.append((name, f"nouveau Seq Scan sur {relation}"))
+        for index in sorted(set(base["indexes"]) - set(entry["indexes"])):
+            regressions.append((name, f"index {index} plus utilisé"))
+        slower = entry["execution_ms"] - base["execution_ms"]
+        if entry["execution_ms"] > base["execution_ms"] * max_slowdown and slower > min_delta_ms:
+            regressions.append((name, f"{base['execution_ms']:.1f}ms -> {entry['execution_ms']:.1f}ms"))
+        if entry["sql"] != base["sql"]:
+            notes.append((name, "texte SQL modifié"))
+        elif entry["shape"] != base["shape"]:
+            notes.append((name, "plan modifié: " + " > ".join(entry["shape"])))
+    for name in sorted(set(baseline) - set(plans)):
+        notes.append((name, "requête disparue"))
+    return regressions, notes
+
+
+def print_report(plans: dict, flagged: dict, verbose: bool):
+    print(f"\n{'requête':<40}{'exec':>10}{'plan':>9}{'hit':>8}{'read':>7}  accès")
+    for name, entry in plans.items():
+        access = ", ".join(entry["indexes"] + [f"Seq Scan {r}" for r in entry["seq_scans"]]) or "-"
+        print(
+            f"{'⚠️ ' if name in flagged else ''}{name:<40}{entry['execution_ms']:>8.2f}ms{entry['planning_ms']:>7.2f}ms"
+            f"{entry['shared_hit']:>8}{entry['shared_read']:>7}  {access}"
+        )
+        if verbose:
+            for label in entry["shape"]:
+                print(f"      {label}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit des plans d'exécution des requêtes de crud")
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--sujets", type=int, default=100_000)
+    parser.add_argument("--per-user", type=int, default=20, help="Feedbacks et entrées d'historique par utilisateur (moyenne)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--runs", type=int, default=3, help="Exécutions par requête (temps médian)")
+    parser.add_argument("--slow-ms", type=float, default=50.0, help="Seuil d'une requête lente")
+    parser.add_argument("--seq-scan-rows", type=int, default=10_000, help="Taille de table à partir de laquelle un Seq Scan est signalé")
+    parser.add_argument("--snapshot", default=None, help="Écrire l'instantané des plans dans ce fichier JSON")
+    parser.add_argument("--compare", default=None, help="Comparer à un instantané précédent")
+    parser.add_argument("--max-slowdown", type=float, default=2.0, help="Ralentissement (facteur) compté comme régression")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="Écart minimal (ms) d'un ralentissement signalé")
+    parser.add_argument("--drop-index", action="append", default=[], help="Supprimer cet index avant l'audit (répétable)")
+    parser.add_argument("--strict", action="store_true", help="Code de sortie 1 aussi pour les Seq Scan et requêtes lentes")
+    parser.add_argument("--verbose", action="store_true", help="Afficher la forme de chaque plan")
+    parser.add_argument("--keep", action="store_true", help="Conserver le schéma d'audit (réutilisé au prochain lancement)")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("❌ Cet audit nécessite PostgreSQL (DATABASE_URL)")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    failed = False
+    with engine.connect() as conn:
+        # Toutes les tables des modèles (DDL, insertions, requêtes de crud) rendues en plan_audit.<table>
+        conn.execution_options(schema_translate_map={None: SCHEMA})
+        try:
+            with conn.begin():
+                prepare_schema(conn, args)
+            sizes = table_sizes(conn)
+
+            db = Session(bind=conn)
+            ctx = build_context(db, random.Random(args.seed))
+            db.rollback()
+            print(f"\n🔬 Audit de {len(hot_queries(ctx))} lectures de crud (utilisateur {ctx['user_id']}, {args.runs} exécutions)")
+            plans = audit(db, conn, ctx, args.runs)
+            db.close()
+
+            flagged = findings(plans, sizes, args.seq_scan_rows, args.slow_ms)
+            print_report(plans, {name for name, _ in flagged}, args.verbose)
+            if flagged:
+                print(f"\n⚠️ {len(flagged)} point(s) à examiner:")
+                for name, message in flagged:
+                    print(f"  - {name}: {message}")
+                failed = args.strict
+            else:
+                print("\n✅ Aucun Seq Scan sur une grande table ni requête lente")
+
+            if baseline:
+                dataset = {"users": args.users, "sujets": args.sujets, "per_user": args.per_user}
+                if baseline.get("dataset") != dataset:
+                    print(f"\n⚠️ Jeu de données différent de l'instantané: {baseline.get('dataset')}")
+                regressions, notes = compare(plans, baseline["queries"], args.max_slowdown, args.min_delta_ms)
+                for name, message in notes:
+                    print(f"  ℹ️ {name}: {message}")
+                if regressions:
+                    print(f"\n❌ {len(regressions)} régression(s) par rapport à {args.compare}:")
+                    for name, message in regressions:
+                        print(f"  - {name}: {message}")
+                    failed = True
+                else:
+                    print(f"\n✅ Aucune régression par rapport à {args.compare}")
+
+            if args.snapshot:
+                snapshot = {
+                    "generated_at": datetime.now(timezone.utc).isoformat(),
+                    "server_version": conn.exec_driver_sql("SHOW server_version").scalar(),
+                    "dataset": {"users": args.users, "sujets": args.sujets, "per_user": args.per_user},
+                    "dropped_indexes": args.drop_index,
+                    "queries": plans,
+                }
+                with open(args.snapshot, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f, ensure_ascii=False, indent=2)
+                print(f"\n💾 Instantané écrit dans {args.snapshot}")
+        except Exception as e:
+            print(f"❌ Erreur: {e}")
+            failed = True
+        finally:
+            if not args.keep:
+                conn.rollback()
+                with conn.begin():
+                    conn.execute(sa.text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+                print(f"\n🧹 Schéma {SCHEMA} supprimé")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# backend/backfill_sujet_keywords.py
+"""
+Remplit (ou reconstruit) la table sujet_keywords depuis sujets.keywords.
+
+Traitement par lots d'id croissants, un commit par lot: peut être relancé
+sans risque, chaque lot remplace les liaisons de ses sujets.
+
+Exemples:
+    python backfill_sujet_keywords.py
+    python backfill_sujet_keywords.py --batch-size 2000
+"""
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+load_dotenv()
+
+from app.database import SessionLocal
+from app.keywords import BACKFILL_BATCH_SIZE, backfill_sujet_keywords
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remplissage de sujet_keywords")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        count = backfill_sujet_keywords(db, args.batch_size)
+        print(f"✅ {count} sujets indexés dans sujet_keywords")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erreur: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
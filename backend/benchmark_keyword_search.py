@@ -0,0 +1,163 @@
+# backend/benchmark_keyword_search.py
+"""
+Benchmark de search_sujets_by_keywords: ancien LIKE '%kw%' vs trigrammes (pg_trgm).
+
+Le script crée un schéma PostgreSQL jetable (bench_search), y insère N sujets
+synthétiques, crée les mêmes index trigrammes que la migration, puis mesure
+les deux requêtes et affiche leurs plans (EXPLAIN ANALYZE).
+La table sujets de l'application n'est pas touchée.
+
+Exemples:
+    python benchmark_keyword_search.py                     # 100 000 sujets
+    python benchmark_keyword_search.py --rows 20000 --runs 20 --keep
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import sqlalchemy as sa
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+load_dotenv()
+
+from app.database import Base, engine
+from app.models import Sujet
+from app.search import TRGM_INDEXES, keyword_search, keyword_search_query, normalize_keywords
+
+SCHEMA = "bench_search"
+CHUNK_SIZE = 5000
+
+VOCABULAIRE = [
+    "béton", "pont", "structure", "optimisation", "écologie", "réseau", "énergie", "solaire",
+    "hydraulique", "sol", "fondation", "sismique", "route", "trafic", "eau", "assainissement",
+    "intelligence artificielle", "apprentissage", "données", "santé", "diagnostic", "agriculture",
+    "climat", "simulation", "capteur", "drone", "matériaux", "recyclage", "bois", "acier",
+]
+DOMAINES = ["Génie Civil", "Informatique", "Médecine", "Agronomie", "Économie"]
+NIVEAUX = ["L3", "M1", "M2"]
+REQUETES = [["béton", "pont"], ["intelligence artificielle"], ["eau", "assainissement", "réseau"], ["drone"]]
+
+
+def fake_sujet(rng: random.Random) -> dict:
+    mots = rng.sample(VOCABULAIRE, 4)
+    return {
+        "titre": f"Étude de {mots[0]} et {mots[1]} appliquée à {mots[2]}",
+        "keywords": ", ".join(mots),
+        "domaine": rng.choice(DOMAINES),
+        "faculté": rng.choice(DOMAINES),
+        "niveau": rng.choice(NIVEAUX),
+        "problématique": f"Comment améliorer {mots[0]} grâce à {mots[3]} ?",
+        "description": " ".join(rng.choice(VOCABULAIRE) for _ in range(40)),
+        "difficulté": "moyenne",
+        "vue_count": rng.randint(0, 500),
+        "like_count": rng.randint(0, 50),
+        "is_active": True,
+        "is_generated": False,
+    }
+
+
+def populate(conn, rows: int, seed: int):
+    rng = random.Random(seed)
+    Base.metadata.create_all(bind=conn)
+    existing = conn.execute(sa.select(sa.func.count()).select_from(Sujet.__table__)).scalar()
+    for start in range(existing, rows, CHUNK_SIZE):
+        conn.execute(sa.insert(Sujet.__table__), [fake_sujet(rng) for _ in range(min(CHUNK_SIZE, rows - start))])
+        print(f"  … {min(start + CHUNK_SIZE, rows)} / {rows} sujets")
+    conn.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pg_trgm SCHEMA public"))
+    for name, expression in TRGM_INDEXES.items():
+        conn.execute(sa.text(f"CREATE INDEX IF NOT EXISTS {name} ON {SCHEMA}.sujets USING gin ({expression})"))
+    conn.execute(sa.text(f"ANALYZE {SCHEMA}.sujets"))
+
+
+def legacy_query(db: Session, keywords, limit: int):
+    """Requête d'origine: LIKE sur trois colonnes pour chaque mot-clé, tri par vues"""
+    conditions = []
+    for keyword in keywords:
+        pattern = f"%{keyword.lower()}%"
+        conditions += [
+            sa.func.lower(Sujet.keywords).like(pattern),
+            sa.func.lower(Sujet.titre).like(pattern),
+            sa.func.lower(Sujet.description).like(pattern),
+        ]
+    return (
+        db.query(Sujet).filter(Sujet.is_active == True).filter(sa.or_(*conditions))
+        .order_by(Sujet.vue_count.desc()).limit(limit)
+    )
+
+
+def timed(fn, runs: int):
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    return durations[len(durations) // 2], durations[int(len(durations) * 0.95) - 1 if runs > 1 else 0]
+
+
+def explain(db: Session, query):
+    compiled = query.statement.compile(
+        db.get_bind(), schema_translate_map={None: SCHEMA}, render_schema_translate=True,
+        compile_kwargs={"literal_binds": True},
+    )
+    plan = db.execute(sa.text(f"EXPLAIN (ANALYZE, BUFFERS) {compiled}")).scalars().all()
+    return "\n".join("    " + line for line in plan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la recherche par mots-clés")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Conserver le schéma de test")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("❌ Ce benchmark nécessite PostgreSQL (DATABASE_URL)")
+
+    with engine.connect() as conn:
+        # Tables des modèles (DDL, insertions, requêtes mesurées) rendues en bench_search.<table>
+        conn.execution_options(schema_translate_map={None: SCHEMA})
+        try:
+            print(f"🏗️ Préparation de {args.rows} sujets dans le schéma {SCHEMA}")
+            with conn.begin():
+                conn.execute(sa.text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}"))
+                # create_all et les insertions visent bench_search via schema_translate_map, même si
+                # public contient déjà les tables de l'application; le search_path ne sert qu'au SQL
+                # textuel (inspection de search.py, pg_trgm)
+                conn.execute(sa.text(f"SET search_path TO {SCHEMA}, public"))
+                populate(conn, args.rows, args.seed)
+
+            db = Session(bind=conn)
+            print(f"\n{'mots-clés':<40}{'LIKE p50':>10}{'LIKE p95':>10}{'trgm p50':>10}{'trgm p95':>10}  résultats")
+            for keywords in REQUETES:
+                like_p50, like_p95 = timed(lambda: legacy_query(db, keywords, args.limit).all(), args.runs)
+                trgm_p50, trgm_p95 = timed(lambda: keyword_search(db, keywords, args.limit), args.runs)
+                found = len(keyword_search(db, keywords, args.limit))
+                print(
+                    f"{', '.join(keywords):<40}{like_p50 * 1000:>9.1f}ms{like_p95 * 1000:>9.1f}ms"
+                    f"{trgm_p50 * 1000:>9.1f}ms{trgm_p95 * 1000:>9.1f}ms  {found}"
+                )
+
+            sample = REQUETES[0]
+            print(f"\n📋 Plan LIKE ({', '.join(sample)}):\n{explain(db, legacy_query(db, sample, args.limit))}")
+            trgm_query = keyword_search_query(db, normalize_keywords(sample), args.limit)
+            print(f"\n📋 Plan trigrammes ({', '.join(sample)}):\n{explain(db, trgm_query)}")
+            top = keyword_search(db, sample, 3)
+            print(f"\n🏆 Meilleurs scores trigrammes: {[(s.titre, score) for s, score in top]}")
+            db.close()
+        finally:
+            if not args.keep:
+                conn.rollback()
+                with conn.begin():
+                    conn.execute(sa.text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+                print(f"\n🧹 Schéma {SCHEMA} supprimé")
+
+
+if __name__ == "__main__":
+    main()
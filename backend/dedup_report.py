@@ -0,0 +1,122 @@
+# backend/dedup_report.py
+"""
+Rapport des quasi-doublons du catalogue de sujets (MinHash + LSH).
+
+Exemples:
+    python dedup_report.py                      # rapport seul
+    python dedup_report.py --backfill           # enregistre aussi les signatures manquantes
+    python dedup_report.py --threshold 0.6 --json rapport.json
+    python dedup_report.py --link               # rattache chaque doublon au sujet le plus ancien du groupe
+"""
+import argparse
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+load_dotenv()
+
+from app.database import SessionLocal
+from app.dedup import DEDUP_THRESHOLD, LSHIndex, compute_signature
+from app.models import Sujet
+
+BATCH_SIZE = 500
+
+
+def load_signatures(db, backfill: bool):
+    """Lit les sujets par lots; calcule (et enregistre si demandé) les signatures manquantes"""
+    rows, missing, last_id = [], 0, 0
+    while True:
+        batch = (
+            db.query(Sujet)
+            .filter(Sujet.id > last_id)
+            .order_by(Sujet.id)
+            .limit(BATCH_SIZE)
+            .all()
+        )
+        if not batch:
+            break
+        for sujet in batch:
+            signature = sujet.minhash_signature
+            if not signature:
+                missing += 1
+                signature = compute_signature(sujet.titre, sujet.problématique, sujet.keywords)
+                if backfill:
+                    sujet.minhash_signature = signature
+            rows.append((sujet.id, signature, sujet.titre, sujet.duplicate_of_id))
+        if backfill:
+            db.commit()
+        last_id = batch[-1].id
+        db.expunge_all()
+    return rows, missing
+
+
+def build_report(rows, threshold: float):
+    index = LSHIndex()
+    index.load((sujet_id, signature) for sujet_id, signature, _, _ in rows)
+    titles = {sujet_id: titre for sujet_id, _, titre, _ in rows}
+
+    groups = []
+    for pairs in index.clusters(threshold):
+        members = sorted({a for a, _, _ in pairs} | {b for _, b, _ in pairs})
+        groups.append({
+            "keep": members[0],
+            "duplicates": members[1:],
+            "max_similarity": round(max(s for _, _, s in pairs), 3),
+            "titres": {str(m): titles[m] for m in members},
+        })
+    return groups
+
+
+def link_duplicates(db, groups):
+    linked = 0
+    for group in groups:
+        linked += (
+            db.query(Sujet)
+            .filter(Sujet.id.in_(group["duplicates"]), Sujet.duplicate_of_id.is_(None))
+            .update({Sujet.duplicate_of_id: group["keep"]}, synchronize_session=False)
+        )
+    db.commit()
+    return linked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rapport des quasi-doublons de sujets")
+    parser.add_argument("--threshold", type=float, default=DEDUP_THRESHOLD, help="Similarité minimale")
+    parser.add_argument("--backfill", action="store_true", help="Enregistrer les signatures manquantes")
+    parser.add_argument("--link", action="store_true", help="Renseigner duplicate_of_id pour les doublons")
+    parser.add_argument("--json", default=None, help="Écrire le rapport dans ce fichier")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        rows, missing = load_signatures(db, args.backfill)
+        print(f"📋 {len(rows)} sujets analysés, {missing} signatures calculées"
+              f"{' et enregistrées' if args.backfill else ''}")
+
+        groups = build_report(rows, args.threshold)
+        duplicates = sum(len(g["duplicates"]) for g in groups)
+        print(f"🧬 {len(groups)} groupes de quasi-doublons, {duplicates} sujets en trop (seuil {args.threshold})")
+        for group in groups[:20]:
+            print(f"\n  ✅ #{group['keep']} {group['titres'][str(group['keep'])]}")
+            for dup in group["duplicates"]:
+                print(f"     ↳ #{dup} {group['titres'][str(dup)]}")
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(groups, f, ensure_ascii=False, indent=2)
+            print(f"\n💾 Rapport écrit dans {args.json}")
+
+        if args.link:
+            print(f"\n🔗 {link_duplicates(db, groups)} sujets rattachés à leur original")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erreur: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
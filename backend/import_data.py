@@ -0,0 +1,73 @@
+# backend/import_data.py
+"""
+Import en masse de sujets ou d'utilisateurs depuis un fichier CSV ou JSONL.
+
+Le fichier est lu en flux et inséré par lots (un commit par lot); les lignes
+invalides, quasi-doublons et emails déjà utilisés sont listés dans le rapport.
+
+Exemples:
+    python import_data.py sujets archive_fsi.jsonl
+    python import_data.py sujets archive.csv --on-duplicate allow --chunk-size 2000
+    python import_data.py users etudiants.csv --dry-run      # validation seule
+    python import_data.py sujets archive.jsonl --report erreurs.json
+    cat archive.jsonl | python import_data.py sujets - --format jsonl
+"""
+import argparse
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+load_dotenv()
+
+from app.bulk_import import IMPORT_CHUNK_SIZE, IMPORTERS, ImportFormatError, detect_format
+from app.database import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import en masse (CSV ou JSONL)")
+    parser.add_argument("kind", choices=sorted(IMPORTERS), help="Type d'enregistrements")
+    parser.add_argument("path", help="Fichier à importer ('-' pour l'entrée standard)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default=None, help="Format, sinon déduit de l'extension")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="Lignes par lot (une transaction par lot)")
+    parser.add_argument("--on-duplicate", choices=["allow", "reject"], default="reject", help="Quasi-doublons de sujets")
+    parser.add_argument("--dry-run", action="store_true", help="Valider sans rien écrire")
+    parser.add_argument("--report", default=None, help="Écrire le rapport complet dans ce fichier JSON")
+    args = parser.parse_args()
+
+    try:
+        fmt = detect_format(None if args.path == "-" else args.path, args.format)
+    except ImportFormatError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+    options = {"chunk_size": args.chunk_size, "dry_run": args.dry_run}
+    if args.kind == "sujets":
+        options["on_duplicate"] = args.on_duplicate
+
+    db = SessionLocal()
+    stream = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    try:
+        report = IMPORTERS[args.kind](db, stream, fmt, **options).to_dict()
+        print(f"📥 {report['rows']} lignes lues en {report['seconds']}s: "
+              f"{report['inserted']} insérées, {report['skipped']} écartées, {report['error_count']} erreurs"
+              f"{' (validation seule)' if args.dry_run else ''}")
+        for error in report["errors"][:20]:
+            print(f"  ⚠️ ligne {error['line']}: {error['error']}")
+
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"\n💾 Rapport écrit dans {args.report}")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erreur: {e}")
+    finally:
+        stream.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
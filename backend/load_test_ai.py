@@ -0,0 +1,161 @@
+# load_test_ai.py
+"""
+Test de charge des endpoints IA avec le fournisseur LLM factice.
+
+Par défaut l'application est chargée dans le même processus (transport ASGI)
+avec LLM_PROVIDER=fake: le retard de la boucle d'événements mesuré est donc
+celui du serveur. Avec --base-url, le script cible un serveur déjà lancé
+(démarré avec LLM_PROVIDER=fake) et le retard mesuré est celui du client.
+
+Exemples:
+    python load_test_ai.py --rps 20 --duration 30
+    FAKE_LLM_LATENCY=lognormal:-0.5:0.6 FAKE_LLM_RATE_LIMIT_RATE=0.05 python load_test_ai.py
+    python load_test_ai.py --base-url http://localhost:8000 --endpoints chat,analyze
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+LOAD_TEST_EMAIL = "loadtest@thesis.com"
+LOAD_TEST_PASSWORD = "loadtest123"
+INTERESTS = ["béton", "pont", "structure", "optimisation", "écologie"]
+
+ENDPOINTS = {
+    "chat": ("POST", "/api/v1/ai/chat", lambda r: {"message": f"Comment choisir un sujet sur {r.choice(INTERESTS)} ?"}),
+    "generate-three": ("POST", "/api/v1/ai/generate-three", lambda r: {
+        "interests": r.sample(INTERESTS, 2), "domaine": "Génie Civil", "niveau": "L3", "faculté": "Génie Civil"
+    }),
+    "analyze": ("POST", "/api/v1/ai/analyze", lambda r: {
+        "titre": f"Étude de {r.choice(INTERESTS)} dans les ouvrages d'art",
+        "description": "Analyse des pratiques actuelles et proposition d'améliorations.",
+        "domaine": "Génie Civil", "niveau": "L3"
+    }),
+    "recommend": ("POST", "/api/v1/sujets/recommend", lambda r: {
+        "interests": r.sample(INTERESTS, 2), "niveau": "L3", "limit": 3
+    }),
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def monitor_loop_lag(samples: List[float], stop: asyncio.Event, interval: float = 0.01):
+    """Mesure le retard de réveil de la boucle d'événements"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(time.perf_counter() - start - interval, 0.0))
+
+
+async def get_token(client: httpx.AsyncClient) -> str:
+    await client.post("/api/v1/auth/register", json={
+        "email": LOAD_TEST_EMAIL,
+        "full_name": "Load Test",
+        "password": LOAD_TEST_PASSWORD
+    })
+    response = await client.post("/api/v1/auth/login-json", json={
+        "email": LOAD_TEST_EMAIL,
+        "password": LOAD_TEST_PASSWORD
+    })
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_load(client: httpx.AsyncClient, endpoints: List[str], rps: float, duration: float, seed: int):
+    rng = random.Random(seed)
+    token = await get_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    lag_samples: List[float] = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(monitor_loop_lag(lag_samples, stop))
+
+    async def one_request(name: str, payload: dict):
+        method, path, _ = ENDPOINTS[name]
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=payload, headers=headers)
+            statuses[name][str(response.status_code)] += 1
+        except Exception as e:
+            statuses[name][type(e).__name__] += 1
+        latencies[name].append(time.perf_counter() - start)
+
+    # Charge en boucle ouverte: les requêtes partent au rythme cible quel que soit le temps de réponse
+    tasks = []
+    interval = 1.0 / rps
+    started = time.perf_counter()
+    next_at = started
+    while next_at - started < duration:
+        name = endpoints[len(tasks) % len(endpoints)]
+        tasks.append(asyncio.create_task(one_request(name, ENDPOINTS[name][2](rng))))
+        next_at += interval
+        await asyncio.sleep(max(next_at - time.perf_counter(), 0))
+
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await lag_task
+
+    return latencies, statuses, lag_samples, len(tasks) / elapsed
+
+
+def print_report(latencies, statuses, lag_samples, achieved_rps):
+    print(f"\n📊 Débit obtenu: {achieved_rps:.1f} req/s")
+    print(f"{'endpoint':<16}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  statuts")
+    for name, values in latencies.items():
+        print(
+            f"{name:<16}{len(values):>6}"
+            f"{percentile(values, 50) * 1000:>10.0f}{percentile(values, 95) * 1000:>10.0f}"
+            f"{percentile(values, 99) * 1000:>10.0f}{max(values) * 1000:>10.0f}  {dict(statuses[name])}"
+        )
+    print(
+        f"\n⏱️ Retard boucle d'événements: p50={percentile(lag_samples, 50) * 1000:.1f} ms "
+        f"p99={percentile(lag_samples, 99) * 1000:.1f} ms max={max(lag_samples or [0]) * 1000:.1f} ms"
+    )
+
+
+async def main(args):
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = [e for e in endpoints if e not in ENDPOINTS]
+    if unknown:
+        raise SystemExit(f"Endpoints inconnus: {unknown}")
+
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+            results = await run_load(client, endpoints, args.rps, args.duration, args.seed)
+    else:
+        os.environ["LLM_PROVIDER"] = "fake"
+        from app.main import app
+        from app.main_setup import create_demo_data
+
+        await create_demo_data()
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+                results = await run_load(client, endpoints, args.rps, args.duration, args.seed)
+
+    print_report(*results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test de charge des endpoints IA")
+    parser.add_argument("--rps", type=float, default=10, help="Requêtes par seconde visées")
+    parser.add_argument("--duration", type=float, default=20, help="Durée du test en secondes")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Liste séparée par des virgules")
+    parser.add_argument("--base-url", default=None, help="Cibler un serveur déjà lancé")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,42 @@
+# backend/purge_conversations.py
+"""
+Purge de l'historique de chat (même traitement que la tâche de fond de l'API).
+
+Supprime par lots les messages plus vieux que la durée de rétention, puis,
+pour chaque utilisateur, ceux au-delà des N plus récents.
+
+Exemples:
+    python purge_conversations.py                       # valeurs de .env (CONVERSATION_*)
+    python purge_conversations.py --days 90 --max-per-user 200
+    python purge_conversations.py --days 0              # plafond par utilisateur seulement
+"""
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+load_dotenv()
+
+from app.conversations import (
+    CONVERSATION_MAX_PER_USER, CONVERSATION_PURGE_BATCH, CONVERSATION_RETENTION_DAYS, purge_conversations
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Purge de l'historique de chat")
+    parser.add_argument("--days", type=int, default=CONVERSATION_RETENTION_DAYS, help="Rétention en jours (0: pas de limite d'âge)")
+    parser.add_argument("--max-per-user", type=int, default=CONVERSATION_MAX_PER_USER, help="Messages gardés par utilisateur (0: pas de plafond)")
+    parser.add_argument("--batch-size", type=int, default=CONVERSATION_PURGE_BATCH, help="Lignes supprimées par transaction")
+    args = parser.parse_args()
+
+    try:
+        removed = purge_conversations(args.days, args.max_per_user, args.batch_size)
+        print(f"🧹 {removed['expired']} messages expirés et {removed['over_cap']} au-delà du plafond supprimés")
+    except Exception as e:
+        print(f"❌ Erreur: {e}")
+
+
+if __name__ == "__main__":
+    main()
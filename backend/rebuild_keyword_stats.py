@@ -0,0 +1,38 @@
+# backend/rebuild_keyword_stats.py
+"""
+Recalcule entièrement la table keyword_stats depuis sujets.keywords.
+
+La table est normalement maintenue à chaque écriture de sujet; ce script sert
+après un import direct en base, une correction manuelle ou en cas de doute.
+
+Exemple:
+    python rebuild_keyword_stats.py
+"""
+import os
+import sys
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+load_dotenv()
+
+from app.database import SessionLocal
+from app.keyword_stats import get_popular_keywords, rebuild_keyword_stats
+
+
+def main():
+    db = SessionLocal()
+    try:
+        count = rebuild_keyword_stats(db)
+        print(f"✅ keyword_stats reconstruite: {count} mots-clés")
+        for row in get_popular_keywords(db, 10):
+            print(f"  {row['count']:>6}  {row['keyword']}")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erreur: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()